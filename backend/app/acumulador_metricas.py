@@ -0,0 +1,172 @@
+"""
+Acumulador de métricas de trading alimentado em lotes e combinável.
+
+AcumuladorMetricas guarda um resumo de tamanho fixo de uma sequência de
+resultados: contagem, soma, média e M2 (Welford, combinados pela fórmula de
+Chan), ganhos e perdas, maior e menor resultado, e o estado de borda das
+sequências de vitórias/perdas e do drawdown. Assim as métricas de
+/analytics/metricas-avancadas saem de milhões de operações lidas em lotes de um
+cursor do servidor, em memória constante, e resumos parciais (de lotes,
+partições, robôs ou workers do pool de análises) se juntam sem voltar aos dados.
+
+`combinar` trata o outro acumulador como a continuação deste (operações
+posteriores). Contagens, somas, média/variância e extremos não dependem da
+ordem; sequências e drawdown dependem, então partições devem ser combinadas em
+ordem cronológica.
+"""
+import math
+from typing import Optional
+
+import numpy as np
+
+
+class AcumuladorMetricas:
+    """Resumo combinável de uma sequência de resultados (ver o módulo)"""
+
+    def __init__(self):
+        self.linhas = 0              # Operações lidas, inclusive sem resultado
+        self.n = 0                   # Resultados válidos
+        self.soma = 0.0
+        self.media = 0.0
+        self.m2 = 0.0                # Soma dos quadrados dos desvios da média
+        self.positivas = 0
+        self.negativas = 0
+        self.soma_ganhos = 0.0
+        self.soma_perdas = 0.0
+        self.maior = -math.inf
+        self.menor = math.inf
+
+        # Sequências: maiores já vistas e as sequências das duas bordas (sinal, tamanho)
+        self.max_ganhos = 0
+        self.max_perdas = 0
+        self.inicio_sinal = 0
+        self.inicio_tamanho = 0
+        self.fim_sinal = 0
+        self.fim_tamanho = 0
+
+        # Drawdown, com a equity relativa ao início do trecho e posições entre os resultados válidos
+        self.pico = -math.inf        # Maior equity
+        self.vale = math.inf         # Menor equity
+        self.vale_posicao = 0        # Primeira posição da menor equity
+        self.max_drawdown = 0.0
+        self.max_drawdown_pico = 0.0
+        self.max_drawdown_posicao = 0
+
+    @classmethod
+    def de_resultados(cls, resultados: np.ndarray, linhas: Optional[int] = None) -> "AcumuladorMetricas":
+        """Resumo de um lote de resultados em ordem cronológica (NaN = operação sem resultado)"""
+        acumulador = cls()
+        resultados = np.asarray(resultados, dtype=np.float64)
+        acumulador.linhas = len(resultados) if linhas is None else linhas
+        validos = resultados[~np.isnan(resultados)]
+        if len(validos) == 0:
+            return acumulador
+
+        acumulador.n = len(validos)
+        acumulador.media = float(validos.mean())
+        acumulador.m2 = float(np.square(validos - acumulador.media).sum())
+        ganhos = validos[validos > 0]
+        perdas = validos[validos < 0]
+        acumulador.positivas, acumulador.negativas = len(ganhos), len(perdas)
+        acumulador.soma_ganhos, acumulador.soma_perdas = float(ganhos.sum()), float(perdas.sum())
+        acumulador.maior, acumulador.menor = float(validos.max()), float(validos.min())
+
+        sinais = np.sign(validos)
+        inicios = np.flatnonzero(np.r_[True, sinais[1:] != sinais[:-1]])
+        tamanhos = np.diff(np.r_[inicios, len(sinais)])
+        sinal_da_sequencia = sinais[inicios]
+        sequencias_ganho = tamanhos[sinal_da_sequencia > 0]
+        sequencias_perda = tamanhos[sinal_da_sequencia < 0]
+        acumulador.max_ganhos = int(sequencias_ganho.max()) if len(sequencias_ganho) else 0
+        acumulador.max_perdas = int(sequencias_perda.max()) if len(sequencias_perda) else 0
+        acumulador.inicio_sinal, acumulador.inicio_tamanho = int(sinal_da_sequencia[0]), int(tamanhos[0])
+        acumulador.fim_sinal, acumulador.fim_tamanho = int(sinal_da_sequencia[-1]), int(tamanhos[-1])
+
+        equity = np.cumsum(validos)
+        acumulador.soma = float(equity[-1])
+        acumulador.pico = float(equity.max())
+        acumulador.vale_posicao = int(np.argmin(equity))
+        acumulador.vale = float(equity[acumulador.vale_posicao])
+        picos = np.maximum.accumulate(equity)
+        drawdowns = picos - equity
+        i_max = int(np.argmax(drawdowns))
+        if drawdowns[i_max] > 0:
+            acumulador.max_drawdown = float(drawdowns[i_max])
+            acumulador.max_drawdown_pico = float(picos[i_max])
+            acumulador.max_drawdown_posicao = i_max
+        return acumulador
+
+    def adicionar(self, resultados: np.ndarray, linhas: Optional[int] = None) -> "AcumuladorMetricas":
+        """Acrescenta um lote de resultados posteriores aos já acumulados"""
+        return self.combinar(AcumuladorMetricas.de_resultados(resultados, linhas))
+
+    def combinar(self, outro: "AcumuladorMetricas") -> "AcumuladorMetricas":
+        """Acrescenta `outro` como continuação deste acumulador (altera e retorna self)"""
+        self.linhas += outro.linhas
+        if outro.n == 0:
+            return self
+        if self.n == 0:
+            linhas = self.linhas
+            self.__dict__.update(outro.__dict__)
+            self.linhas = linhas
+            return self
+
+        n_anterior, deslocamento = self.n, self.soma
+        n = self.n + outro.n
+        delta = outro.media - self.media
+        self.media += delta * outro.n / n
+        self.m2 += outro.m2 + delta * delta * self.n * outro.n / n
+        self.n = n
+        self.soma += outro.soma
+        self.positivas += outro.positivas
+        self.negativas += outro.negativas
+        self.soma_ganhos += outro.soma_ganhos
+        self.soma_perdas += outro.soma_perdas
+        self.maior = max(self.maior, outro.maior)
+        self.menor = min(self.menor, outro.menor)
+
+        # Sequências: a do fim deste trecho continua na do início do outro quando o sinal é o mesmo
+        self.max_ganhos = max(self.max_ganhos, outro.max_ganhos)
+        self.max_perdas = max(self.max_perdas, outro.max_perdas)
+        if self.fim_sinal == outro.inicio_sinal:
+            juncao = self.fim_tamanho + outro.inicio_tamanho
+            if self.fim_sinal > 0:
+                self.max_ganhos = max(self.max_ganhos, juncao)
+            elif self.fim_sinal < 0:
+                self.max_perdas = max(self.max_perdas, juncao)
+            if self.inicio_tamanho == n_anterior:
+                self.inicio_tamanho = juncao
+            self.fim_tamanho = juncao if outro.fim_tamanho == outro.n else outro.fim_tamanho
+        else:
+            self.fim_tamanho = outro.fim_tamanho
+        self.fim_sinal = outro.fim_sinal
+
+        # Drawdown no outro trecho: o interno dele ou do pico deste trecho até o vale do outro.
+        # Em empates vale a primeira ocorrência, e um drawdown deste trecho vem antes.
+        candidatos = []
+        if outro.max_drawdown > 0:
+            candidatos.append((outro.max_drawdown, outro.max_drawdown_posicao, deslocamento + outro.max_drawdown_pico))
+        cruzado = self.pico - (deslocamento + outro.vale)
+        if cruzado > 0:
+            candidatos.append((cruzado, outro.vale_posicao, self.pico))
+        if candidatos:
+            drawdown, posicao, pico = max(candidatos, key=lambda c: (c[0], -c[1]))
+            if drawdown > self.max_drawdown:
+                self.max_drawdown = drawdown
+                self.max_drawdown_pico = pico
+                self.max_drawdown_posicao = n_anterior + posicao
+
+        if deslocamento + outro.vale < self.vale:
+            self.vale = deslocamento + outro.vale
+            self.vale_posicao = n_anterior + outro.vale_posicao
+        self.pico = max(self.pico, deslocamento + outro.pico)
+        return self
+
+    @property
+    def desvio_padrao(self) -> float:
+        """Desvio padrão amostral (0 com menos de 2 resultados ou resultados todos iguais)"""
+        if self.n < 2:
+            return 0
+        desvio = math.sqrt(self.m2 / (self.n - 1))
+        # Resíduo de arredondamento de uma série constante não é dispersão
+        return desvio if desvio > 1e-9 * max(abs(self.maior), abs(self.menor)) else 0
@@ -0,0 +1,106 @@
+"""
+Execução do cálculo das análises fora do event loop.
+
+Métricas e simulações são Python puro e seguram o GIL: rodando no event loop,
+uma simulação grande trava health checks e dashboards de todos os clientes.
+Os endpoints async enviam o passo de cálculo para um pool de processos (spawn,
+criado sob demanda) e aguardam o resultado; sem processos disponíveis, o
+cálculo vai para um pool de threads, que pelo menos devolve o event loop entre
+os intervalos do GIL.
+
+A função enviada deve ser de nível de módulo e receber arrays NumPy/pandas
+(nunca objetos ORM), para que a serialização até o processo seja compacta.
+"""
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from .core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[Executor] = None
+_pool_threads: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+_sem_processos = False  # Criação do pool de processos já falhou neste processo
+
+
+def _workers() -> int:
+    return settings.ANALYTICS_WORKERS or os.cpu_count() or 1
+
+
+def _get_pool_threads() -> ThreadPoolExecutor:
+    global _pool_threads
+    with _pool_lock:
+        if _pool_threads is None:
+            _pool_threads = ThreadPoolExecutor(max_workers=_workers(), thread_name_prefix="analytics")
+        return _pool_threads
+
+
+def _get_pool() -> Executor:
+    """Pool de processos criado sob demanda e reaproveitado entre requisições (ou o de threads)"""
+    global _pool, _sem_processos
+    if settings.ANALYTICS_EXECUTOR != "process" or _sem_processos:
+        return _get_pool_threads()
+    with _pool_lock:
+        if _pool is None:
+            try:
+                # spawn: o processo da API tem threads (uvicorn, jobs) e fork com threads não é seguro
+                _pool = ProcessPoolExecutor(
+                    max_workers=_workers(),
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"Pool de cálculo das análises criado com {_workers()} processos")
+            except (OSError, NotImplementedError) as e:
+                logger.warning(f"Não foi possível criar o pool de processos ({e}); cálculos irão para threads")
+                _sem_processos = True
+        if _pool is not None:
+            return _pool
+    return _get_pool_threads()
+
+
+def _descartar_pool(pool: Executor):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def executar(funcao: Callable[..., Any], *args: Any, operacoes: Optional[int] = None) -> Any:
+    """
+    Executa `funcao(*args)` no pool de cálculo e aguarda sem bloquear o event loop.
+
+    Args:
+        operacoes: tamanho da entrada; abaixo de ANALYTICS_INLINE_MAX_OPERACOES o
+            cálculo roda direto no event loop, onde custa menos que a ida ao pool
+    """
+    if operacoes is not None and operacoes < settings.ANALYTICS_INLINE_MAX_OPERACOES:
+        return funcao(*args)
+
+    loop = asyncio.get_running_loop()
+    tarefa = functools.partial(funcao, *args)
+    pool = _get_pool()
+    try:
+        return await loop.run_in_executor(pool, tarefa)
+    except BrokenProcessPool as e:
+        # Um worker morreu (ex.: falta de memória): descarta o pool e repete numa thread
+        logger.error(f"Pool de cálculo das análises quebrado ({e}); repetindo o cálculo numa thread")
+        _descartar_pool(pool)
+    return await loop.run_in_executor(_get_pool_threads(), tarefa)
+
+
+def encerrar():
+    """Encerra os pools (chamado no shutdown da aplicação)"""
+    global _pool, _pool_threads
+    with _pool_lock:
+        pools = [p for p in (_pool, _pool_threads) if p is not None]
+        _pool = _pool_threads = None
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,157 @@
+"""
+Cache dos resultados das análises, invalidado por versão dos dados.
+
+Os dados só mudam em uploads e exclusões, mas as análises eram recalculadas a
+cada carga do dashboard. Cada schema tem contadores de versão (um geral e um por
+robô) na tabela {schema}.versoes_dados, que as funções de escrita de crud.py
+incrementam na mesma transação da escrita; o resultado de uma análise fica em
+cache sob (endpoint, schema, robôs, parâmetros, versão) e deixa de ser encontrado
+assim que algum dado envolvido muda.
+
+Como as versões estão no banco, uma escrita feita por qualquer worker do uvicorn
+muda a versão lida por todos: cada worker tem o seu cache de resultados, mas
+nenhum serve um resultado de antes da escrita.
+"""
+import logging
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Chaves especiais de {schema}.versoes_dados (as demais são robo_id)
+VERSAO_SCHEMA = 0     # qualquer mudança no schema
+VERSAO_LIMPEZA = -1   # mudanças que atingem todos os robôs (ou robôs não conhecidos)
+
+# Incrementa as versões de {chaves} (expressão SQL integer[]); em ordem de chave,
+# para que escritas concorrentes travem as linhas sempre na mesma ordem
+INCREMENTAR_VERSOES_SQL = """
+    INSERT INTO {schema}.versoes_dados AS v (chave, versao)
+    SELECT chave, 1 FROM unnest({chaves}) AS chave ORDER BY chave
+    ON CONFLICT (chave) DO UPDATE SET versao = v.versao + 1
+"""
+
+
+class VersoesDados:
+    """Contadores de versão dos dados de cada schema, no geral e por robô, em {schema}.versoes_dados"""
+
+    def invalidar(self, db: Session, schema: str, robo_ids: Optional[Iterable[int]] = None) -> None:
+        """
+        Registra uma mudança nos dados de `robo_ids` (None = o schema inteiro, como
+        numa limpeza ou quando os robôs afetados não são conhecidos).
+
+        Roda na transação de `db`: chame antes do commit da escrita, para que a
+        nova versão e os dados fiquem visíveis juntos (e sumam juntos num rollback).
+        As linhas de versão ficam travadas só do incremento até o commit.
+        """
+        robos = None if robo_ids is None else {int(robo_id) for robo_id in robo_ids}
+        chaves = [VERSAO_SCHEMA, VERSAO_LIMPEZA] if robos is None else [VERSAO_SCHEMA, *robos]
+        db.execute(
+            text(INCREMENTAR_VERSOES_SQL.format(schema=schema, chaves="CAST(:chaves AS integer[])")),
+            {"chaves": chaves}
+        )
+        resultados.descartar(schema, robos)
+
+    async def versao(self, db: AsyncSession, schema: str, robo_ids: Optional[Iterable[int]] = None) -> str:
+        """
+        Versão dos dados lidos por uma consulta: dos robôs informados ou, com None,
+        do schema inteiro. Muda sempre que algum desses dados muda (um SELECT pela
+        chave primária de {schema}.versoes_dados).
+        """
+        robos: Optional[List[int]] = None if robo_ids is None else [int(robo_id) for robo_id in robo_ids]
+        chaves = [VERSAO_LIMPEZA, VERSAO_SCHEMA] if robos is None else [VERSAO_LIMPEZA, *robos]
+        linhas = dict((await db.execute(
+            text(f"SELECT chave, versao FROM {schema}.versoes_dados WHERE chave = ANY(CAST(:chaves AS integer[]))"),
+            {"chaves": chaves}
+        )).all())
+        prefixo = str(linhas.get(VERSAO_LIMPEZA, 0))
+        if robos is None:
+            return f"{prefixo}.{linhas.get(VERSAO_SCHEMA, 0)}"
+        return prefixo + "." + "-".join(str(linhas.get(robo_id, 0)) for robo_id in robos)
+
+
+class CacheResultados:
+    """Resultados de análises por (endpoint, schema, robôs, parâmetros, versão), com descarte LRU"""
+
+    def __init__(self, capacidade: int):
+        self._resultados: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._capacidade = capacidade
+        self.hits = 0
+        self.misses = 0
+        self.descartados_lru = 0
+        self.descartados_invalidacao = 0
+
+    async def chave(
+        self, db: AsyncSession, endpoint: str, schema: str, robo_ids: Optional[Iterable[int]] = None, **params: Hashable
+    ) -> Tuple:
+        """
+        Chave de uma consulta; a versão dos dados é lida aqui, antes do cálculo, então
+        um resultado calculado durante um upload fica guardado sob a versão anterior.
+
+        Args:
+            robo_ids: robôs lidos, na ordem usada pela consulta (None = o schema inteiro)
+        """
+        robos = None if robo_ids is None else tuple(dict.fromkeys(int(robo_id) for robo_id in robo_ids))
+        return (endpoint, schema, robos, tuple(sorted(params.items())), await versoes.versao(db, schema, robos))
+
+    def get(self, chave: Tuple) -> Optional[Any]:
+        """Resultado em cache (compartilhado: não alterar) ou None"""
+        with self._lock:
+            resultado = self._resultados.get(chave)
+            if resultado is None:
+                self.misses += 1
+                return None
+            self._resultados.move_to_end(chave)
+            self.hits += 1
+            return resultado
+
+    def put(self, chave: Tuple, resultado: Any) -> None:
+        if self._capacidade <= 0:
+            return
+        with self._lock:
+            self._resultados[chave] = resultado
+            self._resultados.move_to_end(chave)
+            while len(self._resultados) > self._capacidade:
+                self._resultados.popitem(last=False)
+                self.descartados_lru += 1
+
+    def descartar(self, schema: str, robo_ids: Optional[set] = None) -> None:
+        """
+        Remove já os resultados que uma mudança tornou obsoletos (sem isso eles só
+        sairiam pelo LRU): os do schema que leem algum dos robôs ou o schema inteiro
+        """
+        with self._lock:
+            obsoletas = [
+                chave for chave in self._resultados
+                if chave[1] == schema and (robo_ids is None or chave[2] is None or robo_ids.intersection(chave[2]))
+            ]
+            for chave in obsoletas:
+                del self._resultados[chave]
+            self.descartados_invalidacao += len(obsoletas)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            consultas = self.hits + self.misses
+            por_endpoint = Counter(chave[0] for chave in self._resultados)
+            return {
+                "capacidade": self._capacidade,
+                "resultados_em_cache": len(self._resultados),
+                "hits": self.hits,
+                "misses": self.misses,
+                "taxa_acerto": round(self.hits / consultas, 4) if consultas else None,
+                "descartados_lru": self.descartados_lru,
+                "descartados_invalidacao": self.descartados_invalidacao,
+                "por_endpoint": dict(por_endpoint),
+            }
+
+
+versoes = VersoesDados()
+resultados = CacheResultados(settings.ANALYTICS_CACHE_SIZE)
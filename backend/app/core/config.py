@@ -84,14 +84,43 @@ class Settings(BaseSettings):
     CSV_ENCODING: str = "latin-1"
     CSV_SEPARATOR: str = ";"
     CSV_HEADER: int = 0
-    
+    CSV_CHUNK_SIZE: int = 50000  # Linhas por bloco no upload em modo streaming
+    PARSE_PLAN_CACHE_SIZE: int = 128  # Layouts de arquivo (cabeçalho + separador + encoding) com plano de parse em cache
+    DRY_RUN_ERROR_EXAMPLES: int = 20  # Exemplos de erro na resposta de dry_run=true
+
     # Configurações de parsing do Excel
     EXCEL_SKIPROWS: int = 0
     EXCEL_HEADER: int = 0
     EXCEL_SHEET_NAME: Optional[str] = None  # None = primeira planilha
+    EXCEL_PARSE_WORKERS: int = 0  # Processos para ler planilhas em paralelo (0 = número de CPUs)
+    EXCEL_FAST_READER: bool = True  # .xlsx: leitor somente leitura que lê só as colunas usadas
+
+    # Upload de zip com vários arquivos (/uploads/archive/)
+    ARCHIVE_UPLOAD_WORKERS: int = 2           # Threads lendo/validando arquivos à frente da gravação
+    ARCHIVE_MAX_UNCOMPRESSED_MB: int = 2048   # Limite do conteúdo descompactado (proteção contra zip bomb)
     
     # Schema padrão para uploads
     DEFAULT_UPLOAD_SCHEMA: str = "uploads_usuarios"
+
+    # Inserção em massa das operações (linhas por lote de COPY/INSERT)
+    BULK_INSERT_BATCH_SIZE: int = 5000
+
+    # Uploads em segundo plano (async_job=true)
+    UPLOAD_JOB_WORKERS: int = 2     # Uploads processados em paralelo
+    UPLOAD_JOB_HISTORY: int = 100   # Jobs finalizados mantidos para consulta
+
+    # Engine async (asyncpg) usada pelos endpoints de analytics
+    ASYNC_DB_POOL_SIZE: int = 10      # Conexões mantidas abertas no pool
+    ASYNC_DB_MAX_OVERFLOW: int = 20   # Conexões extras permitidas em picos de requisições
+
+    # Cálculo das análises e simulações fora do event loop (app/analytics_executor.py)
+    ANALYTICS_EXECUTOR: str = "process"          # "process" (pool de processos) ou "thread"
+    ANALYTICS_WORKERS: int = 0                   # Tamanho do pool (0 = número de CPUs)
+    ANALYTICS_INLINE_MAX_OPERACOES: int = 2000   # Entradas menores são calculadas no próprio event loop
+    METRICAS_STREAMING_LOTE: int = 50000         # Resultados por lote em /analytics/metricas-avancadas?todas=true
+    # Cache de resultados e ETags invalidados pelas versões dos dados em {schema}.versoes_dados
+    ANALYTICS_CACHE_SIZE: int = 256              # Resultados de análises em cache por worker (0 = desliga o cache)
+    ANALYTICS_ETAGS: bool = True                 # ETag/304 nas leituras de operações e análises
     
     # === CONFIGURAÇÕES FINANCEIRAS ===
     
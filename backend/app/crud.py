@@ -1,18 +1,29 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from typing import List, Optional
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import delete, text
+from sqlalchemy.engine import Dialect
+from typing import List, Optional, Dict, Any, Iterable, Tuple, Callable, NamedTuple, Union
+import csv
+import io
 import logging
+from datetime import date, datetime, time, timedelta
 
-from . import models, schemas
+import pandas as pd
+
+from . import cache_analytics, migrations, models, schemas
 from .core.config import settings
 
 logger = logging.getLogger(__name__)
 
-def set_search_path(db: Session, schema_name: str):
-    """Define o search_path para um schema específico"""
-    if schema_name:
-        db.execute(text(f"SET search_path TO {schema_name}, public"))
-        db.commit()  # Garantir que a configuração seja aplicada
+def _em_schema(schema_name: str) -> Dict[str, Any]:
+    """
+    execution_options que apontam os modelos ORM (definidos sem schema) para `schema_name`.
+
+    O schema é trocado na execução de cada comando, e não por SET search_path na
+    conexão: nada vaza para a próxima requisição que reusar a conexão do pool, e o
+    SQL compilado fica uma única vez no cache do SQLAlchemy para todos os schemas.
+    Relacionamentos carregados depois (lazy) não recebem o mapa: use joinedload.
+    """
+    return {"schema_translate_map": {None: schema_name}}
 
 # === CRUD PARA ROBÔS ===
 
@@ -42,6 +53,22 @@ def get_robo_by_nome(db: Session, nome: str, schema_name: str = settings.DEFAULT
         return robo
     return None
 
+def get_nomes_robos(db: Session, robo_ids: Iterable[int], schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA) -> Dict[int, str]:
+    """Nomes de vários robôs num único comando: {robo_id: nome} dos que existem"""
+    robo_ids = [int(robo_id) for robo_id in dict.fromkeys(robo_ids)]
+    if not robo_ids:
+        return {}
+    query = text(f"SELECT id, nome FROM {schema_name}.robos WHERE id = ANY(CAST(:ids AS integer[]))")
+    return {robo_id: nome for robo_id, nome in db.execute(query, {"ids": robo_ids}).fetchall()}
+
+def get_ids_robos(db: Session, nomes: Iterable[str], schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA) -> Dict[str, int]:
+    """IDs de vários robôs pelo nome num único comando (sem criar): {nome: id} dos que existem"""
+    nomes = list(dict.fromkeys(nomes))
+    if not nomes:
+        return {}
+    query = text(f"SELECT id, nome FROM {schema_name}.robos WHERE nome = ANY(CAST(:nomes AS varchar[]))")
+    return {nome: robo_id for robo_id, nome in db.execute(query, {"nomes": nomes}).fetchall()}
+
 def get_robos(db: Session, schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA, skip: int = 0, limit: int = 100) -> List[models.Robo]:
     """Lista todos os robôs"""
     query = text(f"""
@@ -68,6 +95,7 @@ def create_robo(db: Session, robo_in: schemas.RoboCreate, schema_name: str = set
     # Usar SQL explícito com schema
     query = text(f"INSERT INTO {schema_name}.robos (nome) VALUES (:nome) RETURNING id, nome, criado_em")
     result = db.execute(query, {"nome": robo_in.nome}).fetchone()
+    cache_analytics.versoes.invalidar(db, schema_name, [result[0]])
     db.commit()
     
     # Converter resultado para objeto Robo
@@ -77,19 +105,99 @@ def create_robo(db: Session, robo_in: schemas.RoboCreate, schema_name: str = set
     robo.criado_em = result[2]
     return robo
 
+def get_or_create_robos(db: Session, nomes: Iterable[str], schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA) -> Dict[str, int]:
+    """
+    Resolve vários nomes de robô de uma vez, criando os que ainda não existem.
+
+    Um único comando (INSERT ... ON CONFLICT DO NOTHING RETURNING + SELECT dos
+    existentes) e um commit, em vez de get_robo_by_nome/create_robo por robô.
+
+    Returns:
+        {nome: id} para todos os nomes informados
+    """
+    nomes = list(dict.fromkeys(nomes))
+    if not nomes:
+        return {}
+
+    query = text(f"""
+        WITH novos AS (
+            INSERT INTO {schema_name}.robos (nome)
+            SELECT unnest(CAST(:nomes AS varchar[]))
+            ON CONFLICT (nome) DO NOTHING
+            RETURNING id, nome
+        )
+        SELECT id, nome, TRUE AS criado FROM novos
+        UNION ALL
+        SELECT id, nome, FALSE AS criado FROM {schema_name}.robos WHERE nome = ANY(CAST(:nomes AS varchar[]))
+    """)
+    try:
+        results = db.execute(query, {"nomes": nomes}).fetchall()
+        ids = {nome: robo_id for robo_id, nome, _ in results}
+        criados = [nome for _, nome, criado in results if criado]
+        if criados:
+            cache_analytics.versoes.invalidar(db, schema_name, [ids[nome] for nome in criados])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Erro ao resolver robôs no schema '{schema_name}': {e}")
+        raise
+
+    if criados:
+        logger.info(f"Criados {len(criados)} novos robôs no schema '{schema_name}': {criados}")
+
+    # Um robô criado por outra transação concorrente não aparece em nenhum dos dois lados
+    faltantes = [nome for nome in nomes if nome not in ids]
+    if faltantes:
+        query = text(f"SELECT id, nome FROM {schema_name}.robos WHERE nome = ANY(CAST(:nomes AS varchar[]))")
+        ids.update({nome: robo_id for robo_id, nome in db.execute(query, {"nomes": faltantes}).fetchall()})
+    return ids
+
+def get_ultima_abertura_por_robo(db: Session, robo_ids: Iterable[int], schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA) -> Dict[int, datetime]:
+    """
+    Maior "Abertura" já salva de cada robô, num único comando.
+
+    Cada robô é resolvido por um LATERAL ... ORDER BY "Abertura" DESC LIMIT 1, que
+    percorre o índice da chave natural (robo_id, "Abertura", ...) de trás para
+    frente e lê uma única linha, sem varrer o histórico do robô.
+
+    Returns:
+        {robo_id: abertura} só para os robôs que já têm operações
+    """
+    robo_ids = [int(robo_id) for robo_id in dict.fromkeys(robo_ids)]
+    if not robo_ids:
+        return {}
+
+    query = text(f"""
+        SELECT r.robo_id, ultima."Abertura"
+        FROM unnest(CAST(:ids AS integer[])) AS r(robo_id)
+        CROSS JOIN LATERAL (
+            SELECT o."Abertura"
+            FROM {schema_name}.operacoes o
+            WHERE o.robo_id = r.robo_id
+            ORDER BY o."Abertura" DESC
+            LIMIT 1
+        ) AS ultima
+    """)
+    return {robo_id: abertura for robo_id, abertura in db.execute(query, {"ids": robo_ids}).fetchall()}
+
 # === CRUD PARA OPERAÇÕES ===
 
 def get_operacao(db: Session, operacao_id: int, schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA) -> Optional[models.Operacao]:
-    """Busca uma operação por ID"""
-    set_search_path(db, schema_name)
-    return db.query(models.Operacao).filter(models.Operacao.id == operacao_id).first()
+    """Busca uma operação por ID (com o robô, no mesmo comando)"""
+    return (
+        db.query(models.Operacao)
+        .options(joinedload(models.Operacao.robo_info))
+        .execution_options(**_em_schema(schema_name))
+        .filter(models.Operacao.id == operacao_id)
+        .first()
+    )
 
 def get_operacoes(db: Session, schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA, skip: int = 0, limit: int = 100) -> List[models.Operacao]:
     """Lista todas as operações"""
     query = text(f"""
         SELECT id, robo_id, "Resultado_Valor", "Abertura", "Fechamento", ativo, lotes, tipo, criado_em, atualizado_em, fonte_dados_id
         FROM {schema_name}.operacoes
-        ORDER BY "Abertura" DESC
+        ORDER BY "Abertura" DESC, id DESC
         LIMIT :limit OFFSET :skip
     """)
     
@@ -153,6 +261,333 @@ def get_operacoes_by_robo(db: Session, robo_id: int, schema_name: str = settings
     
     return operacoes
 
+class FiltroTemporal(NamedTuple):
+    """
+    Filtros de data, horário e dia da semana sobre a "Abertura" das operações
+    (aplicados no SQL por get_operacoes_by_robos e get_operacoes_frame). None = sem filtro.
+    """
+    data_inicio: Optional[date] = None            # inclusive
+    data_fim: Optional[date] = None               # inclusive
+    hora_inicio: Optional[time] = None            # junto com hora_fim, inclusive
+    hora_fim: Optional[time] = None
+    dias_semana: Optional[Iterable[int]] = None   # ISO: 1=segunda ... 7=domingo
+
+def _mascara_dias_semana(dias: Optional[Iterable[int]]) -> Optional[int]:
+    """Dias ISO da semana como máscara de bits (bit n = dia n), para um único parâmetro por robô"""
+    if dias is None:
+        return None
+    mascara = 0
+    for dia in dias:
+        if 1 <= int(dia) <= 7:
+            mascara |= 1 << int(dia)
+    return mascara
+
+def _parametros_filtros(filtros: List[FiltroTemporal]) -> Dict[str, list]:
+    """Um array por campo do filtro, com uma posição por robô (alinhado a :ids)"""
+    return {
+        # Período como intervalo semiaberto de timestamps: [início do dia inicial, início do dia seguinte ao final)
+        "abertura_min": [datetime.combine(f.data_inicio, time.min) if f.data_inicio else None for f in filtros],
+        "abertura_ate": [datetime.combine(f.data_fim + timedelta(days=1), time.min) if f.data_fim else None for f in filtros],
+        "hora_inicio": [f.hora_inicio for f in filtros],
+        "hora_fim": [(f.hora_fim or time.max) if f.hora_inicio else None for f in filtros],
+        "dias": [_mascara_dias_semana(f.dias_semana) for f in filtros],
+    }
+
+def _select_operacoes_sql(
+    schema_name: str, colunas: str, por_robo: bool, limit: Optional[int], skip: int, mais_recentes_primeiro: bool
+) -> str:
+    """
+    SELECT de operações com os filtros de FiltroTemporal (parâmetros de _parametros_filtros,
+    um valor por robô de :ids ou, sem `por_robo`, valores únicos).
+
+    Com `por_robo`, cada robô de :ids é resolvido por um LATERAL sobre o índice
+    (robo_id, "Abertura", ...), com seus próprios filtros e `limit` por robô, e o
+    resultado sai agrupado na ordem de :ids. Sem `por_robo`, um único filtro vale
+    para todas as operações do schema e `limit`/`skip` são globais.
+    """
+    direcao = "DESC" if mais_recentes_primeiro else "ASC"
+    filtros_sql = """
+              AND o."Abertura" >= COALESCE(r.abertura_min, '-infinity')
+              AND o."Abertura" < COALESCE(r.abertura_ate, 'infinity')
+              AND (r.hora_inicio IS NULL OR CAST(o."Abertura" AS time) BETWEEN r.hora_inicio AND r.hora_fim)
+              AND (r.dias IS NULL OR ((r.dias >> CAST(EXTRACT(ISODOW FROM o."Abertura") AS integer)) & 1) = 1)"""
+
+    if not por_robo:
+        paginacao = f"LIMIT {int(limit)} OFFSET {int(skip)}" if limit is not None else f"OFFSET {int(skip)}"
+        return f"""
+        SELECT {colunas}
+        FROM (
+            SELECT CAST(:abertura_min AS timestamp) AS abertura_min,
+                   CAST(:abertura_ate AS timestamp) AS abertura_ate,
+                   CAST(:hora_inicio AS time) AS hora_inicio,
+                   CAST(:hora_fim AS time) AS hora_fim,
+                   CAST(:dias AS integer) AS dias
+        ) AS r
+        CROSS JOIN {schema_name}.operacoes o
+        WHERE TRUE {filtros_sql}
+        ORDER BY o."Abertura" {direcao}, o.id {direcao}
+        {paginacao}
+        """
+
+    limite = f'ORDER BY o."Abertura" {direcao}, o.id {direcao} LIMIT {int(limit)}' if limit is not None else ""
+    return f"""
+        SELECT {colunas}
+        FROM unnest(
+            CAST(:ids AS integer[]),
+            CAST(:abertura_min AS timestamp[]),
+            CAST(:abertura_ate AS timestamp[]),
+            CAST(:hora_inicio AS time[]),
+            CAST(:hora_fim AS time[]),
+            CAST(:dias AS integer[])
+        ) WITH ORDINALITY AS r(robo_id, abertura_min, abertura_ate, hora_inicio, hora_fim, dias, ordem)
+        CROSS JOIN LATERAL (
+            SELECT *
+            FROM {schema_name}.operacoes o
+            WHERE o.robo_id = r.robo_id {filtros_sql}
+            {limite}
+        ) AS o
+        ORDER BY r.ordem, o."Abertura" {direcao}, o.id {direcao}
+    """
+
+def _sql_do_driver(sql: str, params: Dict[str, Any], dialect: Dialect) -> Tuple[str, Union[Dict[str, Any], List[Any]]]:
+    """
+    SQL com parâmetros :nome compilado pelo SQLAlchemy no estilo do driver
+    (%(nome)s no psycopg2, $1, $2... no asyncpg), para cursores DBAPI e COPY.
+
+    O compilador de text() escapa `%` literais e acusa parâmetro sem valor.
+
+    Returns:
+        (SQL, parâmetros): dict nos estilos nomeados, lista na ordem de $n nos posicionais
+    """
+    compilado = text(sql).compile(dialect=dialect)
+    valores = compilado.construct_params(params)
+    if compilado.positional:
+        return compilado.string, [valores[nome] for nome in compilado.positiontup]
+    return compilado.string, valores
+
+# Colunas das leituras de operações como models.Operacao, na ordem de _operacoes_from_rows
+_COLUNAS_OPERACAO = (
+    'o.id, o.robo_id, o."Resultado_Valor", o."Abertura", o."Fechamento", o.ativo, o.lotes, o.tipo, '
+    'o.criado_em, o.atualizado_em, o.fonte_dados_id'
+)
+
+def _operacoes_from_rows(results) -> List[models.Operacao]:
+    """models.Operacao (sem vínculo com a sessão) a partir de linhas com as colunas de _COLUNAS_OPERACAO"""
+    operacoes = []
+    for result in results:
+        operacao = models.Operacao()
+        operacao.id = result[0]
+        operacao.robo_id = result[1]
+        operacao.resultado = result[2]
+        operacao.data_abertura = result[3]
+        operacao.data_fechamento = result[4]
+        operacao.ativo = result[5]
+        operacao.lotes = result[6]
+        operacao.tipo = result[7]
+        operacao.criado_em = result[8]
+        operacao.atualizado_em = result[9]
+        operacao.fonte_dados_id = result[10]
+        operacoes.append(operacao)
+    return operacoes
+
+def get_operacoes_by_robos(
+    db: Session,
+    robo_ids: Iterable[int],
+    schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA,
+    filtro: Optional[FiltroTemporal] = None,
+    filtros_por_robo: Optional[Dict[int, FiltroTemporal]] = None,
+    limit_por_robo: Optional[int] = None,
+    mais_recentes_primeiro: bool = False
+) -> List[models.Operacao]:
+    """
+    Operações de vários robôs num único comando, em vez de get_operacoes_by_robo por robô.
+
+    Cada robô é resolvido por um LATERAL sobre o índice (robo_id, "Abertura", ...),
+    com os filtros de período como limites do índice e os de horário e dia da
+    semana como predicados, todos no SQL. O resultado vem agrupado por robô, na
+    ordem de `robo_ids`, e ordenado por Abertura dentro de cada robô.
+
+    Args:
+        filtro: filtros aplicados a todos os robôs
+        filtros_por_robo: filtros específicos de alguns robôs (substituem `filtro` para eles)
+        limit_por_robo: máximo de operações de cada robô (None = todas)
+        mais_recentes_primeiro: Abertura decrescente (senão crescente)
+    """
+    robo_ids = [int(robo_id) for robo_id in dict.fromkeys(robo_ids)]
+    if not robo_ids:
+        return []
+
+    filtros_por_robo = filtros_por_robo or {}
+    params = {
+        "ids": robo_ids,
+        **_parametros_filtros([filtros_por_robo.get(robo_id, filtro) or FiltroTemporal() for robo_id in robo_ids])
+    }
+    query = text(_select_operacoes_sql(
+        schema_name, _COLUNAS_OPERACAO,
+        por_robo=True, limit=limit_por_robo, skip=0, mais_recentes_primeiro=mais_recentes_primeiro
+    ))
+    operacoes = _operacoes_from_rows(db.execute(query, params).fetchall())
+
+    logger.debug(f"{len(operacoes)} operações de {len(robo_ids)} robôs lidas num único comando")
+    return operacoes
+
+def get_operacoes_pagina(
+    db: Session,
+    schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA,
+    limit: int = 1000,
+    apos: Optional[Tuple[datetime, int]] = None,
+    robo_ids: Optional[Iterable[int]] = None
+) -> Tuple[List[models.Operacao], bool]:
+    """
+    Uma página de operações da mais recente para a mais antiga, por keyset.
+
+    Em vez de LIMIT/OFFSET (que lê e descarta todas as linhas das páginas
+    anteriores), a página começa logo depois da última operação da página
+    anterior: ("Abertura", id) < apos. A busca desce direto no índice
+    ("Abertura", id) — ou (robo_id, "Abertura", id) por robô, num LATERAL por
+    robô de `robo_ids` — e o custo de uma página não depende da profundidade.
+
+    Args:
+        apos: (Abertura, id) da última operação da página anterior (None = primeira página)
+        robo_ids: restringe aos robôs informados (None = todas as operações do schema)
+
+    Returns:
+        (operações da página, se há mais operações depois dela)
+    """
+    params: Dict[str, Any] = {
+        "limit": int(limit) + 1,  # uma a mais só para saber se existe próxima página
+        "abertura": apos[0] if apos else None,
+        "id": apos[1] if apos else None,
+    }
+    seek = '(o."Abertura", o.id) < (CAST(:abertura AS timestamp), CAST(:id AS integer))' if apos else "TRUE"
+
+    if robo_ids is None:
+        query = text(f"""
+            SELECT {_COLUNAS_OPERACAO}
+            FROM {schema_name}.operacoes o
+            WHERE {seek}
+            ORDER BY o."Abertura" DESC, o.id DESC
+            LIMIT :limit
+        """)
+    else:
+        params["ids"] = [int(robo_id) for robo_id in dict.fromkeys(robo_ids)]
+        if not params["ids"]:
+            return [], False
+        # Cada robô contribui no máximo `limit` linhas já ordenadas pelo índice; o merge final é pequeno
+        query = text(f"""
+            SELECT {_COLUNAS_OPERACAO}
+            FROM unnest(CAST(:ids AS integer[])) AS r(robo_id)
+            CROSS JOIN LATERAL (
+                SELECT *
+                FROM {schema_name}.operacoes o
+                WHERE o.robo_id = r.robo_id AND {seek}
+                ORDER BY o."Abertura" DESC, o.id DESC
+                LIMIT :limit
+            ) AS o
+            ORDER BY o."Abertura" DESC, o.id DESC
+            LIMIT :limit
+        """)
+
+    results = db.execute(query, params).fetchall()
+    tem_mais = len(results) > limit
+    return _operacoes_from_rows(results[:limit]), tem_mais
+
+# === LEITURA COLUNAR (ANALYTICS) ===
+
+# (coluna no DataFrame, expressão SQL, dtype); datas são convertidas à parte
+FRAME_OPERACAO_COLUMNS = [
+    ("id", "o.id", "int64"),
+    ("robo_id", "o.robo_id", "category"),
+    ("resultado", 'o."Resultado_Valor"', "float64"),
+    ("data_abertura", 'o."Abertura"', None),
+    ("data_fechamento", 'o."Fechamento"', None),
+    ("ativo", "o.ativo", "category"),
+    ("lotes", "o.lotes", "float64"),
+    ("tipo", "o.tipo", "category"),
+]
+_FRAME_DATE_COLUMNS = ["data_abertura", "data_fechamento"]
+
+def _frame_operacoes(origem: Any) -> pd.DataFrame:
+    """
+    DataFrame tipado a partir do CSV do COPY (buffer de texto) ou de registros do cursor.
+    float_precision='round_trip' mantém os resultados idênticos aos floats do driver.
+    """
+    nomes = [nome for nome, _, _ in FRAME_OPERACAO_COLUMNS]
+    dtypes = {nome: dtype for nome, _, dtype in FRAME_OPERACAO_COLUMNS if dtype}
+    if isinstance(origem, io.StringIO):
+        df = pd.read_csv(
+            origem, names=nomes, header=None, dtype={**dtypes, "robo_id": "int64"},
+            keep_default_na=False, na_values=[""], float_precision="round_trip"
+        )
+        for coluna in _FRAME_DATE_COLUMNS:
+            df[coluna] = pd.to_datetime(df[coluna], format="ISO8601")
+        return df.astype({"robo_id": "category"})
+
+    df = pd.DataFrame.from_records(origem, columns=nomes)
+    for coluna in _FRAME_DATE_COLUMNS:
+        df[coluna] = pd.to_datetime(df[coluna])
+    return df.astype({**dtypes, "tipo": "category"})
+
+def get_operacoes_frame(
+    db: Session,
+    schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA,
+    robo_ids: Optional[Iterable[int]] = None,
+    filtro: Optional[FiltroTemporal] = None,
+    filtros_por_robo: Optional[Dict[int, FiltroTemporal]] = None,
+    limit: Optional[int] = None,
+    skip: int = 0,
+    mais_recentes_primeiro: bool = False
+) -> pd.DataFrame:
+    """
+    Operações em formato colunar, sem criar um models.Operacao por linha.
+
+    O SELECT (o mesmo de get_operacoes_by_robos) sai do banco por
+    COPY ... TO STDOUT em CSV e vira um DataFrame com colunas tipadas:
+    resultado e lotes float64, data_abertura/data_fechamento datetime64,
+    robo_id, ativo e tipo categóricos. `df["resultado"].to_numpy()` dá o array
+    NumPy direto para os cálculos de métricas. Sem suporte a COPY no driver,
+    os registros do cursor são convertidos do mesmo jeito.
+
+    Args:
+        robo_ids: robôs a ler (resultado agrupado na ordem dada e `limit` por robô);
+            None = todas as operações do schema, com `limit`/`skip` globais
+        filtro / filtros_por_robo: como em get_operacoes_by_robos
+        mais_recentes_primeiro: Abertura decrescente (senão crescente)
+    """
+    colunas = ", ".join(expressao for _, expressao, _ in FRAME_OPERACAO_COLUMNS)
+    if robo_ids is None:
+        params = {campo: valores[0] for campo, valores in _parametros_filtros([filtro or FiltroTemporal()]).items()}
+        sql = _select_operacoes_sql(schema_name, colunas, False, limit, skip, mais_recentes_primeiro)
+    else:
+        robo_ids = [int(robo_id) for robo_id in dict.fromkeys(robo_ids)]
+        if not robo_ids:
+            return _frame_operacoes([])
+        filtros_por_robo = filtros_por_robo or {}
+        params = {
+            "ids": robo_ids,
+            **_parametros_filtros([filtros_por_robo.get(robo_id, filtro) or FiltroTemporal() for robo_id in robo_ids])
+        }
+        sql = _select_operacoes_sql(schema_name, colunas, True, limit, 0, mais_recentes_primeiro)
+
+    conexao = db.connection()
+    sql_driver, params_driver = _sql_do_driver(sql, params, conexao.dialect)
+    cursor = conexao.connection.cursor()
+    try:
+        if hasattr(cursor, "copy_expert"):
+            buffer = io.StringIO()
+            consulta = cursor.mogrify(sql_driver, params_driver).decode()
+            cursor.copy_expert(f"COPY ({consulta}) TO STDOUT WITH (FORMAT csv)", buffer)
+            buffer.seek(0)
+            df = _frame_operacoes(buffer)
+        else:
+            cursor.execute(sql_driver, params_driver)
+            df = _frame_operacoes(cursor.fetchall())
+    finally:
+        cursor.close()
+
+    logger.debug(f"{len(df)} operações lidas em formato colunar do schema '{schema_name}'")
+    return df
+
 def create_operacao(db: Session, operacao_in: schemas.OperacaoCreate, robo_id_for_op: int, schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA) -> models.Operacao:
     """Cria uma nova operação"""
     # Usar SQL explícito com schema
@@ -177,6 +612,7 @@ def create_operacao(db: Session, operacao_in: schemas.OperacaoCreate, robo_id_fo
     }
     
     result = db.execute(query, data).fetchone()
+    cache_analytics.versoes.invalidar(db, schema_name, [robo_id_for_op])
     db.commit()
     
     # Converter resultado para objeto Operacao
@@ -194,17 +630,224 @@ def create_operacao(db: Session, operacao_in: schemas.OperacaoCreate, robo_id_fo
     operacao.fonte_dados_id = result[10]
     return operacao
 
+# === INSERÇÃO EM MASSA (UPLOADS) ===
+
+# Colunas na ordem usada pelo COPY; as chaves dos dicts seguem create_operacao
+BULK_OPERACAO_COLUMNS = [
+    ("robo_id", "robo_id"),
+    ("resultado", '"Resultado_Valor"'),
+    ("data_abertura", '"Abertura"'),
+    ("data_fechamento", '"Fechamento"'),
+    ("ativo", "ativo"),
+    ("lotes", "lotes"),
+    ("tipo", "tipo"),
+    ("fonte_dados_id", "fonte_dados_id"),
+]
+_COPY_NULL = "\\N"
+
+_STAGING_TABLE = "operacoes_staging"
+
+# Alvo explícito do ON CONFLICT (colunas de ux_operacoes_chave_natural): sem o índice o
+# PostgreSQL rejeita o comando, em vez de as duplicadas passarem sem ser detectadas
+_CONFLITO_CHAVE_NATURAL = 'ON CONFLICT (robo_id, "Abertura", "Fechamento", "Resultado_Valor", ativo) DO NOTHING'
+# SQLSTATE de ON CONFLICT sem índice único correspondente (invalid_column_reference)
+_SEM_INDICE_CONFLITO = "42P10"
+
+def _bulk_columns_sql() -> str:
+    return ", ".join(col for _, col in BULK_OPERACAO_COLUMNS)
+
+def _bulk_insert_sql(schema_name: str) -> str:
+    """INSERT de uma linha que ignora operações já existentes (chave natural)"""
+    params = ", ".join(f":{key}" for key, _ in BULK_OPERACAO_COLUMNS)
+    return (
+        f"INSERT INTO {schema_name}.operacoes ({_bulk_columns_sql()}) VALUES ({params}) "
+        f"{_CONFLITO_CHAVE_NATURAL}"
+    )
+
+def _create_staging_table(db: Session, schema_name: str):
+    """
+    Tabela temporária com as colunas de operacoes (sem constraints), descartada no commit.
+    Os lotes passam por ela para que o INSERT ... ON CONFLICT DO NOTHING deduplique
+    contra a tabela real dentro do banco, sem carregar operações existentes no Python.
+    """
+    db.execute(text(
+        f"CREATE TEMP TABLE IF NOT EXISTS {_STAGING_TABLE} ON COMMIT DROP AS "
+        f"SELECT {_bulk_columns_sql()} FROM {schema_name}.operacoes WITH NO DATA"
+    ))
+
+def _copy_operacoes(cursor, rows: List[Dict[str, Any]], table: str):
+    """Envia um lote via COPY FROM STDIN (formato CSV)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            _COPY_NULL if row.get(key) is None else row[key]
+            for key, _ in BULK_OPERACAO_COLUMNS
+        ])
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({_bulk_columns_sql()}) FROM STDIN WITH (FORMAT csv, NULL '{_COPY_NULL}')",
+        buffer
+    )
+
+def bulk_create_operacoes(
+    db: Session,
+    operacoes: Iterable[Tuple[Any, Dict[str, Any]]],
+    schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA,
+    batch_size: int = settings.BULK_INSERT_BATCH_SIZE,
+    on_progress: Optional[Callable[[int], None]] = None,
+    inseridas_por_robo: Optional[Dict[int, int]] = None
+) -> Tuple[int, int, List[Tuple[Any, str]]]:
+    """
+    Insere operações em massa numa única transação, ignorando as já existentes.
+
+    Cada lote é carregado numa tabela temporária (COPY FROM STDIN quando o driver
+    suporta, senão executemany) e copiado para operacoes com
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING: linhas que repetem a chave natural
+    (robo_id, Abertura, Fechamento, Resultado_Valor, ativo) contam como duplicadas,
+    o que torna o reenvio do mesmo arquivo idempotente. Se um lote falhar, ele é
+    desfeito (savepoint) e reprocessado linha a linha para identificar as linhas com erro.
+    Sem o índice único da chave natural, a inserção inteira falha (RuntimeError).
+
+    Args:
+        operacoes: pares (chave, dados); a chave identifica a linha nos erros
+            e os dados usam as mesmas chaves de create_operacao (robo_id, resultado, ...)
+        on_progress: chamado após cada lote com a quantidade inserida nele
+        inseridas_por_robo: se informado, acumula {robo_id: inseridas}; permite
+            inserir vários robôs numa só chamada e ainda detalhar o resultado por robô
+
+    Returns:
+        (quantidade inserida, quantidade duplicada, [(chave, mensagem de erro)])
+    """
+    insert_sql = text(_bulk_insert_sql(schema_name))
+    staging_insert_sql = text(
+        f"INSERT INTO {_STAGING_TABLE} ({_bulk_columns_sql()}) "
+        f"VALUES ({', '.join(f':{key}' for key, _ in BULK_OPERACAO_COLUMNS)})"
+    )
+    merge_sql = text(
+        f"WITH novas AS ("
+        f"INSERT INTO {schema_name}.operacoes ({_bulk_columns_sql()}) "
+        f"SELECT {_bulk_columns_sql()} FROM {_STAGING_TABLE} "
+        f"{_CONFLITO_CHAVE_NATURAL} RETURNING robo_id"
+        f") SELECT robo_id, COUNT(*) FROM novas GROUP BY robo_id"
+    )
+    truncate_sql = text(f"TRUNCATE {_STAGING_TABLE}")
+
+    inserted = 0
+    duplicates = 0
+    errors: List[Tuple[Any, str]] = []
+    por_robo = inseridas_por_robo if inseridas_por_robo is not None else {}
+
+    try:
+        _create_staging_table(db, schema_name)
+        dbapi_cursor = db.connection().connection.cursor()
+    except Exception:
+        db.rollback()
+        raise
+    use_copy = hasattr(dbapi_cursor, "copy_expert")
+
+    def flush(batch: List[Tuple[Any, Dict[str, Any]]]):
+        nonlocal inserted, duplicates
+        rows = [data for _, data in batch]
+        inserted_before = inserted
+        savepoint = db.begin_nested()
+        try:
+            db.execute(truncate_sql)
+            if use_copy:
+                _copy_operacoes(dbapi_cursor, rows, _STAGING_TABLE)
+            else:
+                db.execute(staging_insert_sql, rows)
+            novas_por_robo = db.execute(merge_sql).fetchall()
+            savepoint.commit()
+            novas = 0
+            for robo_id, quantidade in novas_por_robo:
+                por_robo[robo_id] = por_robo.get(robo_id, 0) + quantidade
+                novas += quantidade
+            inserted += novas
+            duplicates += len(rows) - novas
+        except Exception as e_batch:
+            savepoint.rollback()
+            if getattr(getattr(e_batch, "orig", None), "pgcode", None) == _SEM_INDICE_CONFLITO:
+                # Falta o índice da chave natural: nenhuma linha entraria, não é erro de linha
+                raise RuntimeError(
+                    f"Índice único da chave natural ausente no schema '{schema_name}' (migração 1 falhou, "
+                    f"ver o log de inicialização); reaplique com "
+                    f"DELETE /api/v1/operacoes/limpar-duplicadas/schema/{schema_name}"
+                ) from e_batch
+            logger.warning(f"Lote de {len(rows)} operações falhou ({e_batch}); reprocessando linha a linha")
+
+            for key, data in batch:
+                savepoint = db.begin_nested()
+                try:
+                    nova = db.execute(insert_sql, data).rowcount
+                    savepoint.commit()
+                    if nova:
+                        inserted += 1
+                        por_robo[data["robo_id"]] = por_robo.get(data["robo_id"], 0) + 1
+                    else:
+                        duplicates += 1
+                except Exception as e_row:
+                    savepoint.rollback()
+                    errors.append((key, str(e_row).split("\n")[0]))
+
+        if on_progress:
+            on_progress(inserted - inserted_before)
+
+    try:
+        batch: List[Tuple[Any, Dict[str, Any]]] = []
+        for item in operacoes:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+        # Reenvio sem operações novas não muda a versão dos dados (nem invalida o cache)
+        robos_alterados = [robo_id for robo_id, quantidade in por_robo.items() if quantidade]
+        if robos_alterados:
+            cache_analytics.versoes.invalidar(db, schema_name, robos_alterados)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        dbapi_cursor.close()
+
+    logger.info(
+        f"Inserção em massa no schema '{schema_name}': {inserted} operações novas, "
+        f"{duplicates} duplicadas, {len(errors)} erros"
+    )
+    return inserted, duplicates, errors
+
+def delete_duplicate_operacoes(db: Session, schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA) -> int:
+    """
+    Remove operações repetidas (mesma chave natural), mantendo a de menor id, e
+    retoma as migrações pendentes do schema (a mesma limpeza roda na migração 1)
+    """
+    try:
+        result = db.execute(text(migrations.DEDUPLICAR_OPERACOES_SQL.format(schema=schema_name)))
+        removidas = result.rowcount
+        if removidas:
+            cache_analytics.versoes.invalidar(db, schema_name)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Erro ao remover operações duplicadas no schema '{schema_name}': {e}")
+        raise
+
+    migrations.aplicar_migracoes(db.get_bind(), schema_name)
+    logger.info(f"{removidas} operações duplicadas removidas do schema '{schema_name}'")
+    return removidas
+
 # === FUNÇÕES AUXILIARES ===
 
 def get_operacoes_by_ativo(db: Session, ativo: str, schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA, skip: int = 0, limit: int = 100) -> List[models.Operacao]:
     """Lista operações de um ativo específico"""
-    set_search_path(db, schema_name)
-    return db.query(models.Operacao).filter(models.Operacao.ativo == ativo).offset(skip).limit(limit).all()
+    return db.query(models.Operacao).execution_options(**_em_schema(schema_name)).filter(models.Operacao.ativo == ativo).offset(skip).limit(limit).all()
 
 def get_operacoes_by_tipo(db: Session, tipo: models.TipoOperacaoEnum, schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA, skip: int = 0, limit: int = 100) -> List[models.Operacao]:
     """Lista operações de um tipo específico"""
-    set_search_path(db, schema_name)
-    return db.query(models.Operacao).filter(models.Operacao.tipo == tipo).offset(skip).limit(limit).all()
+    return db.query(models.Operacao).execution_options(**_em_schema(schema_name)).filter(models.Operacao.tipo == tipo).offset(skip).limit(limit).all()
 
 def count_operacoes(db: Session, schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA) -> int:
     """Conta o total de operações"""
@@ -226,25 +869,72 @@ def count_robos(db: Session, schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA)
         logger.error(f"Erro ao contar robôs no schema '{schema_name}': {e}")
         return 0
 
+def _resumo_por_robo_sql(schema_name: str, filtrar_robos: bool) -> str:
+    """
+    Agregados por robô num único GROUP BY (sem carregar operações). Somas em numeric:
+    exatas para resultados com casas decimais, independentemente da ordem das linhas.
+    """
+    filtro = "WHERE o.robo_id = ANY(CAST(:ids AS integer[]))" if filtrar_robos else ""
+    return f"""
+        SELECT o.robo_id,
+               COUNT(*) AS total_operacoes,
+               COUNT(o."Resultado_Valor") AS com_resultado,
+               COUNT(*) FILTER (WHERE o."Resultado_Valor" > 0) AS positivas,
+               COUNT(*) FILTER (WHERE o."Resultado_Valor" < 0) AS negativas,
+               COUNT(*) FILTER (WHERE o."Resultado_Valor" = 0) AS neutras,
+               SUM(CAST(o."Resultado_Valor" AS numeric)) AS resultado_total,
+               SUM(CAST(o."Resultado_Valor" AS numeric)) FILTER (WHERE o."Resultado_Valor" > 0) AS soma_ganhos,
+               SUM(CAST(o."Resultado_Valor" AS numeric)) FILTER (WHERE o."Resultado_Valor" < 0) AS soma_perdas,
+               MAX(o."Resultado_Valor") AS maior_resultado,
+               MIN(o."Resultado_Valor") AS menor_resultado,
+               MIN(o."Abertura") AS primeira_abertura,
+               MAX(o."Abertura") AS ultima_abertura
+        FROM {schema_name}.operacoes o
+        {filtro}
+        GROUP BY o.robo_id
+    """
+
+def _resumo_from_rows(results) -> Dict[int, Dict[str, Any]]:
+    resumos = {}
+    for result in results:
+        resumo = dict(result._mapping)
+        for campo in ("resultado_total", "soma_ganhos", "soma_perdas", "maior_resultado", "menor_resultado"):
+            if resumo[campo] is not None:
+                resumo[campo] = float(resumo[campo])
+        resumos[resumo.pop("robo_id")] = resumo
+    return resumos
+
+def get_resumo_por_robo(
+    db: Session, schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA, robo_ids: Optional[Iterable[int]] = None
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Resumo das operações de cada robô, sem limite de linhas: {robo_id: {total_operacoes,
+    com_resultado, positivas, negativas, neutras, resultado_total, soma_ganhos, soma_perdas,
+    maior_resultado, menor_resultado, primeira_abertura, ultima_abertura}}.
+    Robôs sem operações não aparecem. `robo_ids` restringe aos robôs informados.
+    """
+    params = {}
+    if robo_ids is not None:
+        params["ids"] = [int(robo_id) for robo_id in dict.fromkeys(robo_ids)]
+    query = text(_resumo_por_robo_sql(schema_name, robo_ids is not None))
+    return _resumo_from_rows(db.execute(query, params).fetchall())
+
 # === FUNÇÕES ESPECÍFICAS PARA ANALYTICS ===
 
 def get_operacoes_with_resultado(db: Session, schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA) -> List[models.Operacao]:
     """Lista operações que têm resultado não nulo"""
-    set_search_path(db, schema_name)
-    return db.query(models.Operacao).filter(models.Operacao.resultado.isnot(None)).all()
+    return db.query(models.Operacao).execution_options(**_em_schema(schema_name)).filter(models.Operacao.resultado.isnot(None)).all()
 
 def get_operacoes_by_robo_with_resultado(db: Session, robo_id: int, schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA) -> List[models.Operacao]:
     """Lista operações de um robô que têm resultado não nulo"""
-    set_search_path(db, schema_name)
-    return db.query(models.Operacao).filter(
+    return db.query(models.Operacao).execution_options(**_em_schema(schema_name)).filter(
         models.Operacao.robo_id == robo_id,
         models.Operacao.resultado.isnot(None)
     ).all()
 
 def get_operacoes_by_date_range(db: Session, data_inicio=None, data_fim=None, schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA) -> List[models.Operacao]:
     """Lista operações dentro de um período"""
-    set_search_path(db, schema_name)
-    query = db.query(models.Operacao)
+    query = db.query(models.Operacao).execution_options(**_em_schema(schema_name))
     
     if data_inicio:
         query = query.filter(models.Operacao.data_abertura >= data_inicio)
@@ -255,31 +945,34 @@ def get_operacoes_by_date_range(db: Session, data_inicio=None, data_fim=None, sc
 
 def get_distinct_ativos(db: Session, schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA) -> List[str]:
     """Lista todos os ativos únicos"""
-    set_search_path(db, schema_name)
-    result = db.query(models.Operacao.ativo).distinct().filter(models.Operacao.ativo.isnot(None)).all()
+    result = db.query(models.Operacao.ativo).execution_options(**_em_schema(schema_name)).distinct().filter(models.Operacao.ativo.isnot(None)).all()
     return [ativo[0] for ativo in result if ativo[0]]
 
 # === FUNÇÕES DE LIMPEZA ===
 
 def delete_operacao(db: Session, operacao_id: int, schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA) -> bool:
     """Delete uma operação"""
-    set_search_path(db, schema_name)
-    db_operacao = db.query(models.Operacao).filter(models.Operacao.id == operacao_id).first()
-    if db_operacao:
-        db.delete(db_operacao)
-        db.commit()
-        return True
-    return False
+    robos = db.execute(
+        delete(models.Operacao)
+        .where(models.Operacao.id == operacao_id)
+        .returning(models.Operacao.robo_id)
+        .execution_options(**_em_schema(schema_name), synchronize_session=False)
+    ).scalars().all()
+    if robos:
+        cache_analytics.versoes.invalidar(db, schema_name, robos)
+    db.commit()
+    return len(robos) > 0
 
 def delete_robo(db: Session, robo_id: int, schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA) -> bool:
     """Delete um robô (se não tiver operações associadas)"""
-    set_search_path(db, schema_name)
-    db_robo = db.query(models.Robo).filter(models.Robo.id == robo_id).first()
+    opcoes = _em_schema(schema_name)
+    db_robo = db.query(models.Robo.id).execution_options(**opcoes).filter(models.Robo.id == robo_id).first()
     if db_robo:
         # Verificar se há operações associadas
-        operacoes_count = db.query(models.Operacao).filter(models.Operacao.robo_id == robo_id).count()
+        operacoes_count = db.query(models.Operacao).execution_options(**opcoes).filter(models.Operacao.robo_id == robo_id).count()
         if operacoes_count == 0:
-            db.delete(db_robo)
+            db.query(models.Robo).execution_options(**opcoes).filter(models.Robo.id == robo_id).delete(synchronize_session=False)
+            cache_analytics.versoes.invalidar(db, schema_name, [robo_id])
             db.commit()
             return True
         else:
@@ -293,6 +986,7 @@ def delete_all_operacoes(db: Session, schema_name: str = settings.DEFAULT_UPLOAD
         query = text(f"DELETE FROM {schema_name}.operacoes")
         result = db.execute(query)
         deleted_count = result.rowcount
+        cache_analytics.versoes.invalidar(db, schema_name)
         db.commit()
         logger.warning(f"TODAS as {deleted_count} operações do schema '{schema_name}' foram deletadas")
         return deleted_count
@@ -307,6 +1001,7 @@ def delete_all_robos(db: Session, schema_name: str = settings.DEFAULT_UPLOAD_SCH
         query = text(f"DELETE FROM {schema_name}.robos")
         result = db.execute(query)
         deleted_count = result.rowcount
+        cache_analytics.versoes.invalidar(db, schema_name)
         db.commit()
         logger.warning(f"TODOS os {deleted_count} robôs do schema '{schema_name}' foram deletados")
         return deleted_count
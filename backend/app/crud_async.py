@@ -0,0 +1,206 @@
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, List, Optional, Dict, Any, Iterable
+import io
+import logging
+
+import numpy as np
+import pandas as pd
+
+from . import models
+from .core.config import settings
+from .crud import (
+    FiltroTemporal,
+    FRAME_OPERACAO_COLUMNS,
+    _COLUNAS_OPERACAO,
+    _frame_operacoes,
+    _operacoes_from_rows,
+    _parametros_filtros,
+    _resumo_from_rows,
+    _resumo_por_robo_sql,
+    _select_operacoes_sql,
+    _sql_do_driver,
+)
+
+logger = logging.getLogger(__name__)
+
+# Leituras de crud.py para os endpoints async (AsyncSession com asyncpg).
+# Mesmo SQL, mesmos argumentos e mesmos retornos das funções homônimas de crud.py.
+
+# === ROBÔS ===
+
+async def get_robo_by_id(db: AsyncSession, robo_id: int, schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA) -> Optional[models.Robo]:
+    """Busca um robô por ID"""
+    query = text(f"SELECT id, nome, criado_em FROM {schema_name}.robos WHERE id = :robo_id LIMIT 1")
+    result = (await db.execute(query, {"robo_id": robo_id})).fetchone()
+    if result:
+        robo = models.Robo()
+        robo.id = result[0]
+        robo.nome = result[1]
+        robo.criado_em = result[2]
+        return robo
+    return None
+
+async def get_robos(db: AsyncSession, schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA, skip: int = 0, limit: int = 100) -> List[models.Robo]:
+    """Lista todos os robôs"""
+    query = text(f"""
+        SELECT id, nome, criado_em
+        FROM {schema_name}.robos
+        ORDER BY criado_em DESC
+        LIMIT :limit OFFSET :skip
+    """)
+    results = (await db.execute(query, {"limit": limit, "skip": skip})).fetchall()
+
+    robos = []
+    for result in results:
+        robo = models.Robo()
+        robo.id = result[0]
+        robo.nome = result[1]
+        robo.criado_em = result[2]
+        robos.append(robo)
+    return robos
+
+async def get_nomes_robos(db: AsyncSession, robo_ids: Iterable[int], schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA) -> Dict[int, str]:
+    """Nomes de vários robôs num único comando: {robo_id: nome} dos que existem"""
+    robo_ids = [int(robo_id) for robo_id in dict.fromkeys(robo_ids)]
+    if not robo_ids:
+        return {}
+    query = text(f"SELECT id, nome FROM {schema_name}.robos WHERE id = ANY(CAST(:ids AS integer[]))")
+    return {robo_id: nome for robo_id, nome in (await db.execute(query, {"ids": robo_ids})).fetchall()}
+
+# === OPERAÇÕES ===
+
+async def get_operacoes_by_robo(db: AsyncSession, robo_id: int, schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA, skip: int = 0, limit: int = 100) -> List[models.Operacao]:
+    """Lista operações de um robô específico (mesma regra de limite de crud.get_operacoes_by_robo)"""
+    if limit >= 50000:  # Indicativo de que é para simulação: todas, em ordem cronológica
+        query = text(f"""
+            SELECT {_COLUNAS_OPERACAO}
+            FROM {schema_name}.operacoes o
+            WHERE o.robo_id = :robo_id
+            ORDER BY o."Abertura" ASC
+        """)
+        params = {"robo_id": robo_id}
+    else:
+        query = text(f"""
+            SELECT {_COLUNAS_OPERACAO}
+            FROM {schema_name}.operacoes o
+            WHERE o.robo_id = :robo_id
+            ORDER BY o."Abertura" DESC
+            LIMIT :limit OFFSET :skip
+        """)
+        params = {"robo_id": robo_id, "limit": limit, "skip": skip}
+    return _operacoes_from_rows((await db.execute(query, params)).fetchall())
+
+async def get_operacoes_by_robos(
+    db: AsyncSession,
+    robo_ids: Iterable[int],
+    schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA,
+    filtro: Optional[FiltroTemporal] = None,
+    filtros_por_robo: Optional[Dict[int, FiltroTemporal]] = None,
+    limit_por_robo: Optional[int] = None,
+    mais_recentes_primeiro: bool = False
+) -> List[models.Operacao]:
+    """Operações de vários robôs num único comando (ver crud.get_operacoes_by_robos)"""
+    robo_ids = [int(robo_id) for robo_id in dict.fromkeys(robo_ids)]
+    if not robo_ids:
+        return []
+
+    filtros_por_robo = filtros_por_robo or {}
+    params = {
+        "ids": robo_ids,
+        **_parametros_filtros([filtros_por_robo.get(robo_id, filtro) or FiltroTemporal() for robo_id in robo_ids])
+    }
+    query = text(_select_operacoes_sql(
+        schema_name, _COLUNAS_OPERACAO,
+        por_robo=True, limit=limit_por_robo, skip=0, mais_recentes_primeiro=mais_recentes_primeiro
+    ))
+    operacoes = _operacoes_from_rows((await db.execute(query, params)).fetchall())
+
+    logger.debug(f"{len(operacoes)} operações de {len(robo_ids)} robôs lidas num único comando")
+    return operacoes
+
+async def get_resumo_por_robo(
+    db: AsyncSession, schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA, robo_ids: Optional[Iterable[int]] = None
+) -> Dict[int, Dict[str, Any]]:
+    """Resumo das operações de cada robô num único GROUP BY (ver crud.get_resumo_por_robo)"""
+    params = {}
+    if robo_ids is not None:
+        params["ids"] = [int(robo_id) for robo_id in dict.fromkeys(robo_ids)]
+    query = text(_resumo_por_robo_sql(schema_name, robo_ids is not None))
+    return _resumo_from_rows((await db.execute(query, params)).fetchall())
+
+async def get_operacoes_frame(
+    db: AsyncSession,
+    schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA,
+    robo_ids: Optional[Iterable[int]] = None,
+    filtro: Optional[FiltroTemporal] = None,
+    filtros_por_robo: Optional[Dict[int, FiltroTemporal]] = None,
+    limit: Optional[int] = None,
+    skip: int = 0,
+    mais_recentes_primeiro: bool = False
+) -> pd.DataFrame:
+    """
+    Operações em formato colunar (ver crud.get_operacoes_frame).
+
+    O SELECT sai pelo COPY ... TO STDOUT do próprio asyncpg, na conexão da
+    sessão, e o CSV vira o mesmo DataFrame tipado da versão síncrona.
+    """
+    colunas = ", ".join(expressao for _, expressao, _ in FRAME_OPERACAO_COLUMNS)
+    if robo_ids is None:
+        params = {campo: valores[0] for campo, valores in _parametros_filtros([filtro or FiltroTemporal()]).items()}
+        sql = _select_operacoes_sql(schema_name, colunas, False, limit, skip, mais_recentes_primeiro)
+    else:
+        robo_ids = [int(robo_id) for robo_id in dict.fromkeys(robo_ids)]
+        if not robo_ids:
+            return _frame_operacoes([])
+        filtros_por_robo = filtros_por_robo or {}
+        params = {
+            "ids": robo_ids,
+            **_parametros_filtros([filtros_por_robo.get(robo_id, filtro) or FiltroTemporal() for robo_id in robo_ids])
+        }
+        sql = _select_operacoes_sql(schema_name, colunas, True, limit, 0, mais_recentes_primeiro)
+
+    conexao_async = await db.connection()
+    sql_asyncpg, argumentos = _sql_do_driver(sql, params, conexao_async.dialect)
+    conexao = await conexao_async.get_raw_connection()
+    partes: List[bytes] = []
+
+    async def receber(dados: bytes):
+        partes.append(dados)
+
+    await conexao.driver_connection.copy_from_query(sql_asyncpg, *argumentos, output=receber, format="csv")
+    df = _frame_operacoes(io.StringIO(b"".join(partes).decode("utf-8")))
+
+    logger.debug(f"{len(df)} operações lidas em formato colunar do schema '{schema_name}'")
+    return df
+
+async def stream_resultados(
+    db: AsyncSession,
+    schema_name: str = settings.DEFAULT_UPLOAD_SCHEMA,
+    robo_ids: Optional[Iterable[int]] = None,
+    filtro: Optional[FiltroTemporal] = None,
+    tamanho_lote: int = settings.METRICAS_STREAMING_LOTE
+) -> AsyncIterator[np.ndarray]:
+    """
+    Resultados das operações em ordem cronológica, em lotes float64 de até
+    `tamanho_lote`, lidos de um cursor no servidor: a memória não cresce com o
+    histórico. Para alimentar um AcumuladorMetricas.
+
+    Args:
+        robo_ids: robôs a ler (cada um em ordem cronológica, um depois do outro);
+            None = todas as operações do schema, numa única ordem cronológica
+    """
+    if robo_ids is None:
+        params = {campo: valores[0] for campo, valores in _parametros_filtros([filtro or FiltroTemporal()]).items()}
+        por_robo = False
+    else:
+        robo_ids = [int(robo_id) for robo_id in dict.fromkeys(robo_ids)]
+        if not robo_ids:
+            return
+        params = {"ids": robo_ids, **_parametros_filtros([filtro or FiltroTemporal()] * len(robo_ids))}
+        por_robo = True
+    query = text(_select_operacoes_sql(schema_name, 'o."Resultado_Valor"', por_robo, None, 0, False))
+
+    resultado = await db.stream(query, params)
+    async for linhas in resultado.partitions(tamanho_lote):
+        yield np.array([linha[0] for linha in linhas], dtype=np.float64)
@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base # declarative_base para modelos
 from .core.config import settings # Importa as configurações (onde está DATABASE_URL)
 
@@ -21,6 +23,20 @@ engine = create_engine(
 # autoflush=False: Os objetos não são "flushados" para o banco automaticamente. Você controla o flush.
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine e sessões async (driver asyncpg) para os endpoints `async def`: as consultas
+# aguardam o banco sem bloquear o event loop do uvicorn, e outras requisições seguem
+# sendo atendidas enquanto isso. Mesmo banco da engine síncrona, outro driver.
+async_engine = create_async_engine(
+    make_url(SQLALCHEMY_DATABASE_URL).set(drivername="postgresql+asyncpg"),
+    pool_pre_ping=True,
+    pool_size=settings.ASYNC_DB_POOL_SIZE,
+    max_overflow=settings.ASYNC_DB_MAX_OVERFLOW
+)
+
+# expire_on_commit=False: objetos lidos continuam acessíveis depois do commit,
+# sem um novo SELECT implícito (que numa sessão async exigiria await).
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
 # Cria uma classe base para os modelos ORM (Data Access Objects).
 # Todos os seus modelos de tabela (ex: Operacao, Robo) herdarão desta classe.
 Base = declarative_base()
@@ -39,4 +55,14 @@ def get_db():
     try:
         yield db  # Fornece a sessão para a rota
     finally:
-        db.close() # Fecha a sessão após a rota terminar
\ No newline at end of file
+        db.close() # Fecha a sessão após a rota terminar
+
+
+async def get_async_db():
+    """
+    Gerador de dependência que fornece uma AsyncSession (asyncpg).
+
+    Use nos endpoints `async def`, com as funções de app.crud_async.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
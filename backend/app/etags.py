@@ -0,0 +1,77 @@
+"""
+ETags e GET condicional para os endpoints de leitura de operações e análises.
+
+O dashboard consulta os mesmos endpoints a cada atualização e baixava o JSON
+inteiro mesmo com os dados inalterados. O ETag de uma resposta é derivado da
+rota, dos parâmetros da consulta e da versão dos dados lidos (os robôs de
+`robo_id`/`robo_ids` ou o schema inteiro, ver cache_analytics.VersoesDados).
+Como a versão só muda em escritas, um `If-None-Match` com o ETag atual é
+respondido com 304 pela dependência, depois de uma leitura da versão e antes de
+a consulta das operações ou o cálculo começarem.
+
+As versões ficam no banco ({schema}.versoes_dados): todos os workers calculam
+o mesmo ETag para os mesmos dados, e uma escrita em qualquer um deles o muda.
+"""
+import hashlib
+from typing import List, Optional
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import cache_analytics
+from .core.config import settings
+from .database import get_async_db
+
+
+def robos_da_consulta(request: Request) -> Optional[List[int]]:
+    """Robôs lidos por uma consulta (`robo_ids` ou `robo_id`); None = o schema inteiro"""
+    robo_ids = request.query_params.get("robo_ids")
+    if robo_ids is not None:
+        valores = robo_ids.split(",")
+    else:
+        valores = request.query_params.getlist("robo_id")
+    robos = [int(valor.strip()) for valor in valores if valor.strip().isdigit()]
+    return robos or None
+
+
+async def calcular_etag(db: AsyncSession, request: Request, schema_padrao: str) -> str:
+    """ETag fraco da resposta: rota + parâmetros + versão dos dados envolvidos"""
+    schema = request.query_params.get("schema", schema_padrao)
+    versao = await cache_analytics.versoes.versao(db, schema, robos_da_consulta(request))
+    identidade = repr((request.url.path, sorted(request.query_params.multi_items()), schema, versao))
+    return f'W/"{hashlib.blake2b(identidade.encode(), digest_size=16).hexdigest()}"'
+
+
+def etag_confere(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparação fraca de `If-None-Match` (lista de ETags ou `*`) com o ETag atual"""
+    if not if_none_match:
+        return False
+    opaco = etag[2:] if etag.startswith("W/") else etag
+    for candidato in if_none_match.split(","):
+        candidato = candidato.strip()
+        if candidato == "*" or (candidato[2:] if candidato.startswith("W/") else candidato) == opaco:
+            return True
+    return False
+
+
+class ETagDados:
+    """
+    Dependência de rota que responde 304 quando o cliente já tem a versão atual.
+
+    Uso: `@router.get(..., dependencies=[Depends(ETagDados(schema_padrao))])`, com
+    o mesmo schema padrão do parâmetro `schema` do endpoint. A versão é lida pela
+    AsyncSession da requisição (a mesma do endpoint, se ele usar get_async_db).
+    Respostas 200 levam o ETag e `Cache-Control: no-cache`, para o navegador sempre revalidar.
+    """
+
+    def __init__(self, schema_padrao: str = settings.DEFAULT_UPLOAD_SCHEMA):
+        self.schema_padrao = schema_padrao
+
+    async def __call__(self, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)) -> None:
+        if not settings.ANALYTICS_ETAGS:
+            return
+        etag = await calcular_etag(db, request, self.schema_padrao)
+        cabecalhos = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_confere(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=304, headers=cabecalhos)
+        response.headers.update(cabecalhos)
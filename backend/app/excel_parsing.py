@@ -0,0 +1,312 @@
+"""
+Leitura de planilhas Excel em paralelo.
+
+O parse do openpyxl é CPU-bound e segura o GIL, então threads não ajudam:
+cada planilha é lida num processo separado e o DataFrame volta serializado.
+Este módulo só depende do pandas e do openpyxl para que os processos filhos
+(spawn) o importem rapidamente, sem carregar configuração, banco ou rotas.
+
+A leitura rápida (ler_planilha_rapida) usa internas do openpyxl, verificadas
+com a versão fixada em requirements.txt; ler_colunas volta ao pd.read_excel se
+elas mudarem.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+import pandas as pd
+from openpyxl.utils.cell import column_index_from_string
+
+try:
+    from openpyxl.worksheet._reader import WorkSheetParser
+except ImportError:  # Módulo interno: sem ele, só a leitura pelo pandas
+    WorkSheetParser = None
+
+logger = logging.getLogger(__name__)
+
+# (caminho do arquivo, engine, nome da planilha, skiprows, header, colunas a ler ou None = todas)
+TarefaPlanilha = Tuple[str, str, str, int, int, Optional[List[str]]]
+
+# Lista fixa de colunas ou função que as escolhe a partir dos nomes do cabeçalho
+SelecaoColunas = Union[Sequence[str], Callable[[List[str]], Sequence[str]]]
+
+# Células de erro do Excel (#N/A, #DIV/0!, ...) viram nulas, como no pd.read_excel
+_EXCEL_ERRORS = frozenset(('#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A'))
+
+# Textos que o pd.read_excel trata como nulos (na_values padrão documentado do pandas)
+_TEXTOS_NULOS = frozenset((
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+))
+
+# Desligada no processo na primeira falha das internas do openpyxl
+_leitura_rapida_disponivel = WorkSheetParser is not None
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def excel_engine(filename: str) -> str:
+    """Engine do pandas conforme a extensão do arquivo"""
+    return 'openpyxl' if filename.lower().endswith('.xlsx') else 'xlrd'
+
+
+def nomes_colunas(cabecalho: Sequence[Any]) -> List[str]:
+    """Nomes das colunas como o pandas os daria para a linha de cabeçalho (vazias viram 'Unnamed: n')"""
+    return [
+        f"Unnamed: {i}" if valor is None or valor == "" else str(valor)
+        for i, valor in enumerate(cabecalho)
+    ]
+
+
+class _ParserColunas(WorkSheetParser or object):
+    """
+    WorkSheetParser do openpyxl que só converte as células das colunas pedidas.
+
+    As demais células de cada linha são puladas pela letra da coordenada, sem
+    passar por parse_cell (tipo, estilo, shared strings, datas), que é onde o
+    openpyxl gasta a maior parte do tempo. `colunas=None` converte todas.
+    Cada linha é devolvida como (número da linha, {coluna (1-based): valor}).
+    """
+
+    def __init__(self, src, shared_strings, colunas: Optional[Set[int]] = None, **kwargs):
+        super().__init__(src, shared_strings, **kwargs)
+        self.colunas = colunas
+        self._indices_letras: Dict[str, int] = {}
+
+    def parse_row(self, row):
+        numero = row.get('r')
+        self.row_counter = int(float(numero)) if numero else self.row_counter + 1
+        self.col_counter = 0
+
+        valores = {}
+        for element in row:
+            coordenada = element.get('r')
+            if coordenada:
+                letras = coordenada.rstrip('0123456789')
+                coluna = self._indices_letras.get(letras)
+                if coluna is None:
+                    coluna = self._indices_letras[letras] = column_index_from_string(letras)
+            else:
+                coluna = self.col_counter + 1
+            self.col_counter = coluna
+            if self.colunas is None or coluna in self.colunas:
+                valores[coluna] = self.parse_cell(element)['value']
+        return self.row_counter, valores
+
+
+def _valor_celula(valor: Any) -> Any:
+    """Mesma conversão do leitor openpyxl do pandas: erros e textos nulos viram None, float inteiro vira int"""
+    if valor.__class__ is str:
+        if valor in _EXCEL_ERRORS or valor in _TEXTOS_NULOS:
+            return None
+    elif valor.__class__ is float and valor.is_integer():
+        return int(valor)
+    return valor
+
+
+def ler_planilha_rapida(
+    origem: Any,
+    planilha: str,
+    skiprows: int,
+    header: int,
+    colunas: SelecaoColunas
+) -> pd.DataFrame:
+    """
+    Leitura de .xlsx somente leitura e em streaming, só com as colunas usadas.
+
+    Lê a linha de cabeçalho, resolve as colunas desejadas (`colunas` pode ser a
+    lista de nomes ou uma função que recebe os nomes do cabeçalho) e percorre o
+    XML das linhas seguintes convertendo apenas essas colunas, montando o
+    DataFrame direto das listas, sem o TextParser do pd.read_excel. O índice é a
+    posição da linha após o cabeçalho, como no pd.read_excel.
+
+    Linhas sem nenhum valor nas colunas lidas ficam todas nulas (e são descartadas
+    pelo dropna(how='all') do processador), mesmo que outras colunas tenham dados.
+
+    Args:
+        origem: caminho do arquivo ou openpyxl.Workbook já aberto em modo read_only
+    """
+    import openpyxl
+
+    livro = origem
+    if not isinstance(origem, openpyxl.Workbook):
+        livro = openpyxl.load_workbook(origem, read_only=True, data_only=True, keep_links=False)
+    try:
+        aba = livro[planilha]
+        fonte = aba._get_source()
+        try:
+            parser = _ParserColunas(
+                fonte, aba._shared_strings, data_only=livro.data_only, epoch=livro.epoch,
+                date_formats=livro._date_formats, timedelta_formats=livro._timedelta_formats
+            )
+            linha_cabecalho = skiprows + header + 1
+            cabecalho: Optional[List[str]] = None
+            posicoes: List[Tuple[str, int]] = []
+            valores: List[List[Any]] = []
+            total = 0  # linhas até a última com dados (as vazias no final são descartadas, como no pandas)
+
+            for numero, celulas in parser.parse():
+                if numero < linha_cabecalho:
+                    continue
+
+                if cabecalho is None:
+                    linha = celulas if numero == linha_cabecalho else {}
+                    cabecalho = nomes_colunas([linha.get(c) for c in range(1, max(linha, default=0) + 1)])
+                    selecionadas = colunas(cabecalho) if callable(colunas) else colunas
+                    for nome in selecionadas:
+                        if nome in cabecalho:
+                            posicoes.append((nome, cabecalho.index(nome) + 1))  # primeira ocorrência, como o pandas
+                    valores = [[] for _ in posicoes]
+                    parser.colunas = {coluna for _, coluna in posicoes}
+                    if numero == linha_cabecalho:
+                        continue
+
+                indice = numero - linha_cabecalho - 1
+                vazia = True
+                for destino, (_, coluna) in zip(valores, posicoes):
+                    # Linhas ausentes no XML viram linhas vazias
+                    if len(destino) < indice:
+                        destino.extend([None] * (indice - len(destino)))
+                    valor = celulas.get(coluna)
+                    if valor is not None:
+                        valor = _valor_celula(valor)
+                        if valor is not None:
+                            vazia = False
+                    destino.append(valor)
+                if not vazia:
+                    total = indice + 1
+        finally:
+            fonte.close()
+    finally:
+        if livro is not origem:
+            livro.close()
+
+    return pd.DataFrame({nome: destino[:total] for (nome, _), destino in zip(posicoes, valores)})
+
+
+def _ler_colunas_pandas(
+    origem: Any,
+    planilha: str,
+    skiprows: int,
+    header: int,
+    colunas: SelecaoColunas
+) -> pd.DataFrame:
+    """Mesmo resultado de ler_planilha_rapida pelo pd.read_excel (lê a planilha inteira)"""
+    df = pd.read_excel(origem, sheet_name=planilha, skiprows=skiprows, header=header, engine='openpyxl')
+    nomes = {}
+    for coluna in df.columns:
+        nomes.setdefault(str(coluna), coluna)  # primeira ocorrência, como na leitura rápida
+    selecionadas = colunas(list(nomes)) if callable(colunas) else colunas
+    return df[[nomes[nome] for nome in selecionadas if nome in nomes]]
+
+
+def ler_colunas(
+    origem: Any,
+    planilha: str,
+    skiprows: int,
+    header: int,
+    colunas: SelecaoColunas
+) -> pd.DataFrame:
+    """
+    Colunas de uma planilha .xlsx pela leitura rápida, ou pelo pd.read_excel se as
+    internas do openpyxl usadas por ela não existirem nesta versão.
+
+    Args:
+        origem: caminho do arquivo ou pd.ExcelFile aberto com o openpyxl
+    """
+    global _leitura_rapida_disponivel
+    if _leitura_rapida_disponivel:
+        livro = origem.book if isinstance(origem, pd.ExcelFile) else origem
+        try:
+            return ler_planilha_rapida(livro, planilha, skiprows, header, colunas)
+        except (AttributeError, TypeError):
+            _leitura_rapida_disponivel = False
+            logger.warning(
+                "Leitura rápida de Excel incompatível com o openpyxl instalado; usando pd.read_excel",
+                exc_info=True
+            )
+    return _ler_colunas_pandas(origem, planilha, skiprows, header, colunas)
+
+
+def ler_planilha(tarefa: TarefaPlanilha) -> Tuple[pd.DataFrame, float]:
+    """Lê uma planilha e retorna (DataFrame, segundos gastos na leitura)"""
+    caminho, engine, planilha, skiprows, header, colunas = tarefa
+    inicio = time.perf_counter()
+    if colunas is not None and engine == 'openpyxl':
+        df = ler_colunas(caminho, planilha, skiprows, header, colunas)
+    else:
+        df = pd.read_excel(
+            caminho, sheet_name=planilha, skiprows=skiprows, header=header, engine=engine,
+            usecols=colunas
+        )
+    return df, time.perf_counter() - inicio
+
+
+def ler_cabecalho(livro: Any, planilha: str, skiprows: int, header: int) -> List[str]:
+    """Nomes das colunas de uma planilha de um openpyxl.Workbook (read_only), sem ler os dados"""
+    aba = livro[planilha]
+    aba.reset_dimensions()
+    linha = next(aba.iter_rows(min_row=skiprows + header + 1, max_row=skiprows + header + 1, values_only=True), ())
+    return nomes_colunas(linha)
+
+
+def _get_pool(max_workers: int) -> Optional[ProcessPoolExecutor]:
+    """Pool de processos criado sob demanda e reaproveitado entre uploads"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            try:
+                # spawn: o processo da API tem threads (uvicorn, jobs) e fork com threads não é seguro
+                _pool = ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"Pool de leitura de Excel criado com {max_workers} processos")
+            except (OSError, NotImplementedError) as e:
+                logger.warning(f"Não foi possível criar o pool de processos ({e}); leitura será sequencial")
+                return None
+        return _pool
+
+
+def ler_planilhas_em_paralelo(tarefas: List[TarefaPlanilha], max_workers: int = 0) -> List[Tuple[pd.DataFrame, float]]:
+    """
+    Lê várias planilhas (de um ou mais arquivos) em paralelo, na ordem recebida.
+
+    Args:
+        max_workers: tamanho do pool (0 = número de CPUs). Com uma única tarefa
+            ou um único worker a leitura acontece no próprio processo.
+    """
+    workers = max_workers or os.cpu_count() or 1
+    pool = _get_pool(workers) if len(tarefas) > 1 and workers > 1 else None
+    if pool is None:
+        return [ler_planilha(tarefa) for tarefa in tarefas]
+    try:
+        return list(pool.map(ler_planilha, tarefas))
+    except BrokenProcessPool as e:
+        # Um worker morreu (ex.: falta de memória): descarta o pool e lê no próprio processo
+        logger.error(f"Pool de leitura de Excel quebrado ({e}); repetindo a leitura sequencialmente")
+        _descartar_pool(pool)
+        return [ler_planilha(tarefa) for tarefa in tarefas]
+
+
+def encerrar():
+    """Encerra o pool de leitura (chamado no shutdown da aplicação)"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _descartar_pool(pool: ProcessPoolExecutor):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
@@ -6,7 +6,7 @@ from typing import List
 
 from .core.config import settings
 from .database import engine, Base, get_db # Importa engine, Base e get_db
-from . import models, schemas, crud      # Importa módulos locais
+from . import models, schemas, crud, migrations, analytics_executor, excel_parsing      # Importa módulos locais
 from .routers import operacoes, robos, uploads, analytics, analytics_advanced        # Importa os routers de operações
 
 logger = logging.getLogger(__name__)
@@ -36,6 +36,10 @@ try:
     create_tables_in_schema(engine, "oficial")
     create_tables_in_schema(engine, "uploads_usuarios")
     print("Tabelas nos schemas 'oficial' e 'uploads_usuarios' verificadas/criadas.")
+
+    # Índices novos não chegam a tabelas já existentes via create(checkfirst=True)
+    for schema_init in ("oficial", "uploads_usuarios"):
+        migrations.aplicar_migracoes(engine, schema_init)
 except Exception as e_init:
     print(f"ERRO CRÍTICO durante a inicialização e criação de tabelas: {e_init}")
     # Em um cenário de produção, você pode querer que a aplicação não inicie se isso falhar.
@@ -53,6 +57,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],  # Permite ao frontend reenviar o ETag em If-None-Match
 )
 
 # Inclui os routers (onde os endpoints específicos são definidos)
@@ -62,6 +67,12 @@ app.include_router(uploads.router, prefix=settings.API_V1_STR)
 app.include_router(analytics.router, prefix=settings.API_V1_STR) # Inclui as rotas de /api/v1/analytics
 app.include_router(analytics_advanced.router, prefix=settings.API_V1_STR) # Inclui as rotas de /api/v1/analytics-advanced
 
+@app.on_event("shutdown")
+def encerrar_pools():
+    """Processos dos pools de análises e de leitura de Excel não devem sobreviver ao servidor"""
+    analytics_executor.encerrar()
+    excel_parsing.encerrar()
+
 # Endpoint raiz de verificação de saúde (health check)
 @app.get(f"{settings.API_V1_STR}/health", tags=["Health"])
 async def health_check():
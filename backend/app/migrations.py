@@ -0,0 +1,149 @@
+import logging
+from typing import List, NamedTuple, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from . import cache_analytics
+
+logger = logging.getLogger(__name__)
+
+SCHEMAS_APLICACAO = ("oficial", "uploads_usuarios")
+
+
+class Migracao(NamedTuple):
+    versao: int
+    descricao: str
+    comandos: List[str]        # SQL com {schema} no lugar do nome do schema
+    requer: Tuple[int, ...] = ()  # Versões que precisam estar aplicadas antes desta
+    ao_falhar: str = ""        # Orientação registrada no log se a migração falhar
+
+
+# Remove operações repetidas (mesma chave natural), mantendo a de menor id
+DEDUPLICAR_OPERACOES_SQL = """
+    DELETE FROM {schema}.operacoes o
+    USING {schema}.operacoes d
+    WHERE o.id > d.id
+      AND o.robo_id = d.robo_id
+      AND o."Abertura" IS NOT DISTINCT FROM d."Abertura"
+      AND o."Fechamento" IS NOT DISTINCT FROM d."Fechamento"
+      AND o."Resultado_Valor" IS NOT DISTINCT FROM d."Resultado_Valor"
+      AND o.ativo IS NOT DISTINCT FROM d.ativo
+"""
+
+
+# Mudanças de índices/estrutura que create(checkfirst=True) não leva a tabelas já existentes.
+# Só acrescente no fim, com versão maior; uma migração aplicada nunca roda de novo.
+#
+# Os CREATE INDEX rodam sem CONCURRENTLY (dentro da transação da migração), na subida da
+# API: enquanto o índice é construído, operacoes fica bloqueada para escrita (leituras
+# seguem). Em tabelas com milhões de linhas, crie antes o índice fora do horário de uso
+# com CREATE INDEX CONCURRENTLY e o mesmo nome; o IF NOT EXISTS torna a migração instantânea.
+MIGRACOES: List[Migracao] = [
+    Migracao(1, "Índice único da chave natural das operações", [
+        # Tabelas antigas já têm duplicadas: removidas na mesma transação, senão o índice não sobe
+        DEDUPLICAR_OPERACOES_SQL,
+        # A limpeza muda os dados: nova versão do schema para o cache e os ETags de todos os workers
+        cache_analytics.INCREMENTAR_VERSOES_SQL.format(
+            schema="{schema}", chaves=f"ARRAY[{cache_analytics.VERSAO_SCHEMA}, {cache_analytics.VERSAO_LIMPEZA}]"
+        ),
+        'CREATE UNIQUE INDEX IF NOT EXISTS ux_operacoes_chave_natural ON {schema}.operacoes '
+        '(robo_id, "Abertura", "Fechamento", "Resultado_Valor", ativo) NULLS NOT DISTINCT',
+    ], ao_falhar=(
+        "sem o índice, as inserções em massa de uploads falham; corrija a causa acima e reaplique "
+        "com DELETE /api/v1/operacoes/limpar-duplicadas/schema/{schema} ou reiniciando a API"
+    )),
+    Migracao(2, "Índice (Abertura, id) da listagem paginada", [
+        'CREATE INDEX IF NOT EXISTS ix_operacoes_abertura_id ON {schema}.operacoes ("Abertura", id)',
+    ]),
+    Migracao(3, "Índice (robo_id, Abertura, id) com as colunas das análises", [
+        # Com INCLUDE, as leituras por robô das análises (get_operacoes_frame) são index-only scans
+        'CREATE INDEX IF NOT EXISTS ix_operacoes_robo_abertura_cobertura ON {schema}.operacoes '
+        '(robo_id, "Abertura", id) INCLUDE ("Resultado_Valor", "Fechamento", ativo, lotes, tipo)',
+        # Substituído pelo índice acima (mesma chave)
+        'DROP INDEX IF EXISTS {schema}.ix_operacoes_robo_abertura_id',
+    ]),
+    Migracao(4, "Remove índices redundantes de operações", [
+        # robo_id e Abertura isolados são prefixos de (robo_id, Abertura, id) e de (Abertura, id),
+        # e id já tem o índice da chave primária (nomes do ORM e de create_tables.sql)
+        'DROP INDEX IF EXISTS {schema}.ix_operacoes_robo_id',
+        'DROP INDEX IF EXISTS {schema}."ix_operacoes_Abertura"',
+        'DROP INDEX IF EXISTS {schema}.ix_operacoes_id',
+        'DROP INDEX IF EXISTS {schema}.idx_operacoes_robo_id',
+        'DROP INDEX IF EXISTS {schema}.idx_operacoes_abertura',
+        'DROP INDEX IF EXISTS {schema}.idx_operacoes_robo_id_uploads',
+        'DROP INDEX IF EXISTS {schema}.idx_operacoes_abertura_uploads',
+    ], requer=(2, 3)),
+]
+
+
+def _criar_tabela_controle(engine: Engine, schema_name: str):
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {schema_name}.schema_migrations (
+                versao integer PRIMARY KEY,
+                descricao text NOT NULL,
+                aplicada_em timestamptz NOT NULL DEFAULT now()
+            )
+        """))
+
+
+def versoes_aplicadas(engine: Engine, schema_name: str) -> List[int]:
+    with engine.connect() as conn:
+        return [row[0] for row in conn.execute(text(
+            f"SELECT versao FROM {schema_name}.schema_migrations ORDER BY versao"
+        ))]
+
+
+def aplicar_migracoes(engine: Engine, schema_name: str) -> List[int]:
+    """
+    Aplica, em ordem, as migrações ainda não registradas em {schema}.schema_migrations.
+
+    Cada migração roda numa transação própria junto com o seu registro, sob um
+    advisory lock do schema (vários workers subindo ao mesmo tempo aplicam cada
+    migração uma única vez). Uma migração que falha fica pendente para a próxima
+    execução sem impedir as demais; só as que a listam em `requer` esperam por ela.
+
+    Returns:
+        Versões aplicadas nesta chamada
+    """
+    _criar_tabela_controle(engine, schema_name)
+    aplicadas: List[int] = []
+    pendentes = set()
+
+    for migracao in MIGRACOES:
+        if any(versao in pendentes for versao in migracao.requer):
+            pendentes.add(migracao.versao)
+            logger.error(
+                f"Migração {migracao.versao} ({migracao.descricao}) adiada no schema '{schema_name}': "
+                f"depende das migrações pendentes {sorted(pendentes & set(migracao.requer))}"
+            )
+            continue
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:chave))"),
+                             {"chave": f"migracoes:{schema_name}"})
+                ja_aplicada = conn.execute(
+                    text(f"SELECT 1 FROM {schema_name}.schema_migrations WHERE versao = :versao"),
+                    {"versao": migracao.versao}
+                ).first()
+                if ja_aplicada:
+                    continue
+
+                for comando in migracao.comandos:
+                    conn.execute(text(comando.format(schema=schema_name)))
+                conn.execute(
+                    text(f"INSERT INTO {schema_name}.schema_migrations (versao, descricao) VALUES (:versao, :descricao)"),
+                    {"versao": migracao.versao, "descricao": migracao.descricao}
+                )
+            aplicadas.append(migracao.versao)
+            logger.info(f"Migração {migracao.versao} aplicada no schema '{schema_name}': {migracao.descricao}")
+        except Exception as e:
+            pendentes.add(migracao.versao)
+            orientacao = f" ({migracao.ao_falhar.format(schema=schema_name)})" if migracao.ao_falhar else ""
+            logger.error(
+                f"Migração {migracao.versao} ({migracao.descricao}) falhou no schema '{schema_name}'"
+                f"{orientacao}: {e}"
+            )
+
+    return aplicadas
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Enum as DBEnum, ForeignKey 
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, Enum as DBEnum, ForeignKey, Index
 from sqlalchemy.orm import relationship # Renomeado para DBEnum para evitar conflito
 from sqlalchemy.sql import func # Para valores padrão como data/hora atual
 import enum # Módulo enum padrão do Python
@@ -28,11 +28,31 @@ class TipoOperacaoEnum(str, enum.Enum):
 
 class Operacao(Base):
     __tablename__ = "operacoes" # Nome da tabela no banco de dados
-    __table_args__ = {'schema': None}
+    __table_args__ = (
+        # Chave natural de uma operação: reenviar o mesmo arquivo não duplica linhas
+        # (NULLS NOT DISTINCT exige PostgreSQL 15+)
+        Index(
+            "ux_operacoes_chave_natural",
+            "robo_id", "Abertura", "Fechamento", "Resultado_Valor", "ativo",
+            unique=True,
+            postgresql_nulls_not_distinct=True,
+        ),
+        # Paginação por keyset (crud.get_operacoes_pagina): busca por ("Abertura", id)
+        Index("ix_operacoes_abertura_id", "Abertura", "id"),
+        # Leituras por robô ordenadas por Abertura; o INCLUDE permite index-only scan nas análises
+        Index(
+            "ix_operacoes_robo_abertura_cobertura",
+            "robo_id", "Abertura", "id",
+            postgresql_include=["Resultado_Valor", "Fechamento", "ativo", "lotes", "tipo"],
+        ),
+        # Tabelas já existentes recebem estes índices por app/migrations.py
+        {'schema': None},
+    )
     # Coluna de ID, chave primária, auto-incrementável
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    # Sem index=True em id, robo_id e Abertura: a chave primária e os índices compostos acima já os cobrem
+    id = Column(Integer, primary_key=True, autoincrement=True)
 
-    robo_id = Column(Integer, ForeignKey("robos.id", use_alter=True, name="fk_operacao_robo_id"), nullable=False, index=True) # Aponta para robos.id
+    robo_id = Column(Integer, ForeignKey("robos.id", use_alter=True, name="fk_operacao_robo_id"), nullable=False) # Aponta para robos.id
     # Removido o setup_robo direto, agora será via relacionamento
     # setup_robo = Column(String(100), index=True, nullable=False, name="Robo")
     
@@ -48,7 +68,7 @@ class Operacao(Base):
     resultado = Column(Float, nullable=False, name="Resultado_Valor")
 
     # Datas e Horas das operações - SEM timezone para preservar horários exatos do arquivo
-    data_abertura = Column(DateTime(timezone=False), index=True, nullable=False, name="Abertura")
+    data_abertura = Column(DateTime(timezone=False), nullable=False, name="Abertura")
     data_fechamento = Column(DateTime(timezone=False), nullable=True, name="Fechamento") # Pode ser nulo se a op estiver aberta
 
     # Informações adicionais da operação
@@ -73,6 +93,21 @@ class Operacao(Base):
         return (f"<Operacao(id={self.id}, robo_id='{self.robo_id}', "
                 f"resultado={self.resultado}, abertura='{self.data_abertura}')>")
 
+class VersaoDados(Base):
+    """
+    Versão dos dados do schema, incrementada na mesma transação de cada escrita
+    (ver cache_analytics.VersoesDados). Compartilhada por todos os workers.
+    """
+    __tablename__ = "versoes_dados"
+    __table_args__ = {'schema': None}
+
+    # robo_id (> 0), 0 = qualquer mudança no schema, -1 = mudança que atinge todos os robôs
+    chave = Column(Integer, primary_key=True, autoincrement=False)
+    versao = Column(BigInteger, nullable=False, server_default="0")
+
+    def __repr__(self):
+        return f"<VersaoDados(chave={self.chave}, versao={self.versao})>"
+
 def get_operacao_model_for_schema(schema_name: Optional[str]):
     # Retorna uma nova classe Operacao com o schema definido, se necessário
     # Isso é mais complexo e geralmente não é a forma padrão de lidar com schemas dinâmicos em queries
@@ -0,0 +1,128 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Textos distintos da coluna Tipo guardados por plano (protege contra colunas com texto livre)
+MAX_TIPOS_POR_PLANO = 1000
+
+# Valores de data de um arquivo usados para confirmar o formato guardado no plano
+AMOSTRA_FORMATO_DATA = 256
+
+
+def fingerprint(colunas: Sequence[Any], origem: str, separador: Optional[str] = None, encoding: Optional[str] = None) -> str:
+    """Identificador de um layout de arquivo: cabeçalho (na ordem), tipo de origem, separador e encoding"""
+    partes = [origem, separador or '', encoding or ''] + [str(coluna) for coluna in colunas]
+    return hashlib.sha1('\x1f'.join(partes).encode('utf-8')).hexdigest()[:16]
+
+
+class ParsePlan:
+    """
+    Decisões de parse de um layout de arquivo (mesmo cabeçalho, separador e encoding).
+
+    O mapa de renomeação sai do ColumnMapper na criação; os formatos de data, as
+    convenções numéricas e a classificação dos textos da coluna Tipo são
+    preenchidos pelo processador na primeira vez que cada coluna é interpretada
+    e reaproveitados nos uploads seguintes do mesmo layout.
+
+    Um plano é compartilhado por uploads simultâneos (threads do pool de arquivos
+    e dos jobs): as escritas passam pelos métodos abaixo, sob o lock do plano, e
+    to_dict devolve cópias. Leituras pontuais (dict.get) dispensam o lock.
+    """
+
+    def __init__(self, rename_map: Dict[str, str]):
+        self.rename_map = rename_map
+        self.formatos_data: Dict[str, str] = {}                   # coluna -> formato strftime
+        self.convencoes_numericas: Dict[str, Optional[str]] = {}  # coluna -> '.', ',' ou 'br' (None = limpeza completa)
+        self.tipos: Dict[Any, Any] = {}                           # texto da coluna Tipo -> TipoOperacaoEnum
+        self.criado_em = datetime.now()
+        self.usos = 0
+        self._lock = threading.Lock()
+
+    def definir_formato_data(self, coluna: str, formato: Optional[str]):
+        """Formato de data da coluna (None = esquece o formato, que volta a ser detectado)"""
+        with self._lock:
+            if formato:
+                self.formatos_data[coluna] = formato
+            else:
+                self.formatos_data.pop(coluna, None)
+
+    def definir_convencao_numerica(self, coluna: str, convencao: Optional[str]):
+        with self._lock:
+            self.convencoes_numericas[coluna] = convencao
+
+    def registrar_tipo(self, valor: Any, tipo: Any):
+        with self._lock:
+            if len(self.tipos) < MAX_TIPOS_POR_PLANO:
+                self.tipos[valor] = tipo
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "rename_map": dict(self.rename_map),
+                "formatos_data": dict(self.formatos_data),
+                "convencoes_numericas": dict(self.convencoes_numericas),
+                "tipos_conhecidos": len(self.tipos),
+                "criado_em": self.criado_em.isoformat(),
+                "usos": self.usos,
+            }
+
+
+class ParsePlanCache:
+    """Planos de parse por fingerprint do cabeçalho, com descarte LRU e contadores de acerto"""
+
+    def __init__(self, capacidade: int):
+        self._planos: "OrderedDict[str, ParsePlan]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._capacidade = capacidade
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_create(self, chave: str, criar: Callable[[], ParsePlan]) -> ParsePlan:
+        """
+        Plano do layout `chave`; na primeira vez é criado por `criar()` (que pode
+        levantar exceção, e então nada fica em cache).
+        """
+        with self._lock:
+            plano = self._planos.get(chave)
+            if plano is not None:
+                self._planos.move_to_end(chave)
+                self.hits += 1
+                plano.usos += 1
+                return plano
+            self.misses += 1
+
+        plano = criar()
+        plano.usos += 1
+        with self._lock:
+            # Outro upload do mesmo layout pode ter criado o plano em paralelo: vale o primeiro
+            plano = self._planos.setdefault(chave, plano)
+            self._planos.move_to_end(chave)
+            while len(self._planos) > self._capacidade:
+                self._planos.popitem(last=False)
+        logger.info(f"Novo plano de parse em cache ({chave}): {plano.rename_map}")
+        return plano
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            consultas = self.hits + self.misses
+            planos: List[Dict[str, Any]] = [
+                {"fingerprint": chave, **plano.to_dict()} for chave, plano in reversed(self._planos.items())
+            ]
+            return {
+                "capacidade": self._capacidade,
+                "planos_em_cache": len(self._planos),
+                "hits": self.hits,
+                "misses": self.misses,
+                "taxa_acerto": round(self.hits / consultas, 4) if consultas else None,
+                "planos": planos,
+            }
+
+
+parse_plans = ParsePlanCache(settings.PARSE_PLAN_CACHE_SIZE)
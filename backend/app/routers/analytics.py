@@ -1,14 +1,18 @@
 import logging
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Dict, Any, Union
 from datetime import datetime, date
 import pandas as pd
+import numpy as np
 from statistics import mean, stdev
 import math
+from fractions import Fraction
 
-from .. import crud, models, schemas
-from ..database import get_db
+from .. import analytics_executor, cache_analytics, crud_async, models, schemas
+from ..acumulador_metricas import AcumuladorMetricas
+from ..database import get_async_db
+from ..etags import ETagDados
 from ..core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -19,16 +23,29 @@ router = APIRouter(
     responses={404: {"description": "Não encontrado"}},
 )
 
+# 304 antes de qualquer consulta quando o cliente já tem a versão atual dos dados
+etag_dados = ETagDados(settings.DEFAULT_UPLOAD_SCHEMA)
+
+# Lista de operações ou DataFrame colunar de crud.get_operacoes_frame
+Operacoes = Union[List[models.Operacao], pd.DataFrame]
+
 class TradingMetricsCalculator:
     """Calculadora de métricas de trading"""
+
+    @staticmethod
+    def _resultados(operacoes: Operacoes) -> List[float]:
+        """Resultados não nulos, na ordem das operações"""
+        if isinstance(operacoes, pd.DataFrame):
+            return operacoes["resultado"].dropna().tolist()
+        return [op.resultado for op in operacoes if op.resultado is not None]
     
     @staticmethod
-    def calculate_basic_metrics(operacoes: List[models.Operacao]) -> Dict[str, Any]:
+    def calculate_basic_metrics(operacoes: Operacoes) -> Dict[str, Any]:
         """Calcula métricas básicas de trading"""
-        if not operacoes:
+        if len(operacoes) == 0:
             return TradingMetricsCalculator._empty_metrics()
         
-        resultados = [op.resultado for op in operacoes if op.resultado is not None]
+        resultados = TradingMetricsCalculator._resultados(operacoes)
         if not resultados:
             return TradingMetricsCalculator._empty_metrics()
         
@@ -69,12 +86,12 @@ class TradingMetricsCalculator:
         }
     
     @staticmethod
-    def calculate_advanced_metrics(operacoes: List[models.Operacao]) -> Dict[str, Any]:
+    def calculate_advanced_metrics(operacoes: Operacoes) -> Dict[str, Any]:
         """Calcula métricas avançadas de trading"""
-        if not operacoes:
+        if len(operacoes) == 0:
             return TradingMetricsCalculator._empty_advanced_metrics()
         
-        resultados = [op.resultado for op in operacoes if op.resultado is not None]
+        resultados = TradingMetricsCalculator._resultados(operacoes)
         if not resultados:
             return TradingMetricsCalculator._empty_advanced_metrics()
         
@@ -207,9 +224,260 @@ class TradingMetricsCalculator:
             "total_perdas": 0
         }
 
-@router.get("/metricas-basicas", summary="Métricas básicas de performance")
+class ArrayMetricsCalculator(TradingMetricsCalculator):
+    """
+    Mesmas métricas de TradingMetricsCalculator (mesma saída), calculadas em poucas
+    passadas vetorizadas sobre um array float64 dos resultados: somas acumuladas,
+    máscaras de ganho/perda, curva de equity por cumsum, drawdown por
+    maximum.accumulate e sequências por run-length.
+    """
+
+    @staticmethod
+    def _resultados_array(operacoes: Operacoes) -> np.ndarray:
+        """Resultados não nulos, na ordem das operações, como array float64"""
+        if isinstance(operacoes, pd.DataFrame):
+            return operacoes["resultado"].dropna().to_numpy(dtype=np.float64)
+        return np.fromiter(
+            (op.resultado for op in operacoes if op.resultado is not None), dtype=np.float64
+        )
+
+    @staticmethod
+    def _soma(valores: np.ndarray) -> float:
+        """Soma na mesma ordem (e com o mesmo arredondamento) do sum() do Python"""
+        return float(np.cumsum(valores)[-1]) if len(valores) else 0
+
+    @staticmethod
+    def _media(valores: np.ndarray) -> float:
+        """
+        Média exata e corretamente arredondada, como statistics.mean. Médias de
+        resultados em centavos caem com frequência exatamente em x.xx5, onde o
+        último bit da soma do NumPy muda o round(..., 2).
+
+        Cada valor vira mantissa inteira (53 bits, em duas metades de 27/26 bits)
+        vezes 2**expoente; as metades são somadas por expoente com bincount (exato
+        em float64 até 2**26 valores) e só os totais por expoente viram Fraction.
+        """
+        mantissas, expoentes = np.frexp(valores)
+        inteiros = (mantissas * 2.0 ** 53).astype(np.int64)
+        expoente_min = int(expoentes.min())
+        grupos = expoentes - expoente_min
+        somas_alto = np.bincount(grupos, weights=inteiros >> 26)
+        somas_baixo = np.bincount(grupos, weights=inteiros & (2 ** 26 - 1))
+
+        total = Fraction(0)
+        for grupo in np.flatnonzero(somas_alto.astype(bool) | somas_baixo.astype(bool)):
+            mantissa = (int(somas_alto[grupo]) << 26) + int(somas_baixo[grupo])
+            total += Fraction(mantissa) * Fraction(2) ** (int(grupo) + expoente_min - 53)
+        return float(total / len(valores))
+
+    @staticmethod
+    def _desvio_padrao(resultados: np.ndarray, resultado_medio: float) -> float:
+        """
+        Desvio padrão amostral pelo NumPy. Se ele cair perto de um empate no
+        arredondamento do desvio_padrao ou do sharpe_ratio (ou for praticamente
+        zero), os últimos bits importam e o cálculo é refeito com statistics.stdev
+        """
+        desvio = float(resultados.std(ddof=1))
+        if (
+            desvio <= 1e-9 * float(np.abs(resultados).max())
+            or ArrayMetricsCalculator._perto_de_empate(desvio, 2)
+            or ArrayMetricsCalculator._perto_de_empate(resultado_medio / desvio, 3)
+        ):
+            desvio = stdev(resultados.tolist())
+        return desvio
+
+    @staticmethod
+    def _perto_de_empate(valor: float, casas: int) -> bool:
+        """Se round(valor, casas) pode mudar com um erro relativo de até 1e-9"""
+        escalado = abs(valor) * 10 ** casas
+        return abs(escalado - math.floor(escalado) - 0.5) <= 1e-9 * max(escalado, 1)
+
+    @staticmethod
+    def _metricas_basicas(resultados: np.ndarray, equity: np.ndarray, total_operacoes: int,
+                          positivas: np.ndarray, negativas: np.ndarray) -> Dict[str, Any]:
+        n_positivas = int(np.count_nonzero(positivas))
+        n_negativas = int(np.count_nonzero(negativas))
+        win_rate = (n_positivas / total_operacoes) * 100 if total_operacoes > 0 else 0
+        gain_medio = ArrayMetricsCalculator._media(resultados[positivas]) if n_positivas else 0
+        loss_medio = abs(ArrayMetricsCalculator._media(resultados[negativas])) if n_negativas else 0
+
+        return {
+            "total_operacoes": total_operacoes,
+            "resultado_total": round(float(equity[-1]), 2),
+            "resultado_medio": round(ArrayMetricsCalculator._media(resultados), 2),
+            "operacoes_positivas": n_positivas,
+            "operacoes_negativas": n_negativas,
+            "operacoes_neutras": len(resultados) - n_positivas - n_negativas,
+            "win_rate": round(win_rate, 2),
+            "loss_rate": round(100 - win_rate, 2),
+            "maior_ganho": round(float(resultados.max()), 2),
+            "maior_perda": round(float(resultados.min()), 2),
+            "gain_medio": round(gain_medio, 2),
+            "loss_medio": round(loss_medio, 2)
+        }
+
+    @staticmethod
+    def calculate_basic_metrics(operacoes: Operacoes) -> Dict[str, Any]:
+        """Calcula métricas básicas de trading"""
+        resultados = ArrayMetricsCalculator._resultados_array(operacoes)
+        if len(resultados) == 0:
+            return ArrayMetricsCalculator._empty_metrics()
+        return ArrayMetricsCalculator._metricas_basicas(
+            resultados, np.cumsum(resultados), len(operacoes), resultados > 0, resultados < 0
+        )
+
+    @staticmethod
+    def calculate_advanced_metrics(operacoes: Operacoes) -> Dict[str, Any]:
+        """Calcula métricas avançadas de trading"""
+        resultados = ArrayMetricsCalculator._resultados_array(operacoes)
+        if len(resultados) == 0:
+            return ArrayMetricsCalculator._empty_advanced_metrics()
+
+        equity = np.cumsum(resultados)
+        positivas = resultados > 0
+        negativas = resultados < 0
+        basic_metrics = ArrayMetricsCalculator._metricas_basicas(
+            resultados, equity, len(operacoes), positivas, negativas
+        )
+
+        # Payoff Ratio
+        payoff = basic_metrics["gain_medio"] / basic_metrics["loss_medio"] if basic_metrics["loss_medio"] > 0 else 0
+
+        # Fator de Lucro
+        total_ganhos = ArrayMetricsCalculator._soma(resultados[positivas])
+        total_perdas = abs(ArrayMetricsCalculator._soma(resultados[negativas]))
+        fator_lucro = total_ganhos / total_perdas if total_perdas > 0 else float('inf') if total_ganhos > 0 else 0
+
+        # Drawdown: primeiro ponto de maior distância até o pico anterior
+        picos = np.maximum.accumulate(equity)
+        drawdowns = picos - equity
+        i_max = int(np.argmax(drawdowns))
+        max_drawdown = float(drawdowns[i_max]) if drawdowns[i_max] > 0 else 0
+        pico = float(picos[i_max])
+        max_drawdown_percent = (max_drawdown / pico * 100) if max_drawdown > 0 and pico > 0 else 0
+
+        # Desvio padrão dos resultados
+        std_deviation = ArrayMetricsCalculator._desvio_padrao(resultados, basic_metrics["resultado_medio"]) if len(resultados) > 1 else 0
+
+        # Sharpe Ratio simplificado (assumindo risk-free rate = 0)
+        sharpe_ratio = basic_metrics["resultado_medio"] / std_deviation if std_deviation > 0 else 0
+
+        # Recovery Factor
+        recovery_factor = basic_metrics["resultado_total"] / abs(max_drawdown) if max_drawdown != 0 else 0
+
+        # Consecutive wins/losses
+        max_consecutive_wins, max_consecutive_losses = ArrayMetricsCalculator._sequencias(np.sign(resultados))
+
+        return {
+            **basic_metrics,
+            "payoff_ratio": round(payoff, 3),
+            "fator_lucro": round(fator_lucro, 3),
+            "max_drawdown": round(max_drawdown, 2),
+            "max_drawdown_percent": round(max_drawdown_percent, 2),
+            "desvio_padrao": round(std_deviation, 2),
+            "sharpe_ratio": round(sharpe_ratio, 3),
+            "recovery_factor": round(recovery_factor, 3),
+            "max_consecutive_wins": max_consecutive_wins,
+            "max_consecutive_losses": max_consecutive_losses,
+            "total_ganhos": round(total_ganhos, 2),
+            "total_perdas": round(total_perdas, 2)
+        }
+
+    @staticmethod
+    def calculate_summary_metrics(resumo: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Métricas básicas a partir do resumo SQL de um robô (crud.get_resumo_por_robo)"""
+        if not resumo or not resumo["com_resultado"]:
+            return ArrayMetricsCalculator._empty_metrics()
+
+        total_operacoes = resumo["total_operacoes"]
+        win_rate = (resumo["positivas"] / total_operacoes) * 100 if total_operacoes > 0 else 0
+        gain_medio = resumo["soma_ganhos"] / resumo["positivas"] if resumo["positivas"] else 0
+        loss_medio = abs(resumo["soma_perdas"] / resumo["negativas"]) if resumo["negativas"] else 0
+        return {
+            "total_operacoes": total_operacoes,
+            "resultado_total": round(resumo["resultado_total"], 2),
+            "resultado_medio": round(resumo["resultado_total"] / resumo["com_resultado"], 2),
+            "operacoes_positivas": resumo["positivas"],
+            "operacoes_negativas": resumo["negativas"],
+            "operacoes_neutras": resumo["neutras"],
+            "win_rate": round(win_rate, 2),
+            "loss_rate": round(100 - win_rate, 2),
+            "maior_ganho": round(resumo["maior_resultado"], 2),
+            "maior_perda": round(resumo["menor_resultado"], 2),
+            "gain_medio": round(gain_medio, 2),
+            "loss_medio": round(loss_medio, 2)
+        }
+
+    @staticmethod
+    def calculate_accumulated_metrics(acumulador: AcumuladorMetricas) -> Dict[str, Any]:
+        """
+        Métricas avançadas a partir de um AcumuladorMetricas (operações lidas em
+        lotes); iguais às de calculate_advanced_metrics a menos de arredondamento
+        de ponto flutuante (média e desvio pela fórmula de Welford)
+        """
+        if acumulador.n == 0:
+            return ArrayMetricsCalculator._empty_advanced_metrics()
+
+        total_operacoes = acumulador.linhas
+        win_rate = (acumulador.positivas / total_operacoes) * 100 if total_operacoes > 0 else 0
+        gain_medio = acumulador.soma_ganhos / acumulador.positivas if acumulador.positivas else 0
+        loss_medio = abs(acumulador.soma_perdas / acumulador.negativas) if acumulador.negativas else 0
+        basic_metrics = {
+            "total_operacoes": total_operacoes,
+            "resultado_total": round(acumulador.soma, 2),
+            "resultado_medio": round(acumulador.media, 2),
+            "operacoes_positivas": acumulador.positivas,
+            "operacoes_negativas": acumulador.negativas,
+            "operacoes_neutras": acumulador.n - acumulador.positivas - acumulador.negativas,
+            "win_rate": round(win_rate, 2),
+            "loss_rate": round(100 - win_rate, 2),
+            "maior_ganho": round(acumulador.maior, 2),
+            "maior_perda": round(acumulador.menor, 2),
+            "gain_medio": round(gain_medio, 2),
+            "loss_medio": round(loss_medio, 2)
+        }
+
+        payoff = basic_metrics["gain_medio"] / basic_metrics["loss_medio"] if basic_metrics["loss_medio"] > 0 else 0
+        total_ganhos = acumulador.soma_ganhos if acumulador.positivas else 0
+        total_perdas = abs(acumulador.soma_perdas) if acumulador.negativas else 0
+        fator_lucro = total_ganhos / total_perdas if total_perdas > 0 else float('inf') if total_ganhos > 0 else 0
+
+        max_drawdown = acumulador.max_drawdown if acumulador.max_drawdown > 0 else 0
+        pico = acumulador.max_drawdown_pico
+        max_drawdown_percent = (max_drawdown / pico * 100) if max_drawdown > 0 and pico > 0 else 0
+
+        std_deviation = acumulador.desvio_padrao
+        sharpe_ratio = basic_metrics["resultado_medio"] / std_deviation if std_deviation > 0 else 0
+        recovery_factor = basic_metrics["resultado_total"] / abs(max_drawdown) if max_drawdown != 0 else 0
+
+        return {
+            **basic_metrics,
+            "payoff_ratio": round(payoff, 3),
+            "fator_lucro": round(fator_lucro, 3),
+            "max_drawdown": round(max_drawdown, 2),
+            "max_drawdown_percent": round(max_drawdown_percent, 2),
+            "desvio_padrao": round(std_deviation, 2),
+            "sharpe_ratio": round(sharpe_ratio, 3),
+            "recovery_factor": round(recovery_factor, 3),
+            "max_consecutive_wins": acumulador.max_ganhos,
+            "max_consecutive_losses": acumulador.max_perdas,
+            "total_ganhos": round(total_ganhos, 2),
+            "total_perdas": round(total_perdas, 2)
+        }
+
+    @staticmethod
+    def _sequencias(sinais: np.ndarray) -> tuple:
+        """Maiores sequências de sinais +1 (vitórias) e -1 (perdas), por run-length"""
+        inicios = np.flatnonzero(np.r_[True, sinais[1:] != sinais[:-1]])
+        tamanhos = np.diff(np.r_[inicios, len(sinais)])
+        sinal_da_sequencia = sinais[inicios]
+        ganhos = tamanhos[sinal_da_sequencia > 0]
+        perdas = tamanhos[sinal_da_sequencia < 0]
+        return (int(ganhos.max()) if len(ganhos) else 0, int(perdas.max()) if len(perdas) else 0)
+
+@router.get("/metricas-basicas", summary="Métricas básicas de performance", dependencies=[Depends(etag_dados)])
 async def get_metricas_basicas(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     robo_id: Optional[int] = Query(None, description="ID do robô específico"),
     schema: str = Query(settings.DEFAULT_UPLOAD_SCHEMA, description="Schema do banco de dados")
 ):
@@ -220,96 +488,131 @@ async def get_metricas_basicas(
     - Maior ganho, maior perda, gain/loss médios
     """
     try:
-        # Buscar operações
-        if robo_id:
-            operacoes = crud.get_operacoes_by_robo(db, robo_id, schema_name=schema, skip=0, limit=10000)
-        else:
-            operacoes = crud.get_operacoes(db, schema_name=schema, skip=0, limit=10000)
+        chave = await cache_analytics.resultados.chave(db, "metricas-basicas", schema, [robo_id] if robo_id else None)
+        resposta = cache_analytics.resultados.get(chave)
+        if resposta is not None:
+            return resposta
+
+        # Buscar operações (formato colunar, as 10000 mais recentes)
+        operacoes = await crud_async.get_operacoes_frame(
+            db, schema_name=schema, robo_ids=[robo_id] if robo_id else None, limit=10000, mais_recentes_primeiro=True
+        )
         
         # Calcular métricas
-        metricas = TradingMetricsCalculator.calculate_basic_metrics(operacoes)
+        metricas = await analytics_executor.executar(
+            ArrayMetricsCalculator.calculate_basic_metrics, operacoes[["resultado"]], operacoes=len(operacoes)
+        )
         
-        return {
+        resposta = {
             "metricas": metricas,
             "info": {
                 "robo_id": robo_id,
                 "schema": schema
             }
         }
+        cache_analytics.resultados.put(chave, resposta)
+        return resposta
         
     except Exception as e:
         logger.error(f"Erro ao calcular métricas básicas: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
-@router.get("/metricas-avancadas", summary="Métricas avançadas de performance")
+@router.get("/metricas-avancadas", summary="Métricas avançadas de performance", dependencies=[Depends(etag_dados)])
 async def get_metricas_avancadas(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     robo_id: Optional[int] = Query(None, description="ID do robô específico"),
-    schema: str = Query(settings.DEFAULT_UPLOAD_SCHEMA, description="Schema do banco de dados")
+    schema: str = Query(settings.DEFAULT_UPLOAD_SCHEMA, description="Schema do banco de dados"),
+    todas: bool = Query(False, description="Todas as operações, em ordem cronológica, lidas em lotes (memória constante)")
 ):
     """
     Retorna métricas avançadas de performance de trading:
     - Payoff Ratio, Fator de Lucro, Drawdown máximo
     - Sharpe Ratio, Recovery Factor
     - Vitórias/perdas consecutivas, desvio padrão
+
+    Por padrão usa as 10000 operações mais recentes; com `todas`, o histórico
+    inteiro passa por um AcumuladorMetricas, lote a lote. Nos dois casos as
+    operações são processadas em ordem cronológica (drawdown e sequências
+    consecutivas dependem da ordem).
     """
     try:
-        # Buscar operações
-        if robo_id:
-            operacoes = crud.get_operacoes_by_robo(db, robo_id, schema_name=schema, skip=0, limit=10000)
+        chave = await cache_analytics.resultados.chave(db, "metricas-avancadas", schema, [robo_id] if robo_id else None, todas=todas)
+        resposta = cache_analytics.resultados.get(chave)
+        if resposta is not None:
+            return resposta
+
+        if todas:
+            acumulador = AcumuladorMetricas()
+            async for resultados in crud_async.stream_resultados(
+                db, schema_name=schema, robo_ids=[robo_id] if robo_id else None
+            ):
+                acumulador.adicionar(resultados)
+            metricas = ArrayMetricsCalculator.calculate_accumulated_metrics(acumulador)
         else:
-            operacoes = crud.get_operacoes(db, schema_name=schema, skip=0, limit=10000)
-        
-        # Calcular métricas avançadas
-        metricas = TradingMetricsCalculator.calculate_advanced_metrics(operacoes)
+            # Buscar operações (formato colunar, as 10000 mais recentes)
+            operacoes = await crud_async.get_operacoes_frame(
+                db, schema_name=schema, robo_ids=[robo_id] if robo_id else None, limit=10000, mais_recentes_primeiro=True
+            )
+            # De volta à ordem cronológica, a mesma do caminho `todas`
+            resultados = operacoes[["resultado"]].iloc[::-1].reset_index(drop=True)
+            
+            # Calcular métricas avançadas
+            metricas = await analytics_executor.executar(
+                ArrayMetricsCalculator.calculate_advanced_metrics, resultados, operacoes=len(operacoes)
+            )
         
-        return {
+        resposta = {
             "metricas": metricas,
             "info": {
                 "robo_id": robo_id,
-                "schema": schema
+                "schema": schema,
+                "todas_operacoes": todas
             }
         }
+        cache_analytics.resultados.put(chave, resposta)
+        return resposta
         
     except Exception as e:
         logger.error(f"Erro ao calcular métricas avançadas: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
-@router.get("/comparacao-robos", summary="Comparação de performance entre robôs")
+@router.get("/comparacao-robos", summary="Comparação de performance entre robôs", dependencies=[Depends(etag_dados)])
 async def get_comparacao_robos(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     schema: str = Query(settings.DEFAULT_UPLOAD_SCHEMA, description="Schema do banco de dados")
 ):
     """
     Compara performance entre todos os robôs disponíveis.
     """
     try:
+        chave = await cache_analytics.resultados.chave(db, "comparacao-robos", schema)
+        resposta = cache_analytics.resultados.get(chave)
+        if resposta is not None:
+            return resposta
+
         # Buscar todos os robôs
-        robos = crud.get_robos(db, schema_name=schema, skip=0, limit=1000)
+        robos = await crud_async.get_robos(db, schema_name=schema, skip=0, limit=1000)
         
         if not robos:
             return {"robos": [], "resumo": {"total_robos": 0}}
         
-        comparacao = []
-        
-        for robo in robos:
-            # Buscar operações do robô
-            operacoes = crud.get_operacoes_by_robo(db, robo.id, schema_name=schema, skip=0, limit=10000)
-            
-            # Calcular métricas
-            metricas = TradingMetricsCalculator.calculate_basic_metrics(operacoes)
-            
-            comparacao.append({
+        # Agregados de todas as operações de todos os robôs num único GROUP BY
+        resumos = await crud_async.get_resumo_por_robo(db, schema_name=schema)
+
+        comparacao = [
+            {
                 "robo_id": robo.id,
                 "robo_nome": robo.nome,
-                "metricas": metricas
-            })
+                "metricas": ArrayMetricsCalculator.calculate_summary_metrics(resumos.get(robo.id))
+            }
+            for robo in robos
+        ]
         
         # Encontrar melhor e pior robô por resultado total
         melhor_robo = max(comparacao, key=lambda x: x["metricas"]["resultado_total"]) if comparacao else None
         pior_robo = min(comparacao, key=lambda x: x["metricas"]["resultado_total"]) if comparacao else None
         
-        return {
+        resposta = {
             "robos": comparacao,
             "resumo": {
                 "total_robos": len(comparacao),
@@ -317,14 +620,16 @@ async def get_comparacao_robos(
                 "pior_robo": pior_robo["robo_nome"] if pior_robo else None
             }
         }
+        cache_analytics.resultados.put(chave, resposta)
+        return resposta
         
     except Exception as e:
         logger.error(f"Erro ao comparar robôs: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
-@router.get("/equity-curve", summary="Curva de equity de um robô")
+@router.get("/equity-curve", summary="Curva de equity de um robô", dependencies=[Depends(etag_dados)])
 async def get_equity_curve(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     robo_id: int = Query(..., description="ID do robô"),
     schema: str = Query(settings.DEFAULT_UPLOAD_SCHEMA, description="Schema do banco de dados")
 ):
@@ -334,7 +639,7 @@ async def get_equity_curve(
     """
     try:
         # Buscar operações do robô
-        operacoes = crud.get_operacoes_by_robo(db, robo_id, schema_name=schema, skip=0, limit=10000)
+        operacoes = await crud_async.get_operacoes_by_robo(db, robo_id, schema_name=schema, skip=0, limit=10000)
         
         if not operacoes:
             raise HTTPException(status_code=404, detail=f"Nenhuma operação encontrada para o robô ID {robo_id}")
@@ -368,7 +673,7 @@ async def get_equity_curve(
             })
         
         # Buscar informações do robô
-        robo = crud.get_robo_by_id(db, robo_id, schema_name=schema)
+        robo = await crud_async.get_robo_by_id(db, robo_id, schema_name=schema)
         
         return {
             "robo": {
@@ -390,9 +695,9 @@ async def get_equity_curve(
         logger.error(f"Erro ao gerar curva de equity: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
-@router.get("/analise-por-ativo", summary="Análise de performance por ativo")
+@router.get("/analise-por-ativo", summary="Análise de performance por ativo", dependencies=[Depends(etag_dados)])
 async def get_analise_por_ativo(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     robo_id: Optional[int] = Query(None, description="ID do robô específico"),
     schema: str = Query(settings.DEFAULT_UPLOAD_SCHEMA, description="Schema do banco de dados")
 ):
@@ -400,27 +705,21 @@ async def get_analise_por_ativo(
     Retorna análise de performance agrupada por ativo.
     """
     try:
-        # Buscar operações
-        if robo_id:
-            operacoes = crud.get_operacoes_by_robo(db, robo_id, schema_name=schema, skip=0, limit=10000)
-        else:
-            operacoes = crud.get_operacoes(db, schema_name=schema, skip=0, limit=10000)
+        # Buscar operações (formato colunar, as 10000 mais recentes)
+        operacoes = await crud_async.get_operacoes_frame(
+            db, schema_name=schema, robo_ids=[robo_id] if robo_id else None, limit=10000, mais_recentes_primeiro=True
+        )
         
-        if not operacoes:
+        if operacoes.empty:
             return {"ativos": [], "resumo": {"total_ativos": 0}}
         
-        # Agrupar por ativo
-        ativos_dict = {}
-        for op in operacoes:
-            if op.ativo and op.resultado is not None:
-                if op.ativo not in ativos_dict:
-                    ativos_dict[op.ativo] = []
-                ativos_dict[op.ativo].append(op)
+        # Agrupar por ativo (na ordem em que aparecem)
+        com_ativo = operacoes[operacoes["ativo"].notna() & operacoes["resultado"].notna()]
         
         # Calcular métricas por ativo
         analise_ativos = []
-        for ativo, ops in ativos_dict.items():
-            metricas = TradingMetricsCalculator.calculate_basic_metrics(ops)
+        for ativo, ops in com_ativo.groupby("ativo", sort=False, observed=True):
+            metricas = ArrayMetricsCalculator.calculate_basic_metrics(ops)
             analise_ativos.append({
                 "ativo": ativo,
                 "metricas": metricas
@@ -440,4 +739,12 @@ async def get_analise_por_ativo(
         
     except Exception as e:
         logger.error(f"Erro ao analisar por ativo: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}") 
+
+@router.get("/cache", summary="Cache dos resultados das análises")
+async def get_cache_analytics():
+    """
+    Estatísticas do cache de resultados (hits, misses, taxa de acerto, descartes
+    por LRU e por invalidação após uploads/exclusões, resultados por endpoint).
+    """
+    return cache_analytics.resultados.stats()
@@ -1,11 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Body, Query
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from datetime import datetime
+import base64
+import json
 import logging
 
 # Importa dos módulos do mesmo nível (..) ou de nível superior
 from .. import crud, models, schemas # Ajustado para o nível correto
 from ..database import get_db
+from ..etags import ETagDados
 logger = logging.getLogger(__name__)
 
 router = APIRouter(
@@ -14,6 +18,24 @@ router = APIRouter(
     responses={404: {"description": "Não encontrado"}}, # Resposta padrão para 404
 )
 
+# 304 antes de qualquer consulta quando o cliente já tem a versão atual dos dados
+# (um por schema padrão dos endpoints)
+etag_oficial = ETagDados("oficial")
+etag_uploads = ETagDados("uploads_usuarios")
+
+def _codificar_cursor(operacao: models.Operacao) -> str:
+    """Cursor opaco com a posição (Abertura, id) da última operação da página"""
+    posicao = json.dumps([operacao.data_abertura.isoformat(), operacao.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(posicao.encode("utf-8")).decode("ascii").rstrip("=")
+
+def _decodificar_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        posicao = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        abertura, operacao_id = json.loads(posicao)
+        return datetime.fromisoformat(abertura), int(operacao_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido.")
+
 # --- ALTERAÇÃO NO ENDPOINT DE CRIAÇÃO DE OPERAÇÃO ---
 @router.post("/", response_model=schemas.OperacaoRead, status_code=201)
 def criar_nova_operacao(
@@ -71,7 +93,7 @@ def criar_nova_operacao(
     return db_operacao
 
 # Endpoint para listar operações (exemplo)
-@router.get("/", response_model=List[schemas.OperacaoRead])
+@router.get("/", response_model=List[schemas.OperacaoRead], dependencies=[Depends(etag_oficial)])
 def listar_operacoes(
     db: Session = Depends(get_db),
     robo_id: Optional[int] = Query(None, description="Filtra operações por um único ID de robô"),
@@ -84,18 +106,48 @@ def listar_operacoes(
     Retorna uma lista de operações, com filtros opcionais por robô(s).
     """
     if robo_ids:
+        # As `limit` operações mais recentes de cada robô, numa única consulta
         robot_id_list = [int(rid) for rid in robo_ids.split(',') if rid.isdigit()]
-        all_ops = []
-        for r_id in robot_id_list:
-            ops = crud.get_operacoes_by_robo(db=db, robo_id=r_id, schema_name=schema, limit=limit)
-            all_ops.extend(ops)
-        return all_ops
+        return crud.get_operacoes_by_robos(
+            db, robot_id_list, schema_name=schema, limit_por_robo=limit, mais_recentes_primeiro=True
+        )
         
     if robo_id:
         return crud.get_operacoes_by_robo(db=db, robo_id=robo_id, schema_name=schema, skip=skip, limit=limit)
     
     return crud.get_operacoes(db=db, schema_name=schema, skip=skip, limit=limit)
 
+@router.get("/pagina/", response_model=schemas.OperacaoPage, dependencies=[Depends(etag_oficial)])
+def listar_operacoes_paginado(
+    db: Session = Depends(get_db),
+    robo_id: Optional[int] = Query(None, description="Filtra operações por um único ID de robô"),
+    robo_ids: Optional[str] = Query(None, description="Filtra operações por uma lista de IDs de robôs separados por vírgula"),
+    schema: str = Query("oficial", description="Schema do banco de dados"),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior (vazio = primeira página)"),
+    limit: int = Query(1000, ge=1, le=10000)
+):
+    """
+    Lista operações da mais recente para a mais antiga, uma página por vez.
+
+    Ao contrário de skip/limit em GET /operacoes/, a página seguinte é buscada a
+    partir do `next_cursor` da anterior, com o mesmo custo em qualquer profundidade.
+    Repita a chamada com `cursor=next_cursor` até que ele venha nulo.
+    """
+    filtro_robos = None
+    if robo_ids:
+        filtro_robos = [int(rid) for rid in robo_ids.split(',') if rid.isdigit()]
+    elif robo_id:
+        filtro_robos = [robo_id]
+
+    apos = _decodificar_cursor(cursor) if cursor else None
+    operacoes, tem_mais = crud.get_operacoes_pagina(
+        db, schema_name=schema, limit=limit, apos=apos, robo_ids=filtro_robos
+    )
+    return {
+        "items": operacoes,
+        "next_cursor": _codificar_cursor(operacoes[-1]) if tem_mais else None,
+    }
+
 @router.get("/{operacao_id}", response_model=schemas.OperacaoRead)
 def ler_operacao_por_id(
     operacao_id: int,
@@ -173,7 +225,7 @@ def deletar_todas_operacoes_robo(
         "operacoes_deletadas": deleted_count
     }
 
-@router.get("/estatisticas/geral", status_code=200)
+@router.get("/estatisticas/geral", status_code=200, dependencies=[Depends(etag_uploads)])
 def obter_estatisticas_operacoes(
     db: Session = Depends(get_db),
     schema: str = "uploads_usuarios"  # Schema padrão
@@ -188,19 +240,20 @@ def obter_estatisticas_operacoes(
     # Buscar operações mais recentes
     operacoes_recentes = crud.get_operacoes(db, schema_name=schema, skip=0, limit=5)
     
-    # Contar operações por robô
-    robos = crud.get_robos(db, schema_name=schema, limit=50)
-    operacoes_por_robo = []
-    
-    for robo in robos:
-        count_ops = len(crud.get_operacoes_by_robo(db, robo_id=robo.id, schema_name=schema, limit=10000))
-        if count_ops > 0:
-            operacoes_por_robo.append({
-                "robo_id": robo.id,
-                "robo_nome": robo.nome,
-                "total_operacoes": count_ops
-            })
-    
+    # Contar operações por robô (GROUP BY no banco, sem limite de linhas)
+    resumos = crud.get_resumo_por_robo(db, schema_name=schema)
+    nomes = crud.get_nomes_robos(db, resumos.keys(), schema_name=schema)
+    operacoes_por_robo = [
+        {
+            "robo_id": robo_id,
+            "robo_nome": nomes.get(robo_id),
+            "total_operacoes": resumo["total_operacoes"],
+            "primeira_operacao": resumo["primeira_abertura"],
+            "ultima_operacao": resumo["ultima_abertura"]
+        }
+        for robo_id, resumo in resumos.items()
+    ]
+
     return {
         "total_operacoes": total_operacoes,
         "total_robos": total_robos,
@@ -278,6 +331,46 @@ def limpar_todos_dados_schema(
             detail=f"Erro interno ao limpar dados: {str(e)}"
         )
 
+@router.delete("/limpar-duplicadas/schema/{schema_name}", status_code=200)
+def limpar_operacoes_duplicadas_schema(
+    schema_name: str,
+    confirmar: bool = Body(..., embed=True, description="Confirmação obrigatória para remover as duplicadas"),
+    db: Session = Depends(get_db)
+):
+    """
+    Remove operações repetidas (mesmo robô, abertura, fechamento, resultado e ativo),
+    mantendo a mais antiga, e cria o índice único que impede novas duplicações.
+
+    Necessário apenas em schemas que já tinham duplicadas antes do índice existir.
+    Requer confirmação explícita via body {'confirmar': true}.
+    """
+    if not confirmar:
+        raise HTTPException(
+            status_code=400,
+            detail="Para remover as duplicadas, é necessário confirmar explicitamente enviando {'confirmar': true}"
+        )
+
+    if schema_name not in ["oficial", "uploads_usuarios"]:
+        raise HTTPException(
+            status_code=400,
+            detail="Schema deve ser 'oficial' ou 'uploads_usuarios'"
+        )
+
+    try:
+        removidas = crud.delete_duplicate_operacoes(db, schema_name=schema_name)
+        logger.warning(f"Limpeza de duplicadas no schema '{schema_name}': {removidas} operações removidas")
+        return {
+            "message": f"Operações duplicadas removidas do schema '{schema_name}'",
+            "schema_name": schema_name,
+            "operacoes_removidas": removidas
+        }
+    except Exception as e:
+        logger.error(f"Erro ao remover duplicadas do schema '{schema_name}': {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro interno ao remover duplicadas: {str(e)}"
+        )
+
 # No futuro:
 # - Endpoint para upload de arquivo CSV/Excel que lê, processa com Pandas
 #   e usa crud.create_operacao para cada linha.
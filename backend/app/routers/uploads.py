@@ -1,16 +1,32 @@
+import itertools
 import logging
+import math
 import os
 import re
+import tempfile
+import time
+import warnings
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Tuple, Any
+from typing import List, Optional, Dict, Tuple, Any, Callable, Union, FrozenSet
+import numpy as np
 import pandas as pd
 import io
 from decimal import Decimal, InvalidOperation
 
-from .. import crud, models, schemas
-from ..database import get_db
+from pandas.tseries.api import guess_datetime_format
+
+from .. import crud, excel_parsing, models, schemas
+from ..database import get_db, SessionLocal
 from ..core.config import settings
+from ..parse_plans import AMOSTRA_FORMATO_DATA, ParsePlan, fingerprint, parse_plans
+from ..upload_jobs import UploadJob, upload_jobs
 
 logger = logging.getLogger(__name__)
 
@@ -73,6 +89,80 @@ class NumericCleaningUtility:
             logger.warning(f"Falha ao converter valor numérico '{str_value}': {e}")
             return None
 
+    @staticmethod
+    def clean_decimal_series(values: pd.Series, allow_comma_as_decimal: bool = True) -> pd.Series:
+        """
+        Versão vetorizada de clean_decimal_string para uma coluna inteira.
+
+        Aplica as mesmas regras (remoção de caracteres, formato brasileiro 1.234,56)
+        com operações de string do pandas em vez de um regex por valor.
+
+        Returns:
+            Series float64 com NaN onde a conversão falhar
+        """
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            return values.astype('float64')
+
+        str_values = values.astype(str).str.strip()
+        nulls = values.isna() | str_values.eq('') | str_values.str.lower().isin(['nan', 'null'])
+
+        cleaned = str_values.str.replace(r'[^\d.,+-]', '', regex=True)
+        if allow_comma_as_decimal:
+            # 1.234,56 -> remove separadores de milhares antes de trocar a vírgula
+            both = cleaned.str.contains(',', regex=False) & cleaned.str.contains('.', regex=False)
+            cleaned = cleaned.mask(both, cleaned.str.replace('.', '', regex=False))
+            cleaned = cleaned.str.replace(',', '.', regex=False)
+
+        cleaned = cleaned.mask(nulls | cleaned.eq(''))
+        try:
+            return cleaned.astype('float64')
+        except (ValueError, TypeError):
+            # Algum valor não é numérico: converte individualmente para marcar só ele como NaN
+            return cleaned.map(NumericCleaningUtility._to_float_or_nan).astype('float64')
+
+    # Caracteres aceitos por convenção numérica, na ordem de preferência da detecção:
+    # '.' = 1234.56, ',' = 1234,56, 'br' = 1.234,56 (vírgula decimal com ponto de milhar)
+    DECIMAL_CONVENTIONS = {
+        '.': frozenset('0123456789+-.'),
+        ',': frozenset('0123456789+-,'),
+        'br': frozenset('0123456789+-.,'),
+    }
+
+    @staticmethod
+    def detect_decimal_convention(chars: set) -> Optional[str]:
+        """Convenção numérica de uma coluna a partir dos caracteres usados nela (None = precisa de limpeza completa)"""
+        for convention, allowed in NumericCleaningUtility.DECIMAL_CONVENTIONS.items():
+            if chars <= allowed:
+                return convention
+        return None
+
+    @staticmethod
+    def convert_with_convention(str_values: pd.Series, convention: str) -> Optional[pd.Series]:
+        """
+        Conversão direta de textos que só têm dígitos, sinais e os separadores da
+        convenção: mesmo resultado de clean_decimal_series, sem regex, strip nem busca
+        de textos nulos. Retorna None se algum valor não converter (usar clean_decimal_series).
+        """
+        cleaned = str_values
+        if convention == 'br':
+            both = cleaned.str.contains(',', regex=False) & cleaned.str.contains('.', regex=False)
+            cleaned = cleaned.mask(both, cleaned.str.replace('.', '', regex=False))
+        if convention != '.':
+            cleaned = cleaned.str.replace(',', '.', regex=False)
+        try:
+            return cleaned.astype('float64')
+        except (ValueError, TypeError):
+            return None
+
+    @staticmethod
+    def _to_float_or_nan(value: Any) -> float:
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return math.nan
+        try:
+            return float(value)
+        except (ValueError, TypeError):
+            return math.nan
+
 class ColumnMapper:
     """Utilitário para mapeamento inteligente de colunas do CSV"""
     
@@ -106,50 +196,48 @@ class ColumnMapper:
         
         return None
     
+    @staticmethod
+    def _targets() -> List[Tuple[List[str], bool, str]]:
+        """(nomes possíveis, obrigatória, nome padronizado) de cada coluna usada no processamento"""
+        return [
+            (settings.OPEN_TIME_COLUMNS, True, 'Abertura'),
+            (settings.CLOSE_TIME_COLUMNS, False, 'Fechamento'),
+            ([settings.PRIMARY_RESULT_COLUMN_CSV] + settings.FALLBACK_RESULT_COLUMNS_CSV, True, settings.RESULT_COLUMN_NAME),
+            (settings.ATIVO_COLUMNS, False, 'Ativo'),
+            (settings.LOTES_COLUMNS, False, 'Lotes'),
+            (settings.TIPO_COLUMNS, False, 'Tipo'),
+            # Coluna de robô (para Excel com múltiplos robôs)
+            (settings.ROBO_COLUMNS, False, settings.ROBO_COLUMN_NAME),
+        ]
+
     def create_rename_map(self) -> Dict[str, str]:
         """Cria mapa de renomeação para padronizar nomes das colunas"""
         rename_map = {}
-        
-        # Mapear coluna de abertura
-        open_col = self.find_column(settings.OPEN_TIME_COLUMNS, required=True)
-        if open_col != 'Abertura':
-            rename_map[open_col] = 'Abertura'
-        
-        # Mapear coluna de fechamento (opcional)
-        close_col = self.find_column(settings.CLOSE_TIME_COLUMNS, required=False)
-        if close_col and close_col != 'Fechamento':
-            rename_map[close_col] = 'Fechamento'
-        
-        # Mapear coluna de resultado
-        result_col = self.find_column(
-            [settings.PRIMARY_RESULT_COLUMN_CSV] + settings.FALLBACK_RESULT_COLUMNS_CSV,
-            required=True
-        )
-        if result_col != settings.RESULT_COLUMN_NAME:
-            rename_map[result_col] = settings.RESULT_COLUMN_NAME
-        
-        # Mapear outras colunas opcionais
-        ativo_col = self.find_column(settings.ATIVO_COLUMNS, required=False)
-        if ativo_col and ativo_col != 'Ativo':
-            rename_map[ativo_col] = 'Ativo'
-        
-        lotes_col = self.find_column(settings.LOTES_COLUMNS, required=False)
-        if lotes_col and lotes_col != 'Lotes':
-            rename_map[lotes_col] = 'Lotes'
-        
-        tipo_col = self.find_column(settings.TIPO_COLUMNS, required=False)
-        if tipo_col and tipo_col != 'Tipo':
-            rename_map[tipo_col] = 'Tipo'
-        
-        # Mapear coluna de robô (para Excel com múltiplos robôs)
-        robo_col = self.find_column(settings.ROBO_COLUMNS, required=False)
-        if robo_col and robo_col != settings.ROBO_COLUMN_NAME:
-            rename_map[robo_col] = settings.ROBO_COLUMN_NAME
-        
+        for target_columns, required, standard_name in self._targets():
+            found_col = self.find_column(target_columns, required=required)
+            if found_col and found_col != standard_name:
+                rename_map[found_col] = standard_name
         return rename_map
 
+    def used_columns(self) -> List[str]:
+        """
+        Colunas do arquivo (nomes originais) que o processamento usa; o restante
+        pode ser descartado já na leitura. Levanta CSVProcessingError se faltar
+        uma coluna obrigatória, como create_rename_map.
+        """
+        used = []
+        for target_columns, required, _ in self._targets():
+            found_col = self.find_column(target_columns, required=required)
+            if found_col and found_col not in used:
+                used.append(found_col)
+        return used
+
 class CSVOperationProcessor:
     """Processador principal para operações de CSV"""
+
+    # Palavras-chave para mapear a coluna Tipo (checadas nesta ordem)
+    COMPRA_KEYWORDS = ['COMPRA', 'BUY', 'C']
+    VENDA_KEYWORDS = ['VENDA', 'SELL', 'V']
     
     def __init__(self, df: pd.DataFrame, filename: str):
         self.df = df
@@ -158,7 +246,32 @@ class CSVOperationProcessor:
         self.processed_count = 0
         self.error_count = 0
         self.errors = []
+        self.error_categories: Dict[str, int] = {}
+        self.rows_in_previous_chunks = 0
+        self.duplicate_count = 0
+        self.incremental_skipped_count = 0
+        self.plano = ParsePlan({})  # substituído pelo plano em cache do cabeçalho em process_dataframe
+        self._plano_chave: Optional[str] = None
     
+    def process_chunk(self, chunk: pd.DataFrame, limite_abertura: Any = None) -> pd.DataFrame:
+        """
+        Processa um bloco de um arquivo lido em partes (modo streaming).
+
+        Erros e contadores se acumulam entre os blocos; o índice do bloco deve
+        continuar o do bloco anterior (como em pd.read_csv(chunksize=...))
+        para que os números de linha dos erros fiquem corretos.
+
+        Args:
+            limite_abertura: modo incremental, ver filter_incremental
+
+        Returns:
+            DataFrame das linhas válidas do bloco (ver process_rows_vectorized)
+        """
+        self.rows_in_previous_chunks += len(self.df)
+        self.df = chunk
+        self.process_dataframe()
+        return self.process_rows_vectorized(self.filter_incremental(self.df, limite_abertura))
+
     def process_dataframe(self) -> pd.DataFrame:
         """Processa e limpa o DataFrame completo"""
         logger.info(f"Processando CSV '{self.filename}'. Shape: {self.df.shape}")
@@ -168,16 +281,32 @@ class CSVOperationProcessor:
         self.df.columns = self.df.columns.str.strip()
         
         # Mapear colunas
-        mapper = ColumnMapper(list(self.df.columns))
-        rename_map = mapper.create_rename_map()
-        
-        if rename_map:
-            self.df.rename(columns=rename_map, inplace=True)
-            logger.info(f"Colunas renomeadas: {rename_map}")
+        self._apply_parse_plan()
         
         logger.info(f"Colunas após mapeamento: {list(self.df.columns)}")
         
         return self.df
+
+    def _plan_key(self, columns: List[str]) -> str:
+        """Fingerprint do layout do arquivo para o cache de planos de parse"""
+        return fingerprint(columns, 'csv', settings.CSV_SEPARATOR, settings.CSV_ENCODING)
+
+    def _apply_parse_plan(self):
+        """
+        Renomeia as colunas pelo plano de parse do cabeçalho. O ColumnMapper só roda
+        na primeira vez que o layout aparece; nos blocos seguintes do mesmo arquivo
+        o plano já associado é reaproveitado sem nova consulta ao cache.
+        """
+        columns = list(self.df.columns)
+        chave = self._plan_key(columns)
+        if chave != self._plano_chave:
+            self.plano = parse_plans.get_or_create(chave, lambda: ParsePlan(ColumnMapper(columns).create_rename_map()))
+            self._plano_chave = chave
+
+        rename_map = self.plano.rename_map
+        if rename_map:
+            self.df.rename(columns=rename_map, inplace=True)
+            logger.info(f"Colunas renomeadas: {rename_map}")
     
     def process_single_row(self, index: int, row: pd.Series) -> Optional[schemas.OperacaoCreate]:
         """
@@ -192,20 +321,14 @@ class CSVOperationProcessor:
             resultado_raw = row.get(settings.RESULT_COLUMN_NAME)
             
             if pd.isna(data_abertura_raw) or pd.isna(resultado_raw):
-                self._add_error(index, "Campos obrigatórios ausentes (Abertura ou Resultado)")
+                self._add_error(index, "Campos obrigatórios ausentes (Abertura ou Resultado)", category='campos_obrigatorios')
                 return None
             
             # Converter data de abertura - PRESERVAR HORÁRIO EXATO DO ARQUIVO
             try:
-                # Usar utc=False para não assumir UTC e manter horário local exato
-                data_abertura = pd.to_datetime(data_abertura_raw, dayfirst=True, utc=False, errors='raise')
-                # Garantir que seja naive (sem timezone) para preservar horário exato
-                if hasattr(data_abertura, 'tz_localize'):
-                    data_abertura = data_abertura.tz_localize(None)
-                elif data_abertura.tz is not None:
-                    data_abertura = data_abertura.replace(tzinfo=None)
+                data_abertura = self._parse_datetime_value(data_abertura_raw)
             except Exception as e:
-                self._add_error(index, f"Data abertura inválida '{data_abertura_raw}': {e}")
+                self._add_error(index, f"Data abertura inválida '{data_abertura_raw}': {e}", category='abertura_invalida')
                 return None
             
             # Converter data de fechamento (opcional) - PRESERVAR HORÁRIO EXATO DO ARQUIVO
@@ -213,21 +336,18 @@ class CSVOperationProcessor:
             fechamento_raw = row.get('Fechamento')
             if pd.notna(fechamento_raw):
                 try:
-                    # Usar utc=False para não assumir UTC e manter horário local exato
-                    data_fechamento = pd.to_datetime(fechamento_raw, dayfirst=True, utc=False, errors='raise')
-                    # Garantir que seja naive (sem timezone) para preservar horário exato
-                    if hasattr(data_fechamento, 'tz_localize'):
-                        data_fechamento = data_fechamento.tz_localize(None)
-                    elif data_fechamento.tz is not None:
-                        data_fechamento = data_fechamento.replace(tzinfo=None)
+                    data_fechamento = self._parse_datetime_value(fechamento_raw)
                 except Exception as e:
-                    self._add_error(index, f"Data fechamento inválida '{fechamento_raw}': {e}", level='warning')
+                    self._add_error(
+                        index, f"Data fechamento inválida '{fechamento_raw}': {e}", level='warning',
+                        category='fechamento_invalido'
+                    )
                     # Continua processamento mesmo com erro no fechamento
             
             # Converter resultado
             resultado = self.numeric_cleaner.clean_decimal_string(resultado_raw)
             if resultado is None:
-                self._add_error(index, f"Resultado inválido '{resultado_raw}'")
+                self._add_error(index, f"Resultado inválido '{resultado_raw}'", category='resultado_invalido')
                 return None
             
             # Processar campos opcionais
@@ -252,21 +372,36 @@ class CSVOperationProcessor:
             self._add_error(index, f"Erro inesperado: {e}")
             return None
     
-    def _add_error(self, index: int, message: str, level: str = 'error'):
-        """Adiciona erro à lista de erros com contexto"""
-        line_num = index + settings.CSV_SKIPROWS + 2  # +2 para linha real do arquivo
+    def registrar_insercao(self, duplicadas: int, erros_db: List[Tuple[Any, str]]):
+        """Contabiliza o retorno de crud.bulk_create_operacoes (duplicadas e linhas rejeitadas pelo banco)"""
+        self.duplicate_count += duplicadas
+        for index, erro in erros_db:
+            self._add_error(index, f"Erro ao salvar no banco: {erro}", category='erro_banco')
+
+    def _line_number(self, index: int) -> int:
+        """Número da linha no arquivo original a partir do índice do DataFrame"""
+        return index + settings.CSV_SKIPROWS + 2  # +2 para linha real do arquivo
+
+    def _add_error(self, index: int, message: str, level: str = 'error', category: str = 'erro_inesperado'):
+        """
+        Adiciona erro à lista de erros com contexto.
+
+        O log de cada linha é só em DEBUG: arquivos com muitas linhas inválidas
+        inundavam o log; o total por categoria sai no resumo do processamento.
+        """
+        line_num = self._line_number(index)
         error_entry = {
             'linha': line_num,
             'erro': message,
-            'nivel': level
+            'nivel': level,
+            'categoria': category
         }
         self.errors.append(error_entry)
+        self.error_categories[category] = self.error_categories.get(category, 0) + 1
         
         if level == 'error':
             self.error_count += 1
-            logger.warning(f"Linha {line_num}: {message}")
-        else:
-            logger.info(f"Linha {line_num}: {message}")
+        logger.debug(f"Linha {line_num}: {message}")
     
     def _clean_string_field(self, value: Any) -> Optional[str]:
         """Limpa campo de string"""
@@ -283,32 +418,675 @@ class CSVOperationProcessor:
         value_str = str(value).upper().strip()
         
         # Mapeamentos flexíveis
-        if any(keyword in value_str for keyword in ['COMPRA', 'BUY', 'C']):
+        if any(keyword in value_str for keyword in self.COMPRA_KEYWORDS):
             return schemas.TipoOperacaoEnum.COMPRA
-        elif any(keyword in value_str for keyword in ['VENDA', 'SELL', 'V']):
+        elif any(keyword in value_str for keyword in self.VENDA_KEYWORDS):
             return schemas.TipoOperacaoEnum.VENDA
         
         return schemas.TipoOperacaoEnum.DESCONHECIDO
+
+    @staticmethod
+    def _parse_datetime_value(value: Any) -> pd.Timestamp:
+        """Converte um valor de data/hora preservando o horário exato do arquivo (sem timezone)"""
+        # Usar utc=False para não assumir UTC e manter horário local exato
+        parsed = pd.to_datetime(value, dayfirst=True, utc=False, errors='raise')
+        # Garantir que seja naive (sem timezone) para preservar horário exato
+        if hasattr(parsed, 'tz_localize'):
+            parsed = parsed.tz_localize(None)
+        elif parsed.tz is not None:
+            parsed = parsed.replace(tzinfo=None)
+        return parsed
+
+    @staticmethod
+    def _detect_datetime_format(values: pd.Series) -> Optional[str]:
+        """
+        Formato (strftime) do primeiro valor de texto da coluna, com dia primeiro:
+        o mesmo que o pd.to_datetime(dayfirst=True) inferiria. None se não houver
+        texto ou o formato não for reconhecido (o parse volta a inferir).
+        """
+        index = values.first_valid_index()
+        first = values[index] if index is not None else None
+        if not isinstance(first, str):
+            return None
+        return guess_datetime_format(first.strip(), dayfirst=True)
+
+    @staticmethod
+    def _formato_plano_confirmado(values: pd.Series, plan_format: str, detected: Optional[str]) -> bool:
+        """
+        Se o formato de data do plano vale para este arquivo, verificado numa amostra
+        espalhada pela coluna: todos os valores da amostra seguem o formato do plano e,
+        havendo um formato detectado neste arquivo (dia primeiro, pelo primeiro valor),
+        a amostra o contradiz. Assim um arquivo com dia e mês trocados e todos os dias
+        até 12 não herda o formato de outro arquivo do mesmo layout.
+        """
+        present = values.dropna()
+        if present.empty:
+            return True
+        posicoes = np.unique(np.linspace(0, len(present) - 1, min(len(present), AMOSTRA_FORMATO_DATA)).astype(int))
+        amostra = present.iloc[posicoes].astype(str).str.strip()
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            if pd.to_datetime(amostra, format=plan_format, errors='coerce').isna().any():
+                return False
+            return detected is None or bool(pd.to_datetime(amostra, format=detected, errors='coerce').isna().any())
+
+    @staticmethod
+    def _to_datetime(values: pd.Series, date_format: Optional[str]) -> Optional[pd.Series]:
+        """pd.to_datetime da coluna inteira (formato explícito ou inferido), sem timezone; None se não for possível"""
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                if date_format:
+                    parsed = pd.to_datetime(values, format=date_format, utc=False, errors='coerce')
+                else:
+                    parsed = pd.to_datetime(values, dayfirst=True, utc=False, errors='coerce')
+            if isinstance(parsed.dtype, pd.DatetimeTZDtype):
+                return parsed.dt.tz_localize(None)
+            if pd.api.types.is_datetime64_dtype(parsed):
+                return parsed
+        except Exception:
+            pass
+        return None  # Offsets mistos: cai no parse individual
+
+    def _parse_datetime_column(self, values: pd.Series, column: Optional[str] = None) -> Tuple[pd.Series, Dict[Any, str]]:
+        """
+        Converte uma coluna de datas de uma vez só.
+
+        O formato é inferido uma única vez para a coluna; apenas os valores que não
+        seguem esse formato passam pelo parse individual (_parse_datetime_value),
+        o que mantém o mesmo resultado e a mesma mensagem de erro do caminho por linha.
+
+        Com `column`, o formato vem do plano de parse do layout (detectado num upload
+        anterior) e é passado explicitamente ao pd.to_datetime, se este arquivo o
+        confirmar (_formato_plano_confirmado). Se a maior parte dos valores não seguir
+        o formato usado, ele é detectado de novo.
+
+        Returns:
+            (Series datetime64 sem timezone, {índice: mensagem de erro})
+        """
+        # Coluna já tipada (Excel com datas nativas, Parquet/Arrow): nada a interpretar
+        if isinstance(values.dtype, pd.DatetimeTZDtype):
+            return values.dt.tz_localize(None), {}
+        if pd.api.types.is_datetime64_dtype(values):
+            return values, {}
+
+        date_format = None
+        if column is not None:
+            date_format = self.plano.formatos_data.get(column)
+            detected = self._detect_datetime_format(values)
+            if date_format != detected and not (date_format and self._formato_plano_confirmado(values, date_format, detected)):
+                date_format = detected
+                self.plano.definir_formato_data(column, date_format)
+
+        parsed = self._to_datetime(values, date_format)
+        if date_format:
+            present = values.notna()
+            if parsed is None or 2 * int((present & parsed.isna()).sum()) > int(present.sum()):
+                # O arquivo mudou de formato de data: detecta de novo e atualiza o plano
+                date_format = self._detect_datetime_format(values)
+                self.plano.definir_formato_data(column, date_format)
+                logger.info(f"Formato de data da coluna '{column}' redetectado: {date_format}")
+                parsed = self._to_datetime(values, date_format)
+
+        if parsed is None:
+            parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+
+        failures: Dict[Any, str] = {}
+        pending = values.notna() & parsed.isna()
+        for index, raw in values[pending].items():
+            try:
+                parsed.at[index] = self._parse_datetime_value(raw)
+            except Exception as e:
+                failures[index] = str(e)
+        return parsed, failures
+
+    def _parse_operation_type_series(self, values: pd.Series) -> pd.Series:
+        """
+        Versão vetorizada de _parse_operation_type: cada texto distinto é classificado
+        uma vez e a classificação fica no plano de parse para os próximos uploads.
+        """
+        known = self.plano.tipos
+        mapping = {}
+        for value in values.dropna().unique():
+            tipo = known.get(value)
+            if tipo is None:
+                tipo = self._parse_operation_type(value)
+                self.plano.registrar_tipo(value, tipo)
+            mapping[value] = tipo
+
+        tipos = pd.Series(schemas.TipoOperacaoEnum.DESCONHECIDO, index=values.index, dtype=object)
+        present = values.notna()
+        tipos[present] = values[present].map(mapping)
+        return tipos
+
+    def _clean_numeric_column(self, column: str, values: pd.Series) -> pd.Series:
+        """
+        clean_decimal_series com a convenção numérica do plano de parse (detectada no
+        primeiro upload do layout). A convenção só é usada se todos os caracteres da
+        coluna couberem nela; senão é detectada de novo ou cai na limpeza completa.
+        """
+        if pd.api.types.is_numeric_dtype(values) or values.empty:
+            return self.numeric_cleaner.clean_decimal_series(values)
+
+        str_values = values[values.notna()].astype(str)
+        chars = set(''.join(str_values))
+        convention = self.plano.convencoes_numericas.get(column)
+        if convention is None or not chars <= NumericCleaningUtility.DECIMAL_CONVENTIONS[convention]:
+            convention = NumericCleaningUtility.detect_decimal_convention(chars)
+            self.plano.definir_convencao_numerica(column, convention)
+
+        if convention is not None:
+            converted = NumericCleaningUtility.convert_with_convention(str_values, convention)
+            if converted is not None:
+                return converted.reindex(values.index)
+        return self.numeric_cleaner.clean_decimal_series(values)
+
+    def filter_incremental(self, df: pd.DataFrame, limite_abertura: Any) -> pd.DataFrame:
+        """
+        Modo incremental: descarta as linhas com Abertura anterior à última já salva
+        do robô, antes da validação e da inserção.
+
+        Só a coluna Abertura é interpretada. Linhas na mesma Abertura da última são
+        mantidas (a chave natural descarta as já salvas na inserção) e linhas sem
+        data ou com data inválida seguem para a validação, que as reporta.
+
+        Args:
+            limite_abertura: datetime único, Series (alinhada pelo índice) com o limite
+                de cada linha, ou None (robô sem operações: nada é descartado)
+
+        Returns:
+            Subconjunto de `df` a processar
+        """
+        if limite_abertura is None or df.empty or 'Abertura' not in df.columns:
+            return df
+
+        abertura, falhas = self._parse_datetime_column(df['Abertura'], 'Abertura')
+        if isinstance(limite_abertura, pd.Series):
+            limite_abertura = pd.to_datetime(limite_abertura.reindex(df.index))
+        anteriores = (abertura < limite_abertura).to_numpy()  # NaT nunca é anterior
+        if not falhas:
+            # Coluna já convertida: process_rows_vectorized não a interpreta de novo
+            df = df.assign(Abertura=abertura)
+
+        descartadas = int(anteriores.sum())
+        self.incremental_skipped_count += descartadas
+        if descartadas:
+            logger.info(f"Modo incremental: {descartadas} linhas anteriores à última operação salva ignoradas")
+        return df[~anteriores]
+
+    def process_rows_vectorized(self, df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Processa todas as linhas coluna a coluna, com o mesmo resultado de chamar
+        process_single_row em cada linha (inclusive os erros registrados via _add_error,
+        na mesma ordem).
+
+        Args:
+            df: Subconjunto a processar (padrão: o DataFrame inteiro já mapeado)
+
+        Returns:
+            DataFrame das linhas válidas, indexado pelo índice original, com as colunas
+            resultado, data_abertura, data_fechamento, ativo, lotes e tipo
+        """
+        df = self.df if df is None else df
+        empty_col = pd.Series(None, index=df.index, dtype=object)
+
+        def column(name: str) -> pd.Series:
+            return df[name] if name in df.columns else empty_col
+
+        abertura_raw = column('Abertura')
+        resultado_raw = column(settings.RESULT_COLUMN_NAME)
+        fechamento_raw = column('Fechamento')
+
+        # Erros de cada etapa, na ordem das etapas do caminho por linha:
+        # (índices, mensagens, nível, categoria)
+        stages: List[Tuple[pd.Index, List[str], str, str]] = []
+
+        missing = abertura_raw.isna() | resultado_raw.isna()
+        missing_index = df.index[missing]
+        stages.append((
+            missing_index, ["Campos obrigatórios ausentes (Abertura ou Resultado)"] * len(missing_index),
+            'error', 'campos_obrigatorios'
+        ))
+        valid = ~missing
+
+        data_abertura, abertura_errors = self._parse_datetime_column(abertura_raw[valid], 'Abertura')
+        abertura_index = pd.Index(list(abertura_errors), dtype=df.index.dtype)
+        stages.append((abertura_index, [
+            f"Data abertura inválida '{raw}': {abertura_errors[index]}"
+            for index, raw in zip(abertura_index, abertura_raw.loc[abertura_index])
+        ], 'error', 'abertura_invalida'))
+        valid.loc[abertura_index] = False
+
+        data_fechamento, fechamento_errors = self._parse_datetime_column(fechamento_raw[valid], 'Fechamento')
+        fechamento_index = pd.Index(list(fechamento_errors), dtype=df.index.dtype)
+        stages.append((fechamento_index, [
+            f"Data fechamento inválida '{raw}': {fechamento_errors[index]}"
+            for index, raw in zip(fechamento_index, fechamento_raw.loc[fechamento_index])
+        ], 'warning', 'fechamento_invalido'))
+
+        resultado = self._clean_numeric_column(settings.RESULT_COLUMN_NAME, resultado_raw[valid])
+        resultado_index = resultado.index[resultado.isna()]
+        stages.append((resultado_index, [
+            f"Resultado inválido '{raw}'" for raw in resultado_raw.loc[resultado_index]
+        ], 'error', 'resultado_invalido'))
+        valid.loc[resultado_index] = False
+
+        self._add_errors_in_row_order(df.index, stages)
+
+        ativo = column('Ativo')[valid]
+        ativo = ativo.astype(str).str.strip().where(ativo.notna())
+        ativo = ativo.where(ativo != '')
+
+        processed = pd.DataFrame({
+            'resultado': resultado[valid[resultado.index]],
+            'data_abertura': data_abertura[valid[data_abertura.index]],
+            'data_fechamento': data_fechamento.reindex(df.index[valid]),
+            'ativo': ativo,
+            'lotes': self._clean_numeric_column('Lotes', column('Lotes')[valid]),
+            'tipo': self._parse_operation_type_series(column('Tipo')[valid]),
+        }, index=df.index[valid])
+
+        self.processed_count += len(processed)
+        return processed
+
+    def _add_errors_in_row_order(self, index: pd.Index, stages: List[Tuple[pd.Index, List[str], str, str]]):
+        """
+        Registra os erros das etapas de process_rows_vectorized ordenados por
+        (posição da linha, etapa), a mesma ordem do caminho por linha.
+        """
+        if not any(len(stage_index) for stage_index, _, _, _ in stages):
+            return
+        positions = np.concatenate([index.get_indexer(stage_index) for stage_index, _, _, _ in stages])
+        stage_ids = np.concatenate([np.full(len(stage_index), n) for n, (stage_index, _, _, _) in enumerate(stages)])
+        entries = [
+            (row_index, message, level, category)
+            for stage_index, messages, level, category in stages
+            for row_index, message in zip(stage_index, messages)
+        ]
+        for k in np.lexsort((stage_ids, positions)):
+            row_index, message, level, category = entries[k]
+            self._add_error(row_index, message, level=level, category=category)
+
+    @staticmethod
+    def iter_bulk_rows(processed: pd.DataFrame, robo_id: Union[int, pd.Series]):
+        """
+        Gera (índice, dados) no formato esperado por crud.bulk_create_operacoes.
+
+        Args:
+            robo_id: ID único ou Series (alinhada pelo índice) com o ID de cada linha
+        """
+        columns = ['resultado', 'data_abertura', 'data_fechamento', 'ativo', 'lotes', 'tipo']
+        values = processed[columns].astype(object).where(processed[columns].notna(), None)
+        values.insert(0, 'robo_id', pd.Series(robo_id, index=processed.index).astype(object))
+        for row in values.itertuples():
+            yield row.Index, {
+                "robo_id": row.robo_id,
+                "resultado": row.resultado,
+                "data_abertura": row.data_abertura,
+                "data_fechamento": row.data_fechamento,
+                "ativo": row.ativo,
+                "lotes": row.lotes,
+                "tipo": row.tipo.value if row.tipo else None,
+                "fonte_dados_id": None
+            }
+
+    @staticmethod
+    def iter_operacoes(processed: pd.DataFrame):
+        """Gera (índice, OperacaoCreate) a partir do resultado de process_rows_vectorized"""
+        for row in processed.itertuples():
+            yield row.Index, schemas.OperacaoCreate(
+                resultado=row.resultado,
+                data_abertura=row.data_abertura,
+                data_fechamento=None if pd.isna(row.data_fechamento) else row.data_fechamento,
+                ativo=None if pd.isna(row.ativo) else row.ativo,
+                lotes=None if pd.isna(row.lotes) else row.lotes,
+                tipo=row.tipo
+            )
     
     def get_processing_summary(self) -> Dict[str, Any]:
         """Retorna resumo do processamento"""
         return {
             'processadas': self.processed_count,
             'erros': self.error_count,
-            'total_linhas': len(self.df),
+            'duplicadas': self.duplicate_count,
+            'anteriores_ignoradas': self.incremental_skipped_count,
+            'erros_por_categoria': dict(self.error_categories),
+            'total_linhas': self.rows_in_previous_chunks + len(self.df),
             'detalhes_erros': self.errors[-10:] if self.errors else []  # Últimos 10 erros
         }
 
+UPLOAD_SPOOL_BLOCK_BYTES = 1024 * 1024
+
+INCREMENTAL_DESCRIPTION = (
+    "Reenvio do histórico: ignora as linhas anteriores à última operação já salva de cada robô"
+)
+DRY_RUN_DESCRIPTION = (
+    "Só valida o arquivo e retorna o relatório de erros, sem gravar nada no banco "
+    "(async_job e incremental são ignorados)"
+)
+
+async def _spool_upload_to_disk(upload: UploadFile) -> str:
+    """
+    Copia o arquivo enviado para um arquivo temporário em disco, bloco a bloco,
+    sem carregá-lo inteiro na memória. Quem chama é responsável por removê-lo.
+    """
+    suffix = os.path.splitext(upload.filename or '')[1]
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        while True:
+            bloco = await upload.read(UPLOAD_SPOOL_BLOCK_BYTES)
+            if not bloco:
+                break
+            tmp.write(bloco)
+        return tmp.name
+
+def _ler_csv(origem: Any) -> pd.DataFrame:
+    """Lê o CSV inteiro com as configurações de parsing do export da corretora"""
+    try:
+        return pd.read_csv(
+            origem,
+            skiprows=settings.CSV_SKIPROWS,
+            encoding=settings.CSV_ENCODING,
+            sep=settings.CSV_SEPARATOR,
+            header=settings.CSV_HEADER,
+            low_memory=False,
+        )
+    except Exception as e:
+        raise CSVProcessingError(f"Erro ao ler CSV: {e}")
+
+def _ler_csv_em_blocos(caminho: str):
+    """Gera o CSV em blocos de settings.CSV_CHUNK_SIZE linhas (índice contínuo entre os blocos)"""
+    try:
+        with pd.read_csv(
+            caminho,
+            skiprows=settings.CSV_SKIPROWS,
+            encoding=settings.CSV_ENCODING,
+            sep=settings.CSV_SEPARATOR,
+            header=settings.CSV_HEADER,
+            chunksize=settings.CSV_CHUNK_SIZE,
+        ) as reader:
+            yield from reader
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+        raise CSVProcessingError(f"Erro ao ler CSV: {e}")
+
+def _ingest_csv_streaming(
+    db: Session, caminho: str, filename: str, robo_id: int, schema: str,
+    progresso: Optional[UploadJob] = None, limite_abertura: Optional[datetime] = None
+) -> Tuple[int, CSVOperationProcessor]:
+    """
+    Lê o CSV em blocos de settings.CSV_CHUNK_SIZE linhas e envia cada bloco para a
+    inserção em massa assim que é processado, de modo que a memória usada depende
+    do tamanho do bloco e não do tamanho do arquivo.
+
+    Com `limite_abertura` (modo incremental), as linhas anteriores são descartadas
+    em cada bloco antes da validação.
+
+    Returns:
+        (operações salvas, processador com o relatório de erros acumulado)
+    """
+    processor = CSVOperationProcessor(pd.DataFrame(), filename)
+    if progresso:
+        progresso.acompanhar(processor)
+
+    def linhas_validas():
+        for chunk in _ler_csv_em_blocos(caminho):
+            df_validas = processor.process_chunk(chunk, limite_abertura)
+            yield from processor.iter_bulk_rows(df_validas, robo_id)
+
+    operacoes_salvas, duplicadas, erros_db = crud.bulk_create_operacoes(
+        db, linhas_validas(), schema_name=schema,
+        on_progress=progresso.registrar_insercao if progresso else None
+    )
+    processor.registrar_insercao(duplicadas, erros_db)
+    return operacoes_salvas, processor
+
+def _ultimas_aberturas(db: Session, robo_ids: List[int], schema: str) -> Dict[int, datetime]:
+    """Modo incremental: última Abertura salva de cada robô (ver crud.get_ultima_abertura_por_robo)"""
+    ultimas = crud.get_ultima_abertura_por_robo(db, robo_ids, schema_name=schema)
+    logger.info(f"Modo incremental: última abertura salva por robô {ultimas}")
+    return ultimas
+
+def _executar_em_background(caminho: str, processar: Callable[[Session, UploadJob], Dict[str, Any]]):
+    """
+    Monta a tarefa de um job de upload: abre uma sessão própria (a da requisição
+    já terá sido fechada), processa o arquivo temporário e o remove ao final.
+    """
+    def tarefa(job: UploadJob) -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            return processar(db, job)
+        finally:
+            db.close()
+            os.remove(caminho)
+    return tarefa
+
+def _resposta_job(job: UploadJob) -> Dict[str, Any]:
+    return {
+        "message": f"Upload de '{job.arquivo}' enfileirado para processamento em segundo plano",
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"{settings.API_V1_STR}{router.prefix}/jobs/{job.id}"
+    }
+
+def _processar_csv(
+    db: Session,
+    origem: Any,
+    filename: str,
+    nome_robo_base: str,
+    schema: str,
+    streaming: bool = False,
+    progresso: Optional[UploadJob] = None,
+    incremental: bool = False
+) -> Dict[str, Any]:
+    """
+    Processa e salva um CSV de operações.
+
+    Args:
+        origem: caminho do arquivo (obrigatório no modo streaming) ou buffer em memória
+        progresso: job em segundo plano a ser atualizado durante o processamento
+        incremental: descarta as linhas anteriores à última operação já salva do robô
+    """
+    # Verificar/Criar o Robô
+    db_robo = crud.get_robo_by_nome(db, nome=nome_robo_base, schema_name=schema)
+    if not db_robo:
+        logger.info(f"Criando novo robô '{nome_robo_base}' no schema '{schema}'")
+        robo_schema_in = schemas.RoboCreate(nome=nome_robo_base)
+        db_robo = crud.create_robo(db=db, robo_in=robo_schema_in, schema_name=schema)
+    else:
+        logger.info(f"Usando robô existente: '{db_robo.nome}' (ID: {db_robo.id})")
+
+    ultima_abertura = _ultimas_aberturas(db, [db_robo.id], schema).get(db_robo.id) if incremental else None
+
+    if streaming:
+        # Modo streaming: arquivo em disco, lido e inserido bloco a bloco
+        operacoes_salvas, processor = _ingest_csv_streaming(
+            db, origem, filename, db_robo.id, schema, progresso=progresso, limite_abertura=ultima_abertura
+        )
+
+        if processor.get_processing_summary()['total_linhas'] == 0:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Arquivo CSV '{filename}' está vazio ou não contém dados válidos."
+            )
+    else:
+        # Ler e processar CSV
+        df = _ler_csv(origem)
+
+        if df.empty:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Arquivo CSV '{filename}' está vazio ou não contém dados válidos."
+            )
+
+        # Processar DataFrame
+        processor = CSVOperationProcessor(df, filename)
+        if progresso:
+            progresso.acompanhar(processor)
+        df_processed = processor.process_dataframe()
+
+        # Processar todas as linhas de uma vez (parse vetorizado)
+        df_validas = processor.process_rows_vectorized(processor.filter_incremental(df_processed, ultima_abertura))
+
+        # Inserção em massa numa única transação
+        operacoes_salvas, duplicadas, erros_db = crud.bulk_create_operacoes(
+            db, processor.iter_bulk_rows(df_validas, db_robo.id), schema_name=schema,
+            on_progress=progresso.registrar_insercao if progresso else None
+        )
+        processor.registrar_insercao(duplicadas, erros_db)
+
+    # Preparar resposta
+    summary = processor.get_processing_summary()
+    
+    response_data = {
+        "message": f"Processamento concluído para '{filename}'",
+        "robo_nome": db_robo.nome,
+        "robo_id": db_robo.id,
+        "schema": schema,
+        "operacoes_salvas": operacoes_salvas,
+        "operacoes_duplicadas": summary['duplicadas'],
+        "operacoes_rejeitadas": summary['erros'],
+        "operacoes_anteriores_ignoradas": summary['anteriores_ignoradas'],
+        "ultima_abertura_existente": ultima_abertura.isoformat() if ultima_abertura else None,
+        "resumo": summary
+    }
+
+    # Log do resultado
+    logger.info(
+        f"CSV '{filename}' processado: {operacoes_salvas} operações salvas, "
+        f"{summary['duplicadas']} duplicadas, {summary['erros']} erros de {summary['total_linhas']} linhas"
+    )
+
+    return response_data
+
+class DryRunReport:
+    """
+    Relatório de uma validação sem gravação (dry_run=true), acumulado bloco a
+    bloco ou planilha a planilha: contagens de erro por categoria, primeiros
+    exemplos, período das operações válidas e robôs detectados.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.processors: List[CSVOperationProcessor] = []
+        self.primeira_abertura: Optional[pd.Timestamp] = None
+        self.ultima_abertura: Optional[pd.Timestamp] = None
+        self.robos: Dict[str, int] = {}
+        self.linhas_sem_robo = 0
+        self.planilhas_ignoradas: List[Dict[str, str]] = []
+        self._inicio = time.perf_counter()
+
+    def registrar(self, df_validas: pd.DataFrame, robos: Union[str, pd.Series]):
+        """Acumula as linhas válidas de um bloco/planilha e o robô de cada uma (nome único ou Series)"""
+        if df_validas.empty:
+            return
+        aberturas = df_validas['data_abertura']
+        primeira, ultima = aberturas.min(), aberturas.max()
+        if self.primeira_abertura is None or primeira < self.primeira_abertura:
+            self.primeira_abertura = primeira
+        if self.ultima_abertura is None or ultima > self.ultima_abertura:
+            self.ultima_abertura = ultima
+
+        if isinstance(robos, str):
+            contagens = {robos: len(df_validas)}
+        else:
+            contagens = robos[df_validas.index].value_counts().items()
+            contagens = {nome: int(quantidade) for nome, quantidade in contagens}
+        for nome, quantidade in contagens.items():
+            self.robos[nome] = self.robos.get(nome, 0) + quantidade
+
+    @property
+    def total_linhas(self) -> int:
+        return sum(p.get_processing_summary()['total_linhas'] for p in self.processors)
+
+    def to_dict(self) -> Dict[str, Any]:
+        summaries = [p.get_processing_summary() for p in self.processors]
+        total_linhas = sum(s['total_linhas'] for s in summaries)
+        duracao = time.perf_counter() - self._inicio
+
+        exemplos = []
+        for processor in self.processors:
+            for erro in processor.errors[:settings.DRY_RUN_ERROR_EXAMPLES - len(exemplos)]:
+                if isinstance(processor, ExcelOperationProcessor):
+                    erro = {**erro, 'planilha': processor.sheet_name}
+                exemplos.append(erro)
+
+        response_data = {
+            "message": f"Validação concluída para '{self.filename}' (dry run: nada foi gravado no banco)",
+            "dry_run": True,
+            "total_linhas": total_linhas,
+            "linhas_validas": sum(s['processadas'] for s in summaries),
+            "linhas_rejeitadas": sum(s['erros'] for s in summaries),
+            "erros_por_categoria": _somar_categorias(self.processors),
+            "exemplos_erros": exemplos,
+            "periodo": {
+                "primeira_abertura": self.primeira_abertura.isoformat() if self.primeira_abertura is not None else None,
+                "ultima_abertura": self.ultima_abertura.isoformat() if self.ultima_abertura is not None else None,
+            },
+            "robos_detectados": self.robos,
+            "linhas_sem_robo": self.linhas_sem_robo,
+            "duracao_segundos": round(duracao, 3),
+            "linhas_por_segundo": round(total_linhas / duracao, 1) if duracao > 0 else 0,
+        }
+        if self.planilhas_ignoradas:
+            response_data["planilhas_ignoradas"] = self.planilhas_ignoradas
+
+        logger.info(
+            f"Validação (dry run) de '{self.filename}': {response_data['linhas_validas']} válidas, "
+            f"{response_data['linhas_rejeitadas']} rejeitadas de {total_linhas} linhas "
+            f"em {duracao:.2f}s; erros por categoria: {response_data['erros_por_categoria']}"
+        )
+        return response_data
+
+def _validar_csv(origem: Any, filename: str, nome_robo_base: str, streaming: bool = False) -> Dict[str, Any]:
+    """
+    dry_run do CSV: o mesmo parse e validação vetorizados do upload, sem acessar o
+    banco (nem robô, nem inserção) e, portanto, sem ocupar uma conexão.
+
+    Args:
+        origem: caminho do arquivo (obrigatório no modo streaming) ou buffer em memória
+    """
+    relatorio = DryRunReport(filename)
+    if streaming:
+        processor = CSVOperationProcessor(pd.DataFrame(), filename)
+        relatorio.processors.append(processor)
+        for chunk in _ler_csv_em_blocos(origem):
+            relatorio.registrar(processor.process_chunk(chunk), nome_robo_base)
+    else:
+        processor = CSVOperationProcessor(_ler_csv(origem), filename)
+        relatorio.processors.append(processor)
+        if not processor.df.empty:
+            processor.process_dataframe()
+            relatorio.registrar(processor.process_rows_vectorized(), nome_robo_base)
+
+    if relatorio.total_linhas == 0:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Arquivo CSV '{filename}' está vazio ou não contém dados válidos."
+        )
+    return relatorio.to_dict()
+
 @router.post("/csv/", summary="Upload de arquivo CSV de operações")
 async def upload_operacoes_csv(
     db: Session = Depends(get_db),
     arquivo_csv: UploadFile = File(..., description="Arquivo CSV contendo as operações"),
     nome_robo_form: Optional[str] = Form(None, description="Nome do Robô para associar as operações"),
-    schema: str = Query(settings.DEFAULT_UPLOAD_SCHEMA, description="Schema para salvar os dados")
+    schema: str = Query(settings.DEFAULT_UPLOAD_SCHEMA, description="Schema para salvar os dados"),
+    streaming: bool = Query(False, description="Lê o arquivo em blocos a partir do disco (para arquivos muito grandes)"),
+    async_job: bool = Query(False, description="Processa em segundo plano e retorna o ID do job imediatamente"),
+    incremental: bool = Query(False, description=INCREMENTAL_DESCRIPTION),
+    dry_run: bool = Query(False, description=DRY_RUN_DESCRIPTION)
 ):
     """
     Faz upload robusto de um arquivo CSV, processa as operações com validação
     e tratamento de erros avançado, e salva no banco de dados.
+
+    Com async_job=true, retorna um job_id na hora; o progresso pode ser
+    consultado em /uploads/jobs/{job_id}.
+
+    Com incremental=true, só as operações a partir da última já salva do robô
+    são validadas e inseridas (reenvio do histórico completo com dias novos).
+
+    Com dry_run=true, só valida: retorna erros por categoria, exemplos, período
+    e robôs detectados, sem gravar nada nem usar o banco.
     """
     filename = arquivo_csv.filename
     logger.info(f"Iniciando upload de CSV: {filename} (schema: {schema})")
@@ -333,80 +1111,50 @@ async def upload_operacoes_csv(
         )
 
     try:
-        # Verificar/Criar o Robô
-        db_robo = crud.get_robo_by_nome(db, nome=nome_robo_base, schema_name=schema)
-        if not db_robo:
-            logger.info(f"Criando novo robô '{nome_robo_base}' no schema '{schema}'")
-            robo_schema_in = schemas.RoboCreate(nome=nome_robo_base)
-            db_robo = crud.create_robo(db=db, robo_in=robo_schema_in, schema_name=schema)
-        else:
-            logger.info(f"Usando robô existente: '{db_robo.nome}' (ID: {db_robo.id})")
+        if dry_run:
+            if streaming:
+                caminho_temp = await _spool_upload_to_disk(arquivo_csv)
+                try:
+                    return _validar_csv(caminho_temp, filename, nome_robo_base, streaming=True)
+                finally:
+                    os.remove(caminho_temp)
+            buffer = io.BytesIO(await arquivo_csv.read())
+            try:
+                return _validar_csv(buffer, filename, nome_robo_base)
+            finally:
+                buffer.close()
+
+        if async_job:
+            caminho_temp = await _spool_upload_to_disk(arquivo_csv)
+            job = upload_jobs.submit("csv", filename, schema, _executar_em_background(
+                caminho_temp,
+                lambda db_job, job: _processar_csv(
+                    db_job, caminho_temp, filename, nome_robo_base, schema,
+                    streaming=streaming, progresso=job, incremental=incremental
+                )
+            ))
+            return _resposta_job(job)
+
+        if streaming:
+            caminho_temp = await _spool_upload_to_disk(arquivo_csv)
+            try:
+                # Leitura, parse e COPY do arquivo inteiro numa thread, fora do event loop
+                return await run_in_threadpool(
+                    _processar_csv, db, caminho_temp, filename, nome_robo_base, schema,
+                    streaming=True, incremental=incremental
+                )
+            finally:
+                os.remove(caminho_temp)
 
-        # Ler e processar CSV
         contents = await arquivo_csv.read()
         buffer = io.BytesIO(contents)
-
         try:
-            df = pd.read_csv(
-                buffer,
-                skiprows=settings.CSV_SKIPROWS,
-                encoding=settings.CSV_ENCODING,
-                sep=settings.CSV_SEPARATOR,
-                header=settings.CSV_HEADER,
-                low_memory=False,
-            )
-        except Exception as e:
-            raise CSVProcessingError(f"Erro ao ler CSV: {e}")
+            return _processar_csv(db, buffer, filename, nome_robo_base, schema, incremental=incremental)
         finally:
             buffer.close()
 
-        if df.empty:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Arquivo CSV '{filename}' está vazio ou não contém dados válidos."
-            )
-
-        # Processar DataFrame
-        processor = CSVOperationProcessor(df, filename)
-        df_processed = processor.process_dataframe()
-
-        # Processar cada linha
-        operacoes_salvas = 0
-        for index, row in df_processed.iterrows():
-            operacao_data = processor.process_single_row(index, row)
-            
-            if operacao_data:
-                try:
-                    crud.create_operacao(
-                        db=db, 
-                        operacao_in=operacao_data, 
-                        robo_id_for_op=db_robo.id, 
-                        schema_name=schema
-                    )
-                    operacoes_salvas += 1
-                except Exception as e:
-                    processor._add_error(index, f"Erro ao salvar no banco: {e}")
-
-        # Preparar resposta
-        summary = processor.get_processing_summary()
-        
-        response_data = {
-            "message": f"Processamento concluído para '{filename}'",
-            "robo_nome": db_robo.nome,
-            "robo_id": db_robo.id,
-            "schema": schema,
-            "operacoes_salvas": operacoes_salvas,
-            "resumo": summary
-        }
-
-        # Log do resultado
-        logger.info(
-            f"CSV '{filename}' processado: {operacoes_salvas} operações salvas, "
-            f"{summary['erros']} erros de {summary['total_linhas']} linhas"
-        )
-
-        return response_data
-
+    except HTTPException:
+        raise
     except CSVProcessingError as e:
         logger.error(f"Erro de processamento CSV '{filename}': {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -437,21 +1185,570 @@ class ExcelOperationProcessor(CSVOperationProcessor):
         self.df = self.df.dropna(how='all')
         
         # Limpar nomes das colunas
-        self.df.columns = self.df.columns.str.strip()
+        self.df.columns = self.df.columns.astype(str).str.strip()  # planilha vazia tem colunas não-texto
         
         # Mapear colunas
-        mapper = ColumnMapper(list(self.df.columns))
-        rename_map = mapper.create_rename_map()
-        
-        if rename_map:
-            self.df.rename(columns=rename_map, inplace=True)
-            logger.info(f"Colunas renomeadas: {rename_map}")
+        self._apply_parse_plan()
         
         logger.info(f"Colunas após mapeamento: {list(self.df.columns)}")
         logger.info(f"Shape após limpeza: {self.df.shape}")
         
         return self.df
 
+    def _plan_key(self, columns: List[str]) -> str:
+        return fingerprint(columns, 'excel')
+
+def _salvar_operacoes_multiplos_robos(
+    db: Session,
+    processor: CSVOperationProcessor,
+    df_processed: pd.DataFrame,
+    schema: str,
+    progresso: Optional[UploadJob] = None,
+    incremental: bool = False
+) -> Tuple[int, Dict[str, Dict[str, int]]]:
+    """
+    Salva um DataFrame já mapeado cujo robô de cada linha está na coluna settings.ROBO_COLUMN_NAME.
+
+    Um único agrupamento dá os robôs (na ordem em que aparecem), todos são
+    buscados/criados num único comando e as linhas de todos vão numa única
+    inserção em massa; o detalhamento por robô sai das contagens agregadas.
+    No modo incremental, cada linha é comparada com a última Abertura do seu robô.
+
+    Returns:
+        (operações salvas, {nome do robô: {robo_id, operacoes_salvas, duplicadas, erros, anteriores_ignoradas}})
+    """
+    df_processed['RoboNome'] = df_processed[settings.ROBO_COLUMN_NAME].astype(str).str.strip()
+    nome_valido = ~df_processed['RoboNome'].str.lower().isin(['nan', 'none', ''])
+    df_robos = df_processed[nome_valido]
+    linhas_por_robo = df_robos.groupby('RoboNome', sort=False).size()
+
+    logger.info(f"Robôs detectados: {list(linhas_por_robo.index)}")
+
+    # Buscar/criar todos os robôs num único comando
+    robo_ids = crud.get_or_create_robos(db, linhas_por_robo.index, schema_name=schema)
+
+    robo_por_linha = df_robos['RoboNome']
+    df_novas = df_robos
+    if incremental:
+        ultimas = _ultimas_aberturas(db, list(robo_ids.values()), schema)
+        df_novas = processor.filter_incremental(df_robos, robo_por_linha.map(robo_ids).map(ultimas))
+    ignoradas_por_robo = robo_por_linha.drop(df_novas.index).value_counts()
+
+    # Processar as linhas de todos os robôs de uma vez e inserir numa única transação
+    df_validas = processor.process_rows_vectorized(df_novas)
+    inseridas_por_robo: Dict[int, int] = {}
+    operacoes_salvas, duplicadas, erros_db = crud.bulk_create_operacoes(
+        db, processor.iter_bulk_rows(df_validas, robo_por_linha.map(robo_ids)), schema_name=schema,
+        on_progress=progresso.registrar_insercao if progresso else None,
+        inseridas_por_robo=inseridas_por_robo
+    )
+    processor.registrar_insercao(duplicadas, erros_db)
+
+    # Detalhamento por robô a partir das contagens agregadas
+    robos_processados = {}
+    validas_por_robo = robo_por_linha[df_validas.index].value_counts()
+    erros_por_robo = robo_por_linha[[index for index, _ in erros_db]].value_counts()
+    for nome_robo in linhas_por_robo.index:
+        robo_id = robo_ids[nome_robo]
+        salvas = inseridas_por_robo.get(robo_id, 0)
+        erros = int(erros_por_robo.get(nome_robo, 0))
+        robos_processados[nome_robo] = {
+            'robo_id': robo_id,
+            'operacoes_salvas': salvas,
+            'duplicadas': int(validas_por_robo.get(nome_robo, 0)) - salvas - erros,
+            'erros': erros,
+            'anteriores_ignoradas': int(ignoradas_por_robo.get(nome_robo, 0))
+        }
+    return operacoes_salvas, robos_processados
+
+def _salvar_dataframe_processado(
+    db: Session,
+    processor: CSVOperationProcessor,
+    df_processed: pd.DataFrame,
+    nome_robo_base: str,
+    processar_multiplos_robos: bool,
+    schema: str,
+    progresso: Optional[UploadJob] = None,
+    incremental: bool = False
+) -> Tuple[int, Dict[str, Dict[str, int]]]:
+    """
+    Salva as operações de um DataFrame já mapeado (Excel, Parquet/Arrow): um robô por
+    linha se houver a coluna de robô e processar_multiplos_robos, senão nome_robo_base.
+    Com `incremental`, descarta antes as linhas anteriores à última operação de cada robô.
+
+    Returns:
+        (operações salvas, detalhamento por robô)
+    """
+    # Detectar se deve processar múltiplos robôs
+    operacoes_salvas = 0
+    robos_processados = {}
+
+    if processar_multiplos_robos and settings.ROBO_COLUMN_NAME in df_processed.columns:
+        logger.info(f"Detectada coluna '{settings.ROBO_COLUMN_NAME}' - processando múltiplos robôs automaticamente")
+
+        operacoes_salvas, robos_processados = _salvar_operacoes_multiplos_robos(
+            db, processor, df_processed, schema, progresso=progresso, incremental=incremental
+        )
+    else:
+        # Modo single robô (comportamento original)
+        logger.info(f"Processando como robô único: '{nome_robo_base}'")
+
+        # Verificar/Criar o Robô único
+        db_robo = crud.get_robo_by_nome(db, nome=nome_robo_base, schema_name=schema)
+        if not db_robo:
+            logger.info(f"Criando novo robô '{nome_robo_base}' no schema '{schema}'")
+            robo_schema_in = schemas.RoboCreate(nome=nome_robo_base)
+            db_robo = crud.create_robo(db=db, robo_in=robo_schema_in, schema_name=schema)
+
+        ignoradas_antes = processor.incremental_skipped_count
+        if incremental:
+            ultima_abertura = _ultimas_aberturas(db, [db_robo.id], schema).get(db_robo.id)
+            df_processed = processor.filter_incremental(df_processed, ultima_abertura)
+
+        robos_processados[nome_robo_base] = {
+            'robo_id': db_robo.id,
+            'operacoes_salvas': 0,
+            'duplicadas': 0,
+            'erros': 0,
+            'anteriores_ignoradas': processor.incremental_skipped_count - ignoradas_antes
+        }
+
+        # Processar todas as linhas de uma vez (parse vetorizado)
+        df_validas = processor.process_rows_vectorized(df_processed)
+        salvas, duplicadas, erros_db = crud.bulk_create_operacoes(
+            db, processor.iter_bulk_rows(df_validas, db_robo.id), schema_name=schema,
+            on_progress=progresso.registrar_insercao if progresso else None
+        )
+        processor.registrar_insercao(duplicadas, erros_db)
+        robos_processados[nome_robo_base]['operacoes_salvas'] += salvas
+        robos_processados[nome_robo_base]['duplicadas'] += duplicadas
+        robos_processados[nome_robo_base]['erros'] += len(erros_db)
+        operacoes_salvas += salvas
+
+    return operacoes_salvas, robos_processados
+
+def _ler_planilha_excel(excel_file: pd.ExcelFile, planilha: str, leitura_rapida: bool) -> pd.DataFrame:
+    """Lê uma planilha de um arquivo já aberto; em .xlsx com leitura_rapida, só as colunas usadas"""
+    if leitura_rapida and excel_file.engine == 'openpyxl':
+        # Reaproveita o workbook já aberto; as colunas saem do cabeçalho via ColumnMapper
+        return excel_parsing.ler_colunas(
+            excel_file, planilha, settings.EXCEL_SKIPROWS, settings.EXCEL_HEADER,
+            lambda cabecalho: ColumnMapper(cabecalho).used_columns()
+        )
+    return pd.read_excel(
+        excel_file,
+        sheet_name=planilha,
+        skiprows=settings.EXCEL_SKIPROWS,
+        header=settings.EXCEL_HEADER,
+        engine=excel_file.engine
+    )
+
+def _processar_excel(
+    db: Session,
+    origem: Any,
+    filename: str,
+    nome_robo_base: str,
+    sheet_name: Optional[str],
+    processar_multiplos_robos: bool,
+    schema: str,
+    progresso: Optional[UploadJob] = None,
+    leitura_rapida: bool = settings.EXCEL_FAST_READER,
+    incremental: bool = False
+) -> Dict[str, Any]:
+    """
+    Processa e salva uma planilha Excel de operações.
+
+    Args:
+        origem: caminho do arquivo ou buffer em memória
+        progresso: job em segundo plano a ser atualizado durante o processamento
+        leitura_rapida: em .xlsx, lê só as colunas usadas (ver excel_parsing.ler_planilha_rapida)
+        incremental: descarta as linhas anteriores à última operação já salva de cada robô
+    """
+    try:
+        # Primeiro, ler as planilhas disponíveis (engine conforme a extensão)
+        excel_file = pd.ExcelFile(origem, engine=excel_parsing.excel_engine(filename))
+        available_sheets = excel_file.sheet_names
+        logger.info(f"Planilhas disponíveis: {available_sheets}")
+
+        # Determinar qual planilha usar
+        target_sheet = sheet_name if sheet_name else available_sheets[0]
+        if target_sheet not in available_sheets:
+            raise CSVProcessingError(
+                f"Planilha '{target_sheet}' não encontrada. "
+                f"Disponíveis: {available_sheets}"
+            )
+
+        logger.info(f"Usando planilha: '{target_sheet}'")
+
+        # Ler a planilha específica
+        df = _ler_planilha_excel(excel_file, target_sheet, leitura_rapida)
+
+    except CSVProcessingError:
+        raise
+    except Exception as e:
+        raise CSVProcessingError(f"Erro ao ler Excel: {e}")
+
+    if df.empty:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Arquivo Excel '{filename}' está vazio ou não contém dados válidos."
+        )
+
+    # Processar DataFrame
+    processor = ExcelOperationProcessor(df, filename, target_sheet)
+    if progresso:
+        progresso.acompanhar(processor)
+    df_processed = processor.process_dataframe()
+
+    operacoes_salvas, robos_processados = _salvar_dataframe_processado(
+        db, processor, df_processed, nome_robo_base, processar_multiplos_robos, schema,
+        progresso=progresso, incremental=incremental
+    )
+
+    # Preparar resposta
+    summary = processor.get_processing_summary()
+
+    response_data = {
+        "message": f"Processamento concluído para '{filename}'",
+        "schema": schema,
+        "planilha_usada": target_sheet,
+        "planilhas_disponiveis": available_sheets,
+        "operacoes_salvas_total": operacoes_salvas,
+        "operacoes_duplicadas_total": summary['duplicadas'],
+        "operacoes_rejeitadas_total": summary['erros'],
+        "operacoes_anteriores_ignoradas_total": summary['anteriores_ignoradas'],
+        "robos_processados": robos_processados,
+        "resumo": summary
+    }
+
+    # Log do resultado
+    logger.info(
+        f"Excel '{filename}' processado: {operacoes_salvas} operações salvas, "
+        f"{summary['duplicadas']} duplicadas, {summary['erros']} erros de {summary['total_linhas']} linhas"
+    )
+
+    return response_data
+
+def _robo_por_linha(
+    df_processed: pd.DataFrame, nome_robo_base: str, processar_multiplos_robos: bool
+) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Robô de cada linha: a coluna de robô (com processar_multiplos_robos), descartando
+    as linhas sem nome, ou nome_robo_base para todas.
+
+    Returns:
+        (linhas com robô, Series com o nome do robô de cada uma)
+    """
+    if processar_multiplos_robos and settings.ROBO_COLUMN_NAME in df_processed.columns:
+        nomes = df_processed[settings.ROBO_COLUMN_NAME].astype(str).str.strip()
+        df_processed = df_processed[~nomes.str.lower().isin(['nan', 'none', ''])]
+        return df_processed, nomes[df_processed.index]
+    return df_processed, pd.Series(nome_robo_base, index=df_processed.index, dtype=object)
+
+def _somar_categorias(processors: List[CSVOperationProcessor]) -> Dict[str, int]:
+    """Soma os erros por categoria de vários processadores"""
+    total: Dict[str, int] = {}
+    for processor in processors:
+        for categoria, quantidade in processor.error_categories.items():
+            total[categoria] = total.get(categoria, 0) + quantidade
+    return total
+
+class ExcelBatchSummary:
+    """Resumo agregado dos processadores de várias planilhas (mesma interface de get_processing_summary)"""
+
+    def __init__(self):
+        self.processors: List[ExcelOperationProcessor] = []
+        self.duplicate_count = 0
+
+    def get_processing_summary(self) -> Dict[str, Any]:
+        summaries = [p.get_processing_summary() for p in self.processors]
+        return {
+            'processadas': sum(s['processadas'] for s in summaries),
+            'erros': sum(s['erros'] for s in summaries),
+            'duplicadas': self.duplicate_count,
+            'anteriores_ignoradas': sum(s['anteriores_ignoradas'] for s in summaries),
+            'erros_por_categoria': _somar_categorias(self.processors),
+            'total_linhas': sum(s['total_linhas'] for s in summaries),
+            'detalhes_erros': [
+                {**erro, 'arquivo': p.filename, 'planilha': p.sheet_name}
+                for p in self.processors for erro in p.errors
+            ][-10:]
+        }
+
+def _processar_excel_lote(
+    db: Session,
+    arquivos: List[Tuple[str, str, str]],
+    sheet_name: Optional[str],
+    all_sheets: bool,
+    processar_multiplos_robos: bool,
+    schema: str,
+    progresso: Optional[UploadJob] = None,
+    leitura_rapida: bool = settings.EXCEL_FAST_READER,
+    incremental: bool = False
+) -> Dict[str, Any]:
+    """
+    Processa várias planilhas (de um ou mais arquivos) com leitura em paralelo
+    num pool de processos e uma única inserção em massa no final.
+
+    Args:
+        arquivos: (caminho em disco, nome original, nome do robô base) de cada arquivo
+        all_sheets: se True lê todas as planilhas; senão `sheet_name` ou a primeira
+        leitura_rapida: lê só as colunas usadas, resolvidas pelo cabeçalho de cada planilha
+        incremental: descarta as linhas anteriores à última operação já salva de cada robô
+    """
+    inicio_total = time.perf_counter()
+
+    # 1. Listar as planilhas de cada arquivo (só o índice do arquivo, sem ler as células)
+    tarefas: List[excel_parsing.TarefaPlanilha] = []
+    origem_tarefas: List[Tuple[str, str]] = []  # (nome do arquivo, robô base) de cada tarefa
+    planilhas_ignoradas = []
+    for caminho, filename, nome_robo_base in arquivos:
+        engine = excel_parsing.excel_engine(filename)
+        try:
+            with pd.ExcelFile(caminho, engine=engine) as excel_file:
+                available_sheets = excel_file.sheet_names
+
+                if all_sheets:
+                    target_sheets = available_sheets
+                else:
+                    target_sheets = [sheet_name if sheet_name else available_sheets[0]]
+                    if target_sheets[0] not in available_sheets:
+                        raise CSVProcessingError(
+                            f"Planilha '{target_sheets[0]}' não encontrada em '{filename}'. "
+                            f"Disponíveis: {available_sheets}"
+                        )
+
+                for planilha in target_sheets:
+                    colunas = None
+                    if leitura_rapida:
+                        # Cabeçalho lido aqui; os processos de leitura recebem só as colunas usadas
+                        try:
+                            if engine == 'openpyxl':
+                                cabecalho = excel_parsing.ler_cabecalho(
+                                    excel_file.book, planilha, settings.EXCEL_SKIPROWS, settings.EXCEL_HEADER
+                                )
+                            else:
+                                cabecalho = [str(c) for c in pd.read_excel(
+                                    excel_file, sheet_name=planilha, skiprows=settings.EXCEL_SKIPROWS,
+                                    header=settings.EXCEL_HEADER, nrows=0
+                                ).columns]
+                            colunas = ColumnMapper(cabecalho).used_columns()
+                        except CSVProcessingError as e:
+                            # Com all_sheets, planilhas sem operações (resumos, gráficos, vazias) são ignoradas
+                            if not all_sheets:
+                                raise
+                            logger.info(f"Planilha '{planilha}' de '{filename}' ignorada: {e}")
+                            planilhas_ignoradas.append({"arquivo": filename, "planilha": planilha, "motivo": str(e)})
+                            continue
+                    tarefas.append((caminho, engine, planilha, settings.EXCEL_SKIPROWS, settings.EXCEL_HEADER, colunas))
+                    origem_tarefas.append((filename, nome_robo_base))
+        except CSVProcessingError:
+            raise
+        except Exception as e:
+            raise CSVProcessingError(f"Erro ao ler Excel '{filename}': {e}")
+
+    # 2. Leitura paralela
+    inicio_leitura = time.perf_counter()
+    try:
+        lidas = excel_parsing.ler_planilhas_em_paralelo(tarefas, settings.EXCEL_PARSE_WORKERS)
+    except Exception as e:
+        raise CSVProcessingError(f"Erro ao ler Excel: {e}")
+    tempo_leitura = time.perf_counter() - inicio_leitura
+    logger.info(f"{len(tarefas)} planilhas de {len(arquivos)} arquivos lidas em {tempo_leitura:.2f}s")
+
+    # 3. Mapeamento de colunas de cada planilha, com o robô de cada linha
+    inicio_processamento = time.perf_counter()
+    resumo_lote = ExcelBatchSummary()
+    if progresso:
+        progresso.acompanhar(resumo_lote)
+
+    mapeadas = []  # (processor, DataFrame mapeado, robô de cada linha, segundos de leitura)
+    for (caminho, _, planilha, _, _, _), (filename, nome_robo_base), (df, segundos) in zip(tarefas, origem_tarefas, lidas):
+        processor = ExcelOperationProcessor(df, filename, planilha)
+        try:
+            df_processed = processor.process_dataframe()
+        except CSVProcessingError as e:
+            # Com all_sheets, planilhas sem operações (resumos, gráficos, vazias) são ignoradas
+            if not all_sheets:
+                raise
+            logger.info(f"Planilha '{planilha}' de '{filename}' ignorada: {e}")
+            planilhas_ignoradas.append({"arquivo": filename, "planilha": planilha, "motivo": str(e)})
+            continue
+        resumo_lote.processors.append(processor)
+
+        df_processed, nomes = _robo_por_linha(df_processed, nome_robo_base, processar_multiplos_robos)
+        mapeadas.append((processor, df_processed, nomes, segundos))
+
+    if resumo_lote.get_processing_summary()['total_linhas'] == 0:
+        raise HTTPException(
+            status_code=400,
+            detail="Nenhuma das planilhas enviadas contém dados válidos."
+        )
+
+    # 4. Todos os robôs de todas as planilhas num único comando (e, no modo incremental,
+    # a última Abertura de todos eles em outro)
+    nomes_robos = list(dict.fromkeys(nome for _, _, nomes, _ in mapeadas for nome in nomes.unique()))
+    robo_ids = crud.get_or_create_robos(db, nomes_robos, schema_name=schema)
+    ultimas = _ultimas_aberturas(db, list(robo_ids.values()), schema) if incremental else {}
+
+    # 5. Parse vetorizado de cada planilha
+    planilhas = []  # (processor, linhas válidas, robô de cada linha, segundos de leitura)
+    ignoradas_por_robo: Dict[str, int] = {}
+    for processor, df_processed, nomes, segundos in mapeadas:
+        if incremental:
+            df_novas = processor.filter_incremental(df_processed, nomes.map(robo_ids).map(ultimas))
+            for nome, quantidade in nomes.drop(df_novas.index).value_counts().items():
+                ignoradas_por_robo[nome] = ignoradas_por_robo.get(nome, 0) + int(quantidade)
+            df_processed = df_novas
+        planilhas.append((processor, processor.process_rows_vectorized(df_processed), nomes, segundos))
+    tempo_processamento = time.perf_counter() - inicio_processamento
+
+    # 6. Uma única inserção em massa; a chave (planilha, índice) devolve os erros à planilha certa
+    def linhas_validas():
+        for i, (processor, df_validas, nomes, _) in enumerate(planilhas):
+            for index, dados in processor.iter_bulk_rows(df_validas, nomes.map(robo_ids)):
+                yield (i, index), dados
+
+    inicio_insercao = time.perf_counter()
+    inseridas_por_robo: Dict[int, int] = {}
+    operacoes_salvas, duplicadas, erros_db = crud.bulk_create_operacoes(
+        db, linhas_validas(), schema_name=schema,
+        on_progress=progresso.registrar_insercao if progresso else None,
+        inseridas_por_robo=inseridas_por_robo
+    )
+    tempo_insercao = time.perf_counter() - inicio_insercao
+    resumo_lote.duplicate_count = duplicadas
+
+    erros_por_planilha: Dict[int, List[Tuple[Any, str]]] = {}
+    for (i, index), erro in erros_db:
+        erros_por_planilha.setdefault(i, []).append((index, erro))
+
+    # Detalhamento por planilha e por robô
+    planilhas_processadas = []
+    validas_por_robo: Dict[str, int] = {}
+    erros_db_por_robo: Dict[str, int] = {}
+    for i, (processor, df_validas, nomes, segundos) in enumerate(planilhas):
+        erros_planilha = erros_por_planilha.get(i, [])
+        processor.registrar_insercao(0, erros_planilha)
+        for nome, quantidade in nomes[df_validas.index].value_counts().items():
+            validas_por_robo[nome] = validas_por_robo.get(nome, 0) + int(quantidade)
+        for nome in nomes[[index for index, _ in erros_planilha]]:
+            erros_db_por_robo[nome] = erros_db_por_robo.get(nome, 0) + 1
+
+        summary = processor.get_processing_summary()
+        planilhas_processadas.append({
+            "arquivo": processor.filename,
+            "planilha": processor.sheet_name,
+            "linhas": summary['total_linhas'],
+            "operacoes_validas": len(df_validas),
+            "anteriores_ignoradas": summary['anteriores_ignoradas'],
+            "erros": summary['erros'],
+            "robos": list(nomes.unique()),
+            "tempo_leitura_segundos": round(segundos, 3)
+        })
+
+    robos_processados = {}
+    for nome in nomes_robos:
+        robo_id = robo_ids[nome]
+        salvas = inseridas_por_robo.get(robo_id, 0)
+        erros = erros_db_por_robo.get(nome, 0)
+        robos_processados[nome] = {
+            'robo_id': robo_id,
+            'operacoes_salvas': salvas,
+            'duplicadas': validas_por_robo.get(nome, 0) - salvas - erros,
+            'erros': erros,
+            'anteriores_ignoradas': ignoradas_por_robo.get(nome, 0)
+        }
+
+    summary = resumo_lote.get_processing_summary()
+    tempo_total = time.perf_counter() - inicio_total
+    soma_leituras = sum(segundos for _, segundos in lidas)
+
+    response_data = {
+        "message": f"Processamento concluído para {len(arquivos)} arquivo(s) e {len(planilhas)} planilha(s)",
+        "schema": schema,
+        "arquivos": [filename for _, filename, _ in arquivos],
+        "planilhas_processadas": planilhas_processadas,
+        "planilhas_ignoradas": planilhas_ignoradas,
+        "operacoes_salvas_total": operacoes_salvas,
+        "operacoes_duplicadas_total": summary['duplicadas'],
+        "operacoes_rejeitadas_total": summary['erros'],
+        "operacoes_anteriores_ignoradas_total": summary['anteriores_ignoradas'],
+        "robos_processados": robos_processados,
+        "tempos": {
+            "leitura_segundos": round(tempo_leitura, 3),
+            "leitura_sequencial_estimada_segundos": round(soma_leituras, 3),
+            "speedup_leitura": round(soma_leituras / tempo_leitura, 2) if tempo_leitura > 0 else None,
+            "processamento_segundos": round(tempo_processamento, 3),
+            "insercao_segundos": round(tempo_insercao, 3),
+            "total_segundos": round(tempo_total, 3),
+            "workers": settings.EXCEL_PARSE_WORKERS or os.cpu_count()
+        },
+        "resumo": summary
+    }
+
+    logger.info(
+        f"Lote Excel processado: {len(planilhas)} planilhas, {operacoes_salvas} operações salvas, "
+        f"{summary['duplicadas']} duplicadas, {summary['erros']} erros de {summary['total_linhas']} linhas "
+        f"em {tempo_total:.2f}s (leitura {tempo_leitura:.2f}s)"
+    )
+
+    return response_data
+
+def _validar_excel(
+    origem: Any,
+    filename: str,
+    nome_robo_base: str,
+    sheet_name: Optional[str],
+    all_sheets: bool,
+    processar_multiplos_robos: bool,
+    leitura_rapida: bool = settings.EXCEL_FAST_READER
+) -> Dict[str, Any]:
+    """
+    dry_run do Excel: lê e valida a planilha (ou todas, com all_sheets) com o mesmo
+    parse vetorizado do upload, detectando os robôs pela coluna de robô, sem
+    acessar o banco.
+    """
+    relatorio = DryRunReport(filename)
+    try:
+        excel_file = pd.ExcelFile(origem, engine=excel_parsing.excel_engine(filename))
+    except Exception as e:
+        raise CSVProcessingError(f"Erro ao ler Excel: {e}")
+
+    with excel_file:
+        available_sheets = excel_file.sheet_names
+        target_sheets = available_sheets if all_sheets else [sheet_name if sheet_name else available_sheets[0]]
+        if target_sheets[0] not in available_sheets:
+            raise CSVProcessingError(
+                f"Planilha '{target_sheets[0]}' não encontrada. "
+                f"Disponíveis: {available_sheets}"
+            )
+
+        for planilha in target_sheets:
+            try:
+                processor = ExcelOperationProcessor(_ler_planilha_excel(excel_file, planilha, leitura_rapida), filename, planilha)
+                df_processed = processor.process_dataframe()
+            except CSVProcessingError as e:
+                # Com all_sheets, planilhas sem operações (resumos, gráficos, vazias) são ignoradas
+                if not all_sheets:
+                    raise
+                relatorio.planilhas_ignoradas.append({"planilha": planilha, "motivo": str(e)})
+                continue
+            except Exception as e:
+                raise CSVProcessingError(f"Erro ao ler Excel: {e}")
+
+            df_com_robo, nomes = _robo_por_linha(df_processed, nome_robo_base, processar_multiplos_robos)
+            relatorio.linhas_sem_robo += len(df_processed) - len(df_com_robo)
+            relatorio.processors.append(processor)
+            relatorio.registrar(processor.process_rows_vectorized(df_com_robo), nomes)
+
+    if relatorio.total_linhas == 0:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Arquivo Excel '{filename}' está vazio ou não contém dados válidos."
+        )
+    return relatorio.to_dict()
+
 @router.post("/excel/", summary="Upload de arquivo Excel de operações")
 async def upload_operacoes_excel(
     db: Session = Depends(get_db),
@@ -459,11 +1756,28 @@ async def upload_operacoes_excel(
     nome_robo_form: Optional[str] = Form(None, description="Nome do Robô único (se arquivo contém apenas um robô)"),
     sheet_name: Optional[str] = Form(None, description="Nome da planilha (opcional - usa a primeira se não especificado)"),
     processar_multiplos_robos: bool = Form(True, description="Se True, detecta automaticamente múltiplos robôs na coluna Robo"),
-    schema: str = Query(settings.DEFAULT_UPLOAD_SCHEMA, description="Schema para salvar os dados")
+    schema: str = Query(settings.DEFAULT_UPLOAD_SCHEMA, description="Schema para salvar os dados"),
+    async_job: bool = Query(False, description="Processa em segundo plano e retorna o ID do job imediatamente"),
+    all_sheets: bool = Query(False, description="Processa todas as planilhas do arquivo, lidas em paralelo"),
+    leitura_rapida: bool = Query(settings.EXCEL_FAST_READER, description="Lê só as colunas usadas, em modo somente leitura (.xlsx)"),
+    incremental: bool = Query(False, description=INCREMENTAL_DESCRIPTION),
+    dry_run: bool = Query(False, description=DRY_RUN_DESCRIPTION)
 ):
     """
     Faz upload robusto de um arquivo Excel, processa as operações com validação
     e tratamento de erros avançado, e salva no banco de dados.
+
+    Com async_job=true, retorna um job_id na hora; o progresso pode ser
+    consultado em /uploads/jobs/{job_id}.
+
+    Com all_sheets=true, todas as planilhas são lidas em paralelo (pool de processos)
+    e inseridas de uma vez; a resposta traz o detalhamento por planilha e os tempos.
+
+    Com incremental=true, só as operações a partir da última já salva de cada
+    robô são validadas e inseridas.
+
+    Com dry_run=true, só valida: retorna erros por categoria, exemplos, período
+    e robôs detectados, sem gravar nada nem usar o banco.
     """
     filename = arquivo_excel.filename
     logger.info(f"Iniciando upload de Excel: {filename} (schema: {schema})")
@@ -488,172 +1802,716 @@ async def upload_operacoes_excel(
         )
 
     try:
+        if dry_run:
+            buffer = io.BytesIO(await arquivo_excel.read())
+            try:
+                return _validar_excel(
+                    buffer, filename, nome_robo_base, sheet_name, all_sheets, processar_multiplos_robos,
+                    leitura_rapida=leitura_rapida
+                )
+            finally:
+                buffer.close()
+
+        if all_sheets:
+            # Os processos de leitura abrem o arquivo pelo caminho em disco
+            caminho_temp = await _spool_upload_to_disk(arquivo_excel)
+            def processar(db_lote, job=None):
+                return _processar_excel_lote(
+                    db_lote, [(caminho_temp, filename, nome_robo_base)], sheet_name, True,
+                    processar_multiplos_robos, schema, progresso=job, leitura_rapida=leitura_rapida,
+                    incremental=incremental
+                )
+            if async_job:
+                job = upload_jobs.submit("excel", filename, schema, _executar_em_background(caminho_temp, processar))
+                return _resposta_job(job)
+            try:
+                # Espera o pool de processos numa thread, sem segurar o event loop
+                return await run_in_threadpool(processar, db)
+            finally:
+                os.remove(caminho_temp)
+
+        if async_job:
+            caminho_temp = await _spool_upload_to_disk(arquivo_excel)
+            job = upload_jobs.submit("excel", filename, schema, _executar_em_background(
+                caminho_temp,
+                lambda db_job, job: _processar_excel(
+                    db_job, caminho_temp, filename, nome_robo_base, sheet_name,
+                    processar_multiplos_robos, schema, progresso=job, leitura_rapida=leitura_rapida,
+                    incremental=incremental
+                )
+            ))
+            return _resposta_job(job)
+
         # Ler e processar Excel
         contents = await arquivo_excel.read()
         buffer = io.BytesIO(contents)
-
         try:
-            # Detectar extensão e usar engine apropriado
-            if filename.lower().endswith('.xlsx'):
-                engine = 'openpyxl'
-            else:  # .xls
-                engine = 'xlrd'
-            
-            # Primeiro, ler as planilhas disponíveis
-            excel_file = pd.ExcelFile(buffer, engine=engine)
-            available_sheets = excel_file.sheet_names
-            logger.info(f"Planilhas disponíveis: {available_sheets}")
-
-            # Determinar qual planilha usar
-            target_sheet = sheet_name if sheet_name else available_sheets[0]
-            if target_sheet not in available_sheets:
-                raise CSVProcessingError(
-                    f"Planilha '{target_sheet}' não encontrada. "
-                    f"Disponíveis: {available_sheets}"
-                )
-            
-            logger.info(f"Usando planilha: '{target_sheet}'")
-            
-            # Ler a planilha específica
-            df = pd.read_excel(
-                buffer,
-                sheet_name=target_sheet,
-                skiprows=settings.EXCEL_SKIPROWS,
-                header=settings.EXCEL_HEADER,
-                engine=engine
+            return await run_in_threadpool(
+                _processar_excel, db, buffer, filename, nome_robo_base, sheet_name, processar_multiplos_robos, schema,
+                leitura_rapida=leitura_rapida, incremental=incremental
             )
-            
-        except Exception as e:
-            raise CSVProcessingError(f"Erro ao ler Excel: {e}")
         finally:
             buffer.close()
 
-        if df.empty:
+    except HTTPException:
+        raise
+    except CSVProcessingError as e:
+        logger.error(f"Erro de processamento Excel '{filename}': {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro interno ao processar Excel '{filename}': {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Erro interno ao processar arquivo Excel: {str(e)}"
+        )
+    finally:
+        await arquivo_excel.close()
+
+@router.post("/excel/multiplos/", summary="Upload de vários arquivos Excel de operações")
+async def upload_operacoes_excel_multiplos(
+    db: Session = Depends(get_db),
+    arquivos_excel: List[UploadFile] = File(..., description="Arquivos Excel contendo as operações (.xlsx ou .xls)"),
+    nome_robo_form: Optional[str] = Form(None, description="Nome do Robô único para todos os arquivos (padrão: nome de cada arquivo)"),
+    sheet_name: Optional[str] = Form(None, description="Nome da planilha em cada arquivo (opcional - usa a primeira se não especificado)"),
+    processar_multiplos_robos: bool = Form(True, description="Se True, detecta automaticamente múltiplos robôs na coluna Robo"),
+    schema: str = Query(settings.DEFAULT_UPLOAD_SCHEMA, description="Schema para salvar os dados"),
+    all_sheets: bool = Query(False, description="Processa todas as planilhas de cada arquivo"),
+    leitura_rapida: bool = Query(settings.EXCEL_FAST_READER, description="Lê só as colunas usadas, em modo somente leitura (.xlsx)"),
+    incremental: bool = Query(False, description=INCREMENTAL_DESCRIPTION)
+):
+    """
+    Faz upload de vários arquivos Excel de uma vez. As planilhas de todos os
+    arquivos são lidas em paralelo num pool de processos e as operações são
+    salvas numa única inserção em massa.
+
+    A resposta traz o detalhamento por planilha e por robô e os tempos de
+    leitura (paralela e sequencial estimada), processamento e inserção.
+    """
+    filenames = [arquivo.filename for arquivo in arquivos_excel]
+    logger.info(f"Iniciando upload de {len(filenames)} arquivos Excel: {filenames} (schema: {schema})")
+
+    # Validações iniciais
+    for filename in filenames:
+        if not filename or not filename.lower().endswith(('.xlsx', '.xls')):
             raise HTTPException(
                 status_code=400,
-                detail=f"Arquivo Excel '{filename}' está vazio ou não contém dados válidos."
+                detail=f"Formato de arquivo inválido: '{filename}'. Apenas arquivos Excel (.xlsx, .xls) são permitidos."
             )
 
-        # Processar DataFrame
-        processor = ExcelOperationProcessor(df, filename, target_sheet)
-        df_processed = processor.process_dataframe()
+    caminhos_temp: List[str] = []
+    try:
+        arquivos = []
+        for arquivo, filename in zip(arquivos_excel, filenames):
+            nome_robo_base = nome_robo_form.strip() if nome_robo_form else os.path.splitext(filename)[0].strip()
+            if not nome_robo_base:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Não foi possível determinar o nome do Robô para '{filename}'."
+                )
+            caminho_temp = await _spool_upload_to_disk(arquivo)
+            caminhos_temp.append(caminho_temp)
+            arquivos.append((caminho_temp, filename, nome_robo_base))
 
-        # Detectar se deve processar múltiplos robôs
-        operacoes_salvas = 0
-        robos_processados = {}
-        
-        if processar_multiplos_robos and settings.ROBO_COLUMN_NAME in df_processed.columns:
-            logger.info(f"Detectada coluna '{settings.ROBO_COLUMN_NAME}' - processando múltiplos robôs automaticamente")
-            
-            # Agrupar por nome do robô
-            df_processed['RoboNome'] = df_processed[settings.ROBO_COLUMN_NAME].astype(str).str.strip()
-            robos_unicos = df_processed['RoboNome'].dropna().unique()
-            
-            logger.info(f"Robôs detectados: {list(robos_unicos)}")
-            
-            for nome_robo in robos_unicos:
-                if not nome_robo or nome_robo.lower() in ['nan', 'none', '']:
-                    continue
+        # Espera o pool de processos numa thread, sem segurar o event loop
+        return await run_in_threadpool(
+            _processar_excel_lote, db, arquivos, sheet_name, all_sheets, processar_multiplos_robos, schema,
+            leitura_rapida=leitura_rapida, incremental=incremental
+        )
 
-                # Buscar/criar robô
-                db_robo_atual = crud.get_robo_by_nome(db, nome=nome_robo, schema_name=schema)
-                if not db_robo_atual:
-                    logger.info(f"Criando novo robô '{nome_robo}' no schema '{schema}'")
-                    robo_schema_in = schemas.RoboCreate(nome=nome_robo)
-                    db_robo_atual = crud.create_robo(db=db, robo_in=robo_schema_in, schema_name=schema)
-                else:
-                    logger.info(f"Usando robô existente: '{db_robo_atual.nome}' (ID: {db_robo_atual.id})")
-                
-                robos_processados[nome_robo] = {
-                    'robo_id': db_robo_atual.id,
-                    'operacoes_salvas': 0,
-                    'erros': 0
-                }
-                
-                # Filtrar operações deste robô
-                df_robo = df_processed[df_processed['RoboNome'] == nome_robo]
-                
-                # Processar operações do robô atual
-                for index, row in df_robo.iterrows():
-                    operacao_data = processor.process_single_row(index, row)
-                    
-                    if operacao_data:
-                        try:
-                            crud.create_operacao(
-                                db=db, 
-                                operacao_in=operacao_data, 
-                                robo_id_for_op=db_robo_atual.id, 
-                                schema_name=schema
-                            )
-                            robos_processados[nome_robo]['operacoes_salvas'] += 1
-                            operacoes_salvas += 1
-                        except Exception as e:
-                            processor._add_error(index, f"Erro ao salvar no banco: {e}")
-                            robos_processados[nome_robo]['erros'] += 1
+    except HTTPException:
+        raise
+    except CSVProcessingError as e:
+        logger.error(f"Erro de processamento Excel {filenames}: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro interno ao processar Excel {filenames}: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro interno ao processar arquivos Excel: {str(e)}"
+        )
+    finally:
+        for caminho_temp in caminhos_temp:
+            os.remove(caminho_temp)
+        for arquivo in arquivos_excel:
+            await arquivo.close()
+
+ARROW_EXTENSIONS = ('.parquet', '.arrow', '.feather', '.ipc')
+
+class ArrowOperationProcessor(CSVOperationProcessor):
+    """
+    Processador para arquivos tipados (Parquet/Arrow IPC).
+
+    Colunas que já chegam como datetime ou numéricas passam direto pelo
+    process_rows_vectorized, sem parse de texto nem limpeza numérica.
+    """
+
+    def _line_number(self, index: int) -> int:
+        return index + 1  # Sem cabeçalho textual: número da linha da tabela (1-based)
+
+    def _plan_key(self, columns: List[str]) -> str:
+        return fingerprint(columns, 'arrow')
+
+def _ler_tabela_arrow(caminho: str, filename: str) -> pd.DataFrame:
+    """
+    Lê um arquivo Parquet ou Arrow IPC (formato arquivo/Feather v2 ou stream)
+    trazendo só as colunas que o ColumnMapper reconhece no schema do arquivo.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc as pa_ipc
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise HTTPException(
+            status_code=501,
+            detail="Suporte a Parquet/Arrow indisponível: instale o pacote 'pyarrow' no servidor."
+        )
+
+    try:
+        if filename.lower().endswith('.parquet'):
+            arquivo = pq.ParquetFile(caminho)
+            colunas = ColumnMapper(arquivo.schema_arrow.names).used_columns()
+            # Parquet é colunar: as demais colunas nem são lidas do disco
+            tabela = arquivo.read(columns=colunas)
         else:
-            # Modo single robô (comportamento original)
-            logger.info(f"Processando como robô único: '{nome_robo_base}'")
-            
-            # Verificar/Criar o Robô único
-            db_robo = crud.get_robo_by_nome(db, nome=nome_robo_base, schema_name=schema)
-            if not db_robo:
-                logger.info(f"Criando novo robô '{nome_robo_base}' no schema '{schema}'")
-                robo_schema_in = schemas.RoboCreate(nome=nome_robo_base)
-                db_robo = crud.create_robo(db=db, robo_in=robo_schema_in, schema_name=schema)
-            
-            robos_processados[nome_robo_base] = {
-                'robo_id': db_robo.id,
-                'operacoes_salvas': 0,
-                'erros': 0
-            }
-            
-            # Processar cada linha
-            for index, row in df_processed.iterrows():
-                operacao_data = processor.process_single_row(index, row)
-                
-                if operacao_data:
-                    try:
-                        crud.create_operacao(
-                            db=db, 
-                            operacao_in=operacao_data, 
-                            robo_id_for_op=db_robo.id, 
-                            schema_name=schema
-                        )
-                        robos_processados[nome_robo_base]['operacoes_salvas'] += 1
-                        operacoes_salvas += 1
-                    except Exception as e:
-                        processor._add_error(index, f"Erro ao salvar no banco: {e}")
-                        robos_processados[nome_robo_base]['erros'] += 1
+            with pa.memory_map(caminho) as origem:
+                try:
+                    tabela = pa_ipc.open_file(origem).read_all()
+                except pa.ArrowInvalid:
+                    origem.seek(0)
+                    tabela = pa_ipc.open_stream(origem).read_all()
+            colunas = ColumnMapper(tabela.schema.names).used_columns()
+            tabela = tabela.select(colunas)
+    except CSVProcessingError:
+        raise
+    except Exception as e:
+        raise CSVProcessingError(f"Erro ao ler arquivo '{filename}': {e}")
 
-        # Preparar resposta
-        summary = processor.get_processing_summary()
-        
-        response_data = {
-            "message": f"Processamento concluído para '{filename}'",
-            "schema": schema,
-            "planilha_usada": target_sheet,
-            "planilhas_disponiveis": available_sheets,
-            "operacoes_salvas_total": operacoes_salvas,
-            "robos_processados": robos_processados,
-            "resumo": summary
+    logger.info(f"Arquivo '{filename}': {tabela.num_rows} linhas, schema {tabela.schema}")
+    return tabela.to_pandas()
+
+def _processar_arrow(
+    db: Session,
+    caminho: str,
+    filename: str,
+    nome_robo_base: str,
+    processar_multiplos_robos: bool,
+    schema: str,
+    progresso: Optional[UploadJob] = None,
+    incremental: bool = False
+) -> Dict[str, Any]:
+    """Processa e salva um arquivo Parquet/Arrow de operações"""
+    df = _ler_tabela_arrow(caminho, filename)
+    if df.empty:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Arquivo '{filename}' está vazio ou não contém dados válidos."
+        )
+
+    processor = ArrowOperationProcessor(df, filename)
+    if progresso:
+        progresso.acompanhar(processor)
+    df_processed = processor.process_dataframe()
+
+    operacoes_salvas, robos_processados = _salvar_dataframe_processado(
+        db, processor, df_processed, nome_robo_base, processar_multiplos_robos, schema,
+        progresso=progresso, incremental=incremental
+    )
+
+    # Preparar resposta
+    summary = processor.get_processing_summary()
+
+    response_data = {
+        "message": f"Processamento concluído para '{filename}'",
+        "schema": schema,
+        "colunas_tipadas": {
+            coluna: str(dtype) for coluna, dtype in df_processed.dtypes.items() if dtype != object
+        },
+        "operacoes_salvas_total": operacoes_salvas,
+        "operacoes_duplicadas_total": summary['duplicadas'],
+        "operacoes_rejeitadas_total": summary['erros'],
+        "operacoes_anteriores_ignoradas_total": summary['anteriores_ignoradas'],
+        "robos_processados": robos_processados,
+        "resumo": summary
+    }
+
+    logger.info(
+        f"Arquivo '{filename}' processado: {operacoes_salvas} operações salvas, "
+        f"{summary['duplicadas']} duplicadas, {summary['erros']} erros de {summary['total_linhas']} linhas"
+    )
+
+    return response_data
+
+@router.post("/parquet/", summary="Upload de arquivo Parquet ou Arrow de operações")
+async def upload_operacoes_parquet(
+    db: Session = Depends(get_db),
+    arquivo: UploadFile = File(..., description="Arquivo Parquet (.parquet) ou Arrow IPC (.arrow, .feather, .ipc)"),
+    nome_robo_form: Optional[str] = Form(None, description="Nome do Robô único (se arquivo contém apenas um robô)"),
+    processar_multiplos_robos: bool = Form(True, description="Se True, detecta automaticamente múltiplos robôs na coluna Robo"),
+    schema: str = Query(settings.DEFAULT_UPLOAD_SCHEMA, description="Schema para salvar os dados"),
+    async_job: bool = Query(False, description="Processa em segundo plano e retorna o ID do job imediatamente"),
+    incremental: bool = Query(False, description=INCREMENTAL_DESCRIPTION)
+):
+    """
+    Faz upload de um arquivo Parquet ou Arrow IPC exportado pela plataforma.
+
+    As colunas são reconhecidas pelo mesmo mapeamento do CSV/Excel, só elas são
+    lidas, e colunas já tipadas (datas, números) vão direto para a inserção em
+    massa, sem parse de texto nem limpeza numérica. Requer o pacote pyarrow.
+    """
+    filename = arquivo.filename
+    logger.info(f"Iniciando upload de Parquet/Arrow: {filename} (schema: {schema})")
+
+    # Validações iniciais
+    if not filename or not filename.lower().endswith(ARROW_EXTENSIONS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Formato de arquivo inválido. Extensões aceitas: {', '.join(ARROW_EXTENSIONS)}."
+        )
+
+    # Determinar nome do robô
+    if nome_robo_form:
+        nome_robo_base = nome_robo_form.strip()
+    else:
+        nome_robo_base = os.path.splitext(filename)[0].strip()
+
+    if not nome_robo_base:
+        raise HTTPException(
+            status_code=400,
+            detail="Não foi possível determinar o nome do Robô."
+        )
+
+    try:
+        # pyarrow lê do disco (memory map / leitura colunar), sem carregar o upload na memória
+        caminho_temp = await _spool_upload_to_disk(arquivo)
+        def processar(db_arquivo, job=None):
+            return _processar_arrow(
+                db_arquivo, caminho_temp, filename, nome_robo_base, processar_multiplos_robos, schema,
+                progresso=job, incremental=incremental
+            )
+        if async_job:
+            job = upload_jobs.submit("parquet", filename, schema, _executar_em_background(caminho_temp, processar))
+            return _resposta_job(job)
+        try:
+            return processar(db)
+        finally:
+            os.remove(caminho_temp)
+
+    except HTTPException:
+        raise
+    except CSVProcessingError as e:
+        logger.error(f"Erro de processamento '{filename}': {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro interno ao processar '{filename}': {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro interno ao processar arquivo Parquet/Arrow: {str(e)}"
+        )
+    finally:
+        await arquivo.close()
+
+ARCHIVE_MEMBER_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+class ArchiveSummary:
+    """Resumo agregado dos arquivos de um zip (mesma interface de get_processing_summary)"""
+
+    def __init__(self):
+        self.processors: List[CSVOperationProcessor] = []
+
+    def get_processing_summary(self) -> Dict[str, Any]:
+        processors = list(self.processors)
+        summaries = [p.get_processing_summary() for p in processors]
+        return {
+            'processadas': sum(s['processadas'] for s in summaries),
+            'erros': sum(s['erros'] for s in summaries),
+            'duplicadas': sum(s['duplicadas'] for s in summaries),
+            'anteriores_ignoradas': sum(s['anteriores_ignoradas'] for s in summaries),
+            'erros_por_categoria': _somar_categorias(processors),
+            'total_linhas': sum(s['total_linhas'] for s in summaries),
+            'detalhes_erros': [{**erro, 'arquivo': p.filename} for p in processors for erro in p.errors][-10:]
         }
 
-        # Log do resultado
-        logger.info(
-            f"Excel '{filename}' processado: {operacoes_salvas} operações salvas, "
-            f"{summary['erros']} erros de {summary['total_linhas']} linhas"
+class ArchiveMember:
+    """Um arquivo do zip: lido e validado numa thread, gravado pela thread da requisição"""
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.tipo = 'csv' if nome.lower().endswith('.csv') else 'excel'
+        self.robo_base = os.path.splitext(os.path.basename(nome))[0].strip()
+        self.processor: Optional[CSVOperationProcessor] = None
+        self.df_processed: Optional[pd.DataFrame] = None
+        self.df_validas: Optional[pd.DataFrame] = None
+        self.nomes: Optional[pd.Series] = None  # robô de cada linha
+        self.erro: Optional[str] = None
+        self.tempos: Dict[str, float] = {}
+
+    def validar(self, robo_ids: Dict[str, int], ultimas: Dict[int, datetime], incremental: bool):
+        """Filtro incremental (com a última Abertura do robô de cada linha) e parse vetorizado"""
+        inicio = time.perf_counter()
+        df = self.df_processed
+        if incremental:
+            df = self.processor.filter_incremental(df, self.nomes.map(robo_ids).map(ultimas))
+        self.df_validas = self.processor.process_rows_vectorized(df)
+        self.df_processed = None
+        self.tempos['processamento'] = self.tempos.get('processamento', 0.0) + time.perf_counter() - inicio
+
+def _preparar_membro_zip(
+    zf: zipfile.ZipFile,
+    info: zipfile.ZipInfo,
+    sheet_name: Optional[str],
+    processar_multiplos_robos: bool,
+    leitura_rapida: bool,
+    robo_ids: Dict[str, int],
+    ultimas: Dict[int, datetime],
+    incremental: bool,
+    verificados: FrozenSet[str] = frozenset()
+) -> ArchiveMember:
+    """
+    Lê, mapeia e valida um arquivo do zip (executado no pool de threads, sem usar o banco).
+
+    CSV usa sempre o robô do nome do arquivo, como em /uploads/csv/; Excel segue
+    processar_multiplos_robos. Se o arquivo trouxer robôs que não estão em
+    `robo_ids` nem em `verificados` (nomes já buscados no banco, existentes ou não)
+    no modo incremental, a validação fica para a thread da requisição, depois de
+    buscar a última Abertura deles. Qualquer falha do arquivo fica em `membro.erro`.
+    """
+    membro = ArchiveMember(info.filename)
+    inicio = time.perf_counter()
+    try:
+        try:
+            with zf.open(info) as arquivo:
+                buffer = io.BytesIO(arquivo.read())
+        except (zipfile.BadZipFile, zlib.error, EOFError, OSError, RuntimeError, NotImplementedError) as e:
+            # CRC inválido, membro truncado, criptografado (RuntimeError) ou compressão sem suporte
+            raise CSVProcessingError(f"Arquivo ilegível no zip: {e}")
+
+        if membro.tipo == 'csv':
+            df = _ler_csv(buffer)
+            processor = CSVOperationProcessor(df, membro.nome)
+        else:
+            try:
+                excel_file = pd.ExcelFile(buffer, engine=excel_parsing.excel_engine(membro.nome))
+                planilha = sheet_name if sheet_name else excel_file.sheet_names[0]
+                if planilha not in excel_file.sheet_names:
+                    raise CSVProcessingError(
+                        f"Planilha '{planilha}' não encontrada. Disponíveis: {excel_file.sheet_names}"
+                    )
+                df = _ler_planilha_excel(excel_file, planilha, leitura_rapida)
+            except CSVProcessingError:
+                raise
+            except Exception as e:
+                raise CSVProcessingError(f"Erro ao ler Excel: {e}")
+            processor = ExcelOperationProcessor(df, membro.nome, planilha)
+        membro.tempos['leitura'] = time.perf_counter() - inicio
+
+        if df.empty:
+            raise CSVProcessingError("Arquivo vazio ou sem dados válidos")
+        if not membro.robo_base:
+            raise CSVProcessingError("Não foi possível determinar o nome do Robô")
+
+        inicio = time.perf_counter()
+        membro.processor = processor
+        membro.df_processed, membro.nomes = _robo_por_linha(
+            processor.process_dataframe(), membro.robo_base,
+            processar_multiplos_robos and membro.tipo == 'excel'
         )
+        membro.tempos['processamento'] = time.perf_counter() - inicio
+        if not incremental or set(membro.nomes.unique()) <= robo_ids.keys() | verificados:
+            membro.validar(robo_ids, ultimas, incremental)
+    except CSVProcessingError as e:
+        membro.erro = str(e)
+        membro.tempos.setdefault('leitura', time.perf_counter() - inicio)
+    except Exception as e:
+        # Um arquivo não derruba o zip: os anteriores já foram gravados
+        logger.error(f"Erro inesperado ao preparar '{membro.nome}' do zip: {e}", exc_info=True)
+        membro.erro = f"Erro inesperado ao processar o arquivo: {e}"
+        membro.tempos.setdefault('leitura', time.perf_counter() - inicio)
+    return membro
 
-        return response_data
+def _salvar_membro_zip(
+    db: Session,
+    membro: ArchiveMember,
+    schema: str,
+    robo_ids: Dict[str, int],
+    ultimas: Dict[int, datetime],
+    inseridas_por_robo: Dict[int, int],
+    progresso: Optional[UploadJob] = None,
+    incremental: bool = False
+) -> Dict[str, Any]:
+    """Resolve os robôs ainda desconhecidos do arquivo e grava suas operações numa única inserção em massa"""
+    novos = [nome for nome in membro.nomes.unique() if nome not in robo_ids]
+    if novos:
+        ids_novos = crud.get_or_create_robos(db, novos, schema_name=schema)
+        robo_ids.update(ids_novos)
+        if incremental:
+            ultimas.update(_ultimas_aberturas(db, list(ids_novos.values()), schema))
+    if membro.df_validas is None:
+        membro.validar(robo_ids, ultimas, incremental)
+
+    processor = membro.processor
+    inicio = time.perf_counter()
+    inseridas_arquivo: Dict[int, int] = {}
+    operacoes_salvas, duplicadas, erros_db = crud.bulk_create_operacoes(
+        db, processor.iter_bulk_rows(membro.df_validas, membro.nomes.map(robo_ids)), schema_name=schema,
+        on_progress=progresso.registrar_insercao if progresso else None,
+        inseridas_por_robo=inseridas_arquivo
+    )
+    membro.tempos['insercao'] = time.perf_counter() - inicio
+    processor.registrar_insercao(duplicadas, erros_db)
+    for robo_id, quantidade in inseridas_arquivo.items():
+        inseridas_por_robo[robo_id] = inseridas_por_robo.get(robo_id, 0) + quantidade
+
+    summary = processor.get_processing_summary()
+    return {
+        "arquivo": membro.nome,
+        "tipo": membro.tipo,
+        "planilha": getattr(processor, 'sheet_name', None),
+        "robos": list(membro.nomes.unique()),
+        "linhas": summary['total_linhas'],
+        "operacoes_salvas": operacoes_salvas,
+        "operacoes_duplicadas": summary['duplicadas'],
+        "operacoes_rejeitadas": summary['erros'],
+        "operacoes_anteriores_ignoradas": summary['anteriores_ignoradas'],
+        "tempos": {f"{etapa}_segundos": round(segundos, 3) for etapa, segundos in membro.tempos.items()}
+    }
+
+def _processar_archive(
+    db: Session,
+    caminho: str,
+    filename: str,
+    sheet_name: Optional[str],
+    processar_multiplos_robos: bool,
+    schema: str,
+    progresso: Optional[UploadJob] = None,
+    leitura_rapida: bool = settings.EXCEL_FAST_READER,
+    incremental: bool = False
+) -> Dict[str, Any]:
+    """
+    Processa um zip com vários CSV/Excel de operações, um robô por arquivo (nome do arquivo).
+
+    Os robôs de todos os arquivos são buscados num único comando e só são criados
+    ao gravar um arquivo lido com sucesso. A leitura e a validação rodam num pool de settings.ARCHIVE_UPLOAD_WORKERS
+    threads, à frente da gravação: enquanto um arquivo é inserido, os próximos
+    já estão sendo lidos. Cada arquivo vai numa inserção em massa (transação)
+    própria; arquivos ilegíveis ou vazios entram em `arquivos_com_erro` sem
+    interromper os demais.
+    """
+    inicio_total = time.perf_counter()
+    try:
+        zf = zipfile.ZipFile(caminho)
+    except zipfile.BadZipFile as e:
+        raise CSVProcessingError(f"Arquivo zip inválido '{filename}': {e}")
+
+    with zf:
+        # 1. Arquivos suportados (pastas, arquivos ocultos e metadados do macOS ficam de fora)
+        membros: List[zipfile.ZipInfo] = []
+        arquivos_ignorados = []
+        for info in zf.infolist():
+            nome_base = os.path.basename(info.filename)
+            if info.is_dir() or info.filename.startswith('__MACOSX/') or nome_base.startswith(('.', '~$')):
+                continue
+            if not nome_base.lower().endswith(ARCHIVE_MEMBER_EXTENSIONS):
+                arquivos_ignorados.append({"arquivo": info.filename, "motivo": "Extensão não suportada"})
+                continue
+            membros.append(info)
+
+        if not membros:
+            raise HTTPException(
+                status_code=400,
+                detail=f"O arquivo '{filename}' não contém arquivos {', '.join(ARCHIVE_MEMBER_EXTENSIONS)}."
+            )
+        tamanho_total = sum(info.file_size for info in membros)
+        if tamanho_total > settings.ARCHIVE_MAX_UNCOMPRESSED_MB * 1024 * 1024:
+            raise CSVProcessingError(
+                f"Conteúdo descompactado de '{filename}' ({tamanho_total / 1024 / 1024:.0f} MB) excede o limite "
+                f"de {settings.ARCHIVE_MAX_UNCOMPRESSED_MB} MB"
+            )
+        logger.info(f"Zip '{filename}': {len(membros)} arquivos, {tamanho_total / 1024 / 1024:.1f} MB descompactados")
+
+        # 2. Robôs existentes de todos os arquivos num único comando (e a última Abertura de todos
+        # em outro); os que faltam são criados só para arquivos lidos com sucesso (_salvar_membro_zip).
+        # Os da coluna Robo dos arquivos Excel só são conhecidos depois da leitura
+        nomes_base = [
+            membro.robo_base for membro in map(ArchiveMember, (info.filename for info in membros))
+            if membro.robo_base and (membro.tipo == 'csv' or not processar_multiplos_robos)
+        ]
+        robo_ids = crud.get_ids_robos(db, nomes_base, schema_name=schema)
+        ultimas = _ultimas_aberturas(db, list(robo_ids.values()), schema) if incremental else {}
+        # Robôs ainda inexistentes não têm operações: a validação incremental não precisa esperar por eles
+        verificados = frozenset(nomes_base)
+
+        # 3. Leitura/validação no pool, gravação na ordem do zip assim que cada arquivo fica pronto
+        resumo = ArchiveSummary()
+        if progresso:
+            progresso.acompanhar(resumo)
+        workers = max(1, settings.ARCHIVE_UPLOAD_WORKERS)
+        pendentes_zip = iter(membros)
+        arquivos_processados = []
+        arquivos_com_erro = []
+        inseridas_por_robo: Dict[int, int] = {}
+        tempo_espera = 0.0
+
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload-zip")
+        try:
+            # Janela de 2x workers arquivos em andamento limita a memória com zips grandes
+            preparando = deque(
+                pool.submit(
+                    _preparar_membro_zip, zf, info, sheet_name, processar_multiplos_robos,
+                    leitura_rapida, dict(robo_ids), dict(ultimas), incremental, verificados
+                )
+                for info in itertools.islice(pendentes_zip, workers * 2)
+            )
+            while preparando:
+                inicio_espera = time.perf_counter()
+                membro = preparando.popleft().result()
+                tempo_espera += time.perf_counter() - inicio_espera
+                proximo = next(pendentes_zip, None)
+                if proximo is not None:
+                    preparando.append(pool.submit(
+                        _preparar_membro_zip, zf, proximo, sheet_name, processar_multiplos_robos,
+                        leitura_rapida, dict(robo_ids), dict(ultimas), incremental, verificados
+                    ))
+
+                if membro.erro:
+                    logger.warning(f"Arquivo '{membro.nome}' do zip '{filename}' ignorado: {membro.erro}")
+                    arquivos_com_erro.append({
+                        "arquivo": membro.nome,
+                        "erro": membro.erro,
+                        "tempos": {f"{etapa}_segundos": round(segundos, 3) for etapa, segundos in membro.tempos.items()}
+                    })
+                    continue
+                resumo.processors.append(membro.processor)
+                arquivos_processados.append(_salvar_membro_zip(
+                    db, membro, schema, robo_ids, ultimas, inseridas_por_robo,
+                    progresso=progresso, incremental=incremental
+                ))
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    robos_processados = {
+        nome: {'robo_id': robo_id, 'operacoes_salvas': inseridas_por_robo.get(robo_id, 0)}
+        for nome, robo_id in robo_ids.items()
+    }
+    summary = resumo.get_processing_summary()
+    operacoes_salvas = sum(arquivo["operacoes_salvas"] for arquivo in arquivos_processados)
+    tempo_total = time.perf_counter() - inicio_total
+    soma_etapas = {
+        etapa: sum(arquivo["tempos"].get(f"{etapa}_segundos", 0.0) for arquivo in arquivos_processados + arquivos_com_erro)
+        for etapa in ('leitura', 'processamento', 'insercao')
+    }
+    sequencial_estimado = sum(soma_etapas.values())
+
+    response_data = {
+        "message": f"Processamento concluído para '{filename}': {len(arquivos_processados)} de {len(membros)} arquivo(s)",
+        "schema": schema,
+        "arquivos_processados": arquivos_processados,
+        "arquivos_com_erro": arquivos_com_erro,
+        "arquivos_ignorados": arquivos_ignorados,
+        "operacoes_salvas_total": operacoes_salvas,
+        "operacoes_duplicadas_total": summary['duplicadas'],
+        "operacoes_rejeitadas_total": summary['erros'],
+        "operacoes_anteriores_ignoradas_total": summary['anteriores_ignoradas'],
+        "robos_processados": robos_processados,
+        "tempos": {
+            **{f"{etapa}_soma_segundos": round(segundos, 3) for etapa, segundos in soma_etapas.items()},
+            "espera_leitura_segundos": round(tempo_espera, 3),
+            "sequencial_estimado_segundos": round(sequencial_estimado, 3),
+            "speedup": round(sequencial_estimado / tempo_total, 2) if tempo_total > 0 else None,
+            "total_segundos": round(tempo_total, 3),
+            "workers": workers
+        },
+        "resumo": summary
+    }
+
+    logger.info(
+        f"Zip '{filename}' processado: {len(arquivos_processados)} arquivos ({len(arquivos_com_erro)} com erro), "
+        f"{operacoes_salvas} operações salvas, {summary['duplicadas']} duplicadas, {summary['erros']} erros "
+        f"de {summary['total_linhas']} linhas em {tempo_total:.2f}s"
+    )
+
+    return response_data
 
+@router.post("/archive/", summary="Upload de arquivo zip com vários CSV/Excel de operações")
+async def upload_operacoes_archive(
+    db: Session = Depends(get_db),
+    arquivo_zip: UploadFile = File(..., description="Arquivo .zip com um CSV ou Excel de operações por robô"),
+    sheet_name: Optional[str] = Form(None, description="Planilha dos arquivos Excel (opcional - usa a primeira se não especificado)"),
+    processar_multiplos_robos: bool = Form(True, description="Se True, detecta múltiplos robôs na coluna Robo dos arquivos Excel"),
+    schema: str = Query(settings.DEFAULT_UPLOAD_SCHEMA, description="Schema para salvar os dados"),
+    leitura_rapida: bool = Query(settings.EXCEL_FAST_READER, description="Lê só as colunas usadas, em modo somente leitura (.xlsx)"),
+    async_job: bool = Query(False, description="Processa em segundo plano e retorna o ID do job imediatamente"),
+    incremental: bool = Query(False, description=INCREMENTAL_DESCRIPTION)
+):
+    """
+    Atualização completa em uma requisição: um zip com um arquivo por robô
+    (CSV ou Excel), cujo nome dá o nome do robô, como em /uploads/csv/.
+
+    Os arquivos são lidos e validados em paralelo enquanto os anteriores são
+    gravados, cada um numa única inserção em massa. A resposta traz o resultado
+    e os tempos (leitura, processamento, inserção) de cada arquivo e do lote.
+    """
+    filename = arquivo_zip.filename
+    logger.info(f"Iniciando upload de zip: {filename} (schema: {schema})")
+
+    # Validações iniciais
+    if not filename or not filename.lower().endswith(".zip"):
+        raise HTTPException(
+            status_code=400,
+            detail="Formato de arquivo inválido. Apenas arquivos .zip são permitidos."
+        )
+
+    try:
+        # O zip precisa de acesso aleatório: vai para o disco em vez da memória
+        caminho_temp = await _spool_upload_to_disk(arquivo_zip)
+        def processar(db_arquivo, job=None):
+            return _processar_archive(
+                db_arquivo, caminho_temp, filename, sheet_name, processar_multiplos_robos, schema,
+                progresso=job, leitura_rapida=leitura_rapida, incremental=incremental
+            )
+        if async_job:
+            job = upload_jobs.submit("zip", filename, schema, _executar_em_background(caminho_temp, processar))
+            return _resposta_job(job)
+        try:
+            # Leitura antecipada, parse e COPY são síncronos: numa thread, fora do event loop
+            return await run_in_threadpool(processar, db)
+        finally:
+            os.remove(caminho_temp)
+
+    except HTTPException:
+        raise
     except CSVProcessingError as e:
-        logger.error(f"Erro de processamento Excel '{filename}': {e}")
+        logger.error(f"Erro de processamento do zip '{filename}': {e}")
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Erro interno ao processar Excel '{filename}': {e}", exc_info=True)
+        logger.error(f"Erro interno ao processar zip '{filename}': {e}", exc_info=True)
         raise HTTPException(
-            status_code=500, 
-            detail=f"Erro interno ao processar arquivo Excel: {str(e)}"
+            status_code=500,
+            detail=f"Erro interno ao processar arquivo zip: {str(e)}"
         )
     finally:
-        await arquivo_excel.close() 
\ No newline at end of file
+        await arquivo_zip.close()
+
+@router.get("/planos-parse/", summary="Cache de planos de parse por layout de arquivo")
+async def obter_planos_parse():
+    """
+    Estatísticas do cache de planos de parse (hits, misses, taxa de acerto) e os
+    planos guardados: mapa de colunas, formatos de data e convenções numéricas
+    detectados para cada layout (cabeçalho + separador + encoding).
+    """
+    return parse_plans.stats()
+
+@router.get("/jobs/", summary="Lista os uploads em segundo plano")
+async def listar_jobs_upload():
+    """Lista os jobs de upload recentes (mais novos primeiro) com seu progresso."""
+    return [job.to_dict() for job in upload_jobs.list_jobs()]
+
+@router.get("/jobs/{job_id}", summary="Status e progresso de um upload em segundo plano")
+async def obter_job_upload(job_id: str):
+    """
+    Retorna o status de um job de upload: linhas lidas, operações inseridas,
+    erros até o momento e vazão (linhas/s e operações/s).
+    """
+    job = upload_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job de upload '{job_id}' não encontrado")
+    return job.to_dict()
@@ -52,4 +52,9 @@ class OperacaoRead(OperacaoBase):
     id: int
     robo_info: Optional[RoboRead] = None
     criado_em: datetime
-    atualizado_em: datetime
\ No newline at end of file
+    atualizado_em: datetime
+
+# --- Página de operações (paginação por cursor) ---
+class OperacaoPage(BaseModel):
+    items: List[OperacaoRead]
+    next_cursor: Optional[str] = Field(None, description="Cursor da próxima página (None = última página)")
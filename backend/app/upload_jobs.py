@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from .core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class UploadJob:
+    """Estado e progresso de um upload processado em segundo plano"""
+
+    def __init__(self, tipo: str, arquivo: str, schema: str):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.arquivo = arquivo
+        self.schema = schema
+        self.status = "pendente"
+        self.criado_em = datetime.now()
+        self.iniciado_em: Optional[datetime] = None
+        self.finalizado_em: Optional[datetime] = None
+        self.operacoes_salvas = 0
+        self.resultado: Optional[Dict[str, Any]] = None
+        self.erro: Optional[str] = None
+        self._processor = None
+        self._inicio_monotonic: Optional[float] = None
+        self._duracao: Optional[float] = None
+
+    # --- Ganchos chamados pelo processamento ---
+
+    def acompanhar(self, processor):
+        """Associa o processador do arquivo para ler linhas lidas/erros em tempo real"""
+        self._processor = processor
+
+    def registrar_insercao(self, inseridas: int):
+        """Callback de progresso de crud.bulk_create_operacoes"""
+        self.operacoes_salvas += inseridas
+
+    # --- Ciclo de vida ---
+
+    def iniciar(self):
+        self.status = "processando"
+        self.iniciado_em = datetime.now()
+        self._inicio_monotonic = time.monotonic()
+
+    def concluir(self, resultado: Dict[str, Any]):
+        self._duracao = self._elapsed()
+        self.resultado = resultado
+        self.status = "concluido"
+        self.finalizado_em = datetime.now()
+
+    def falhar(self, erro: str):
+        self._duracao = self._elapsed()
+        self.erro = erro
+        self.status = "erro"
+        self.finalizado_em = datetime.now()
+
+    @property
+    def finalizado(self) -> bool:
+        return self.status in ("concluido", "erro")
+
+    def _elapsed(self) -> float:
+        if self._duracao is not None:
+            return self._duracao
+        if self._inicio_monotonic is None:
+            return 0.0
+        return time.monotonic() - self._inicio_monotonic
+
+    def to_dict(self) -> Dict[str, Any]:
+        summary = self._processor.get_processing_summary() if self._processor else {}
+        linhas_lidas = summary.get('total_linhas', 0)
+        duracao = self._elapsed()
+
+        return {
+            "job_id": self.id,
+            "tipo": self.tipo,
+            "arquivo": self.arquivo,
+            "schema": self.schema,
+            "status": self.status,
+            "criado_em": self.criado_em.isoformat(),
+            "iniciado_em": self.iniciado_em.isoformat() if self.iniciado_em else None,
+            "finalizado_em": self.finalizado_em.isoformat() if self.finalizado_em else None,
+            "progresso": {
+                "linhas_lidas": linhas_lidas,
+                "linhas_validas": summary.get('processadas', 0),
+                "operacoes_salvas": self.operacoes_salvas,
+                "duplicadas": summary.get('duplicadas', 0),
+                "anteriores_ignoradas": summary.get('anteriores_ignoradas', 0),
+                "erros": summary.get('erros', 0),
+                "duracao_segundos": round(duracao, 3),
+                "linhas_por_segundo": round(linhas_lidas / duracao, 1) if duracao > 0 else 0,
+                "operacoes_por_segundo": round(self.operacoes_salvas / duracao, 1) if duracao > 0 else 0,
+            },
+            "resultado": self.resultado,
+            "erro": self.erro,
+        }
+
+
+class UploadJobManager:
+    """
+    Fila de uploads em segundo plano, executados num pool de threads do próprio processo.
+
+    O estado dos jobs fica em memória: com vários workers do uvicorn, o status
+    só pode ser consultado no worker que recebeu o upload.
+    """
+
+    def __init__(self, max_workers: int, max_historico: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload-job")
+        self._jobs: "OrderedDict[str, UploadJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_historico = max_historico
+
+    def submit(self, tipo: str, arquivo: str, schema: str, tarefa: Callable[[UploadJob], Dict[str, Any]]) -> UploadJob:
+        """Enfileira `tarefa(job)`; o dict retornado vira o resultado do job"""
+        job = UploadJob(tipo, arquivo, schema)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._descartar_antigos()
+        self._executor.submit(self._executar, job, tarefa)
+        logger.info(f"Job de upload {job.id} enfileirado ({tipo}: {arquivo})")
+        return job
+
+    def get(self, job_id: str) -> Optional[UploadJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self):
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def _executar(self, job: UploadJob, tarefa: Callable[[UploadJob], Dict[str, Any]]):
+        job.iniciar()
+        try:
+            job.concluir(tarefa(job))
+            logger.info(f"Job de upload {job.id} concluído em {job._elapsed():.2f}s")
+        except HTTPException as e:
+            job.falhar(str(e.detail))
+            logger.error(f"Job de upload {job.id} falhou: {e.detail}")
+        except Exception as e:
+            job.falhar(str(e))
+            logger.error(f"Job de upload {job.id} falhou: {e}", exc_info=True)
+
+    def _descartar_antigos(self):
+        """Remove os jobs finalizados mais antigos além do limite de histórico"""
+        excedentes = len(self._jobs) - self._max_historico
+        if excedentes <= 0:
+            return
+        for job_id in [j.id for j in self._jobs.values() if j.finalizado][:excedentes]:
+            del self._jobs[job_id]
+
+
+upload_jobs = UploadJobManager(settings.UPLOAD_JOB_WORKERS, settings.UPLOAD_JOB_HISTORY)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Conferência e benchmark do AcumuladorMetricas (/analytics/metricas-avancadas?todas=true).
+
+Para cada série aleatória, o acumulador é montado a partir de partições
+aleatórias (inclusive vazias) de dois jeitos: em sequência, com `adicionar`,
+como no streaming, e como árvore aleatória de `combinar` entre trechos
+vizinhos, como resumos parciais de workers. Os dois precisam dar o mesmo
+estado que `de_resultados` da série inteira (sequências nas bordas, drawdown,
+posições) e as mesmas métricas que ArrayMetricsCalculator.calculate_advanced_metrics.
+
+Os resultados são inteiros (pontos), então somas e equity são exatas em float64
+e só média e M2 (Welford/Chan) são comparados com tolerância.
+
+Uso (a partir da pasta backend/):
+    python -m benchmarks.bench_acumulador --series 20000
+"""
+
+import argparse
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.acumulador_metricas import AcumuladorMetricas
+from app.routers.analytics import ArrayMetricsCalculator
+
+# Campos que dependem só de contagens ou de somas exatas: precisam ser idênticos
+CAMPOS_EXATOS = (
+    "linhas", "n", "soma", "positivas", "negativas", "soma_ganhos", "soma_perdas", "maior", "menor",
+    "max_ganhos", "max_perdas", "inicio_sinal", "inicio_tamanho", "fim_sinal", "fim_tamanho",
+    "pico", "vale", "vale_posicao", "max_drawdown", "max_drawdown_pico", "max_drawdown_posicao",
+)
+CAMPOS_APROXIMADOS = ("media", "m2")
+
+
+def gerar_serie(rng: np.random.Generator) -> np.ndarray:
+    """Série curta ou longa, com nulos, neutros, sequências longas e empates de equity"""
+    tamanho = int(rng.choice([0, 1, 2, 3, 5, 10, 50, 500, 3000]))
+    tipo = rng.integers(4)
+    if tipo == 0:
+        serie = rng.integers(-300, 301, tamanho).astype(np.float64)
+    elif tipo == 1:
+        # Poucos valores distintos: muitos empates de pico, vale e drawdown
+        serie = rng.choice([-2.0, -1.0, 0.0, 1.0, 2.0], tamanho)
+    elif tipo == 2:
+        # Sequências longas do mesmo sinal, que atravessam as partições
+        sinais = np.repeat(rng.choice([-1.0, 1.0], tamanho), rng.integers(1, 40, tamanho))[:tamanho]
+        serie = sinais * rng.integers(1, 100, len(sinais))
+    else:
+        # Só ganhos ou só perdas (drawdown zero ou do início ao fim)
+        serie = rng.choice([-1.0, 1.0]) * rng.integers(0, 50, tamanho).astype(np.float64)
+    serie[rng.random(len(serie)) < 0.05] = np.nan
+    return serie
+
+
+def particionar(serie: np.ndarray, rng: np.random.Generator) -> list:
+    """Cortes aleatórios em ordem (repetidos = partições vazias)"""
+    cortes = np.sort(rng.integers(0, len(serie) + 1, rng.integers(0, 8)))
+    return np.split(serie, cortes)
+
+
+def em_sequencia(partes: list) -> AcumuladorMetricas:
+    acumulador = AcumuladorMetricas()
+    for parte in partes:
+        acumulador.adicionar(parte)
+    return acumulador
+
+
+def em_arvore(partes: list, rng: np.random.Generator) -> AcumuladorMetricas:
+    """Combina pares vizinhos escolhidos ao acaso até sobrar um (a ordem cronológica é mantida)"""
+    resumos = [AcumuladorMetricas.de_resultados(parte) for parte in partes]
+    while len(resumos) > 1:
+        i = int(rng.integers(len(resumos) - 1))
+        resumos[i:i + 2] = [resumos[i].combinar(resumos[i + 1])]
+    return resumos[0]
+
+
+def divergencias(esperado: AcumuladorMetricas, obtido: AcumuladorMetricas) -> dict:
+    campos = {c: (getattr(esperado, c), getattr(obtido, c)) for c in CAMPOS_EXATOS if getattr(esperado, c) != getattr(obtido, c)}
+    campos.update({
+        c: (getattr(esperado, c), getattr(obtido, c)) for c in CAMPOS_APROXIMADOS
+        if not math.isclose(getattr(esperado, c), getattr(obtido, c), rel_tol=1e-9, abs_tol=1e-6)
+    })
+    return campos
+
+
+def metricas_divergentes(esperado: dict, obtido: dict) -> dict:
+    """
+    Floats arredondados podem diferir em uma unidade da última casa. A média por
+    Welford pode cair do outro lado de um arredondamento (0.025 -> 0.02 ou 0.03),
+    e o Sharpe, calculado com a média arredondada, herda essa diferença.
+    """
+    desvio = esperado.get("desvio_padrao") or 0
+    tolerancias = {"resultado_medio": 0.0101, "sharpe_ratio": (0.0101 / desvio if desvio else 0) + 0.0011}
+
+    def iguais(chave, a, b):
+        if isinstance(a, float) and isinstance(b, float):
+            return a == b or math.isclose(a, b, rel_tol=1e-6, abs_tol=tolerancias.get(chave, 0.0011))
+        return a == b
+    return {k: (esperado[k], obtido.get(k)) for k in esperado if not iguais(k, esperado[k], obtido.get(k))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--series", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    inicio = time.perf_counter()
+    for indice in range(args.series):
+        serie = gerar_serie(rng)
+        partes = particionar(serie, rng)
+        inteiro = AcumuladorMetricas.de_resultados(serie)
+        esperado = ArrayMetricsCalculator.calculate_advanced_metrics(pd.DataFrame({"resultado": serie}))
+
+        for modo, acumulador in (("sequência", em_sequencia(partes)), ("árvore", em_arvore(partes, rng))):
+            estado = divergencias(inteiro, acumulador)
+            assert not estado, f"Série {indice} ({modo}, {len(partes)} partes): estado divergente {estado}"
+            metricas = metricas_divergentes(esperado, ArrayMetricsCalculator.calculate_accumulated_metrics(acumulador))
+            assert not metricas, f"Série {indice} ({modo}, {len(partes)} partes): métricas divergentes {metricas}"
+
+    print(f"{args.series} séries conferidas (sequência e árvore) em {time.perf_counter() - inicio:.1f}s: estados e métricas idênticos")
+
+    # Custo do streaming: lotes de METRICAS_STREAMING_LOTE contra a série inteira de uma vez
+    serie = np.round(np.random.default_rng(args.seed).standard_t(3, 1_000_000) * 150 + 5)
+    for nome, func in (
+        ("array (série inteira)", lambda: ArrayMetricsCalculator.calculate_advanced_metrics(pd.DataFrame({"resultado": serie}))),
+        ("acumulador (lotes de 50000)", lambda: em_sequencia(np.array_split(serie, 20))),
+    ):
+        inicio = time.perf_counter()
+        func()
+        print(f"{nome:<28} {len(serie):>9} operações em {time.perf_counter() - inicio:8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark da leitura de planilhas .xlsx no upload de Excel.
+
+Compara o caminho atual (pd.read_excel com openpyxl, todas as colunas) com o
+leitor rápido (excel_parsing.ler_planilha_rapida: cabeçalho resolvido pelo
+ColumnMapper, somente leitura, só as colunas usadas) numa planilha com colunas
+extras e formatação, e confere que as operações e o relatório de erros saem iguais.
+
+Uso (a partir da pasta backend/):
+    python -m benchmarks.bench_excel_reader --linhas 100000 --colunas-extras 15
+"""
+
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.styles import Font, PatternFill
+
+from app import excel_parsing
+from app.core.config import settings
+from app.routers.uploads import ColumnMapper, ExcelOperationProcessor
+
+
+def gerar_planilha(caminho: str, linhas: int, colunas_extras: int, percentual_invalidas: float = 0.01, seed: int = 42):
+    """
+    Gera um .xlsx no formato do relatório da plataforma: datas e números nativos,
+    colunas extras e estilos. Usa o modo normal do openpyxl (e não write_only)
+    para que o arquivo tenha shared strings e a tag <dimension>, como os do Excel.
+    """
+    rng = random.Random(seed)
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Operações"
+
+    cabecalho = ["Robo", "Abertura", "Fechamento", "Res. Operação (%)", "Ativo", "Qtd.", "Tipo"]
+    cabecalho += [f"Extra {n}" for n in range(colunas_extras)]
+    ws.append(cabecalho)
+
+    fonte = Font(bold=True, color="FF0000")
+    preenchimento = PatternFill("solid", fgColor="FFFF00")
+    inicio = datetime(2020, 1, 2, 9, 0, 0)
+    invalidas = set(rng.sample(range(linhas), int(linhas * percentual_invalidas)))
+
+    for i in range(linhas):
+        abertura = inicio + timedelta(minutes=7 * i)
+        fechamento = abertura + timedelta(minutes=rng.randint(1, 120))
+        resultado = round(rng.uniform(-500, 500), 2)
+        linha = [
+            rng.choice(["Robo A", "Robo B", "Robo C"]),
+            abertura,
+            fechamento,
+            resultado,
+            rng.choice(["WINM24", "WDOM24", "WINJ25"]),
+            rng.randint(1, 5),
+            rng.choice(["C", "V", "Compra", "Venda"]),
+        ]
+        if i in invalidas:
+            linha[1 + i % 2] = "data-invalida"
+        linha += [rng.random() if n % 2 else f"obs {i % 500}-{n}" for n in range(colunas_extras)]
+        ws.append(linha)
+
+        if resultado < 0:
+            ws.cell(row=i + 2, column=4).font = fonte
+        if i % 10 == 0:
+            ws.cell(row=i + 2, column=8).fill = preenchimento
+
+    wb.save(caminho)
+
+
+def processar(df: pd.DataFrame):
+    processor = ExcelOperationProcessor(df, "bench.xlsx", "Operações")
+    processor.process_dataframe()
+    df_validas = processor.process_rows_vectorized()
+    return list(processor.iter_operacoes(df_validas)), processor.errors
+
+
+def ler_atual(caminho: str) -> pd.DataFrame:
+    return pd.read_excel(
+        caminho, sheet_name="Operações", skiprows=settings.EXCEL_SKIPROWS,
+        header=settings.EXCEL_HEADER, engine="openpyxl"
+    )
+
+
+def ler_rapido(caminho: str) -> pd.DataFrame:
+    return excel_parsing.ler_planilha_rapida(
+        caminho, "Operações", settings.EXCEL_SKIPROWS, settings.EXCEL_HEADER,
+        lambda cabecalho: ColumnMapper(cabecalho).used_columns()
+    )
+
+
+def medir(nome: str, leitor, caminho: str, linhas: int):
+    inicio = time.perf_counter()
+    df = leitor(caminho)
+    t_leitura = time.perf_counter() - inicio
+    resultado = processar(df)
+    duracao = time.perf_counter() - inicio
+    print(
+        f"{nome:<8} leitura {t_leitura:7.2f}s | leitura+parse {duracao:7.2f}s "
+        f"-> {linhas / duracao:>10,.0f} linhas/s ({df.shape[1]} colunas lidas)"
+    )
+    return resultado, t_leitura
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--colunas-extras", type=int, default=15)
+    args = parser.parse_args()
+
+    # Silencia o log de cada linha inválida para não medir I/O de log
+    logging.basicConfig(level=logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "bench.xlsx")
+        inicio = time.perf_counter()
+        gerar_planilha(caminho, args.linhas, args.colunas_extras)
+        tamanho_mb = os.path.getsize(caminho) / 1024 / 1024
+        print(f"Planilha gerada: {args.linhas} linhas, {7 + args.colunas_extras} colunas, "
+              f"{tamanho_mb:.1f} MB em {time.perf_counter() - inicio:.1f}s")
+
+        (ops_atual, erros_atual), t_atual = medir("atual", ler_atual, caminho, args.linhas)
+        (ops_rapido, erros_rapido), t_rapido = medir("rápido", ler_rapido, caminho, args.linhas)
+
+    assert erros_atual == erros_rapido, "Relatórios de erro diferentes entre os leitores"
+    assert ops_atual == ops_rapido, "Operações diferentes entre os leitores"
+
+    print(f"Saídas idênticas ({len(ops_rapido)} operações, {len(erros_rapido)} erros). "
+          f"Speedup da leitura: {t_atual / t_rapido:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos índices de operações (app/migrations.py) com EXPLAIN ANALYZE.
+
+Cria um schema temporário com as tabelas da aplicação, mas só com os índices
+antigos (robo_id e Abertura separados), carrega operações sintéticas e mede as
+consultas quentes da API antes e depois de aplicar as migrações. Depois das
+migrações, confere no plano que cada consulta usa o índice esperado (e que a
+leitura colunar das análises por robô é um index-only scan); termina com código
+de saída 1 se alguma checagem falhar.
+
+Precisa do PostgreSQL configurado no .env. Uso (a partir da pasta backend/):
+    python -m benchmarks.bench_indices --linhas 1000000 --robos 50
+"""
+
+import argparse
+import io
+import logging
+import random
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import MetaData, event, text
+
+from app import crud, migrations, models
+from app.database import SessionLocal, engine
+
+# Índices criados pelas migrações (removidos para medir o "antes")
+INDICES_MIGRACOES = [
+    "ux_operacoes_chave_natural",
+    "ix_operacoes_abertura_id",
+    "ix_operacoes_robo_abertura_cobertura",
+]
+
+# Índices de antes das migrações, removidos pela migração 4 (o modelo não os declara mais)
+INDICES_ANTIGOS = [
+    'CREATE INDEX ix_operacoes_robo_id ON {schema}.operacoes (robo_id)',
+    'CREATE INDEX "ix_operacoes_Abertura" ON {schema}.operacoes ("Abertura")',
+]
+
+
+def criar_schema(schema: str):
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+
+    metadata = MetaData()
+    for table in models.Base.metadata.sorted_tables:
+        table.to_metadata(metadata, schema=schema)
+    metadata.create_all(bind=engine)
+
+    with engine.begin() as conn:
+        for indice in INDICES_MIGRACOES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {schema}.{indice}"))
+        for comando in INDICES_ANTIGOS:
+            conn.execute(text(comando.format(schema=schema)))
+
+
+def carregar_operacoes(schema: str, linhas: int, robos: int, seed: int = 42):
+    """Operações intercaladas entre os robôs, gravadas em ordem de Abertura (como nos uploads)"""
+    rng = random.Random(seed)
+    with engine.begin() as conn:
+        conn.execute(
+            text(f"INSERT INTO {schema}.robos (id, nome) SELECT n, 'Robo ' || n FROM generate_series(1, :robos) AS n"),
+            {"robos": robos}
+        )
+
+    inicio = datetime(2018, 1, 2, 9, 0, 0)
+    buffer = io.StringIO()
+    for i in range(linhas):
+        abertura = inicio + timedelta(minutes=3 * i)
+        fechamento = abertura + timedelta(minutes=rng.randint(1, 120))
+        buffer.write(
+            f"{i % robos + 1},{rng.uniform(-500, 500):.2f},{abertura:%Y-%m-%d %H:%M:%S},{fechamento:%Y-%m-%d %H:%M:%S},"
+            f"{rng.choice(['WINM24', 'WDOM24', 'WINJ25'])},{rng.randint(1, 5)},{rng.choice(['COMPRA', 'VENDA'])}\n"
+        )
+    buffer.seek(0)
+
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.copy_expert(
+            f'COPY {schema}.operacoes (robo_id, "Resultado_Valor", "Abertura", "Fechamento", ativo, lotes, tipo) '
+            f"FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return inicio + timedelta(minutes=3 * linhas)
+
+
+def vacuum_analyze(schema: str):
+    # VACUUM atualiza o visibility map, sem o qual não há index-only scan
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"VACUUM ANALYZE {schema}.robos"))
+        conn.execute(text(f"VACUUM ANALYZE {schema}.operacoes"))
+
+
+def consulta_frame(schema: str, robo_ids, filtro, limit, mais_recentes_primeiro):
+    """O SELECT de crud.get_operacoes_frame, no estilo de parâmetros do driver"""
+    colunas = ", ".join(expressao for _, expressao, _ in crud.FRAME_OPERACAO_COLUMNS)
+    if robo_ids is None:
+        params = {campo: valores[0] for campo, valores in crud._parametros_filtros([filtro or crud.FiltroTemporal()]).items()}
+        sql = crud._select_operacoes_sql(schema, colunas, False, limit, 0, mais_recentes_primeiro)
+    else:
+        params = {"ids": robo_ids, **crud._parametros_filtros([filtro or crud.FiltroTemporal()] * len(robo_ids))}
+        sql = crud._select_operacoes_sql(schema, colunas, True, limit, 0, mais_recentes_primeiro)
+    return crud._sql_do_driver(sql, params, engine.dialect)
+
+
+def consulta_capturada(funcao):
+    """Executa uma função do crud e devolve o último SELECT que ela mandou ao driver"""
+    comandos = []
+
+    def capturar(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            comandos.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capturar)
+    db = SessionLocal()
+    try:
+        funcao(db)
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", capturar)
+    return comandos[-1]
+
+
+def explicar(sql: str, params) -> dict:
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params)
+        plano = cursor.fetchone()[0][0]
+        conn.rollback()
+    finally:
+        conn.close()
+
+    nos = []
+    pendentes = [plano["Plan"]]
+    while pendentes:
+        no = pendentes.pop()
+        nos.append((no["Node Type"], no.get("Index Name")))
+        pendentes.extend(no.get("Plans", []))
+    return {
+        "tempo_ms": plano["Execution Time"],
+        "blocos": plano["Plan"].get("Shared Hit Blocks", 0) + plano["Plan"].get("Shared Read Blocks", 0),
+        "nos": nos,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    parser.add_argument("--robos", type=int, default=50)
+    parser.add_argument("--schema", default="bench_indices")
+    parser.add_argument("--manter", action="store_true", help="Não remove o schema no final")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    schema = args.schema
+
+    criar_schema(schema)
+    fim = carregar_operacoes(schema, args.linhas, args.robos)
+    vacuum_analyze(schema)
+    print(f"{args.linhas} operações de {args.robos} robôs carregadas em '{schema}'")
+
+    # Posição ~90% para dentro da listagem, para as páginas profundas
+    with engine.connect() as conn:
+        profunda = conn.execute(text(
+            f'SELECT "Abertura", id FROM {schema}.operacoes ORDER BY "Abertura" DESC, id DESC OFFSET :n LIMIT 1'
+        ), {"n": int(args.linhas * 0.9)}).first()
+        profunda_robo = conn.execute(text(
+            f'SELECT "Abertura", id FROM {schema}.operacoes WHERE robo_id = 1 '
+            f'ORDER BY "Abertura" DESC, id DESC OFFSET :n LIMIT 1'
+        ), {"n": int(args.linhas / args.robos * 0.9)}).first()
+
+    um_mes = crud.FiltroTemporal(data_inicio=(fim - timedelta(days=60)).date(), data_fim=(fim - timedelta(days=30)).date())
+    trimestre = crud.FiltroTemporal(data_inicio=(fim - timedelta(days=120)).date(), data_fim=(fim - timedelta(days=30)).date())
+    cobertura = {"ix_operacoes_robo_abertura_cobertura"}
+
+    # (nome, consulta, índices aceitos, exige index-only scan)
+    casos = [
+        ("frame 1 robô (métricas)",
+         lambda: consulta_frame(schema, [1], None, 10000, True), cobertura, True),
+        ("frame 5 robôs com período",
+         lambda: consulta_frame(schema, [1, 2, 3, 4, 5], trimestre, None, False), cobertura, True),
+        ("frame período global (1 mês)",
+         lambda: consulta_frame(schema, None, um_mes, None, False),
+         {"ix_operacoes_abertura_id"}, False),
+        ("página profunda (keyset)",
+         lambda: consulta_capturada(lambda db: crud.get_operacoes_pagina(db, schema, 1000, tuple(profunda))),
+         {"ix_operacoes_abertura_id"}, False),
+        ("página profunda por robô",
+         lambda: consulta_capturada(lambda db: crud.get_operacoes_pagina(db, schema, 1000, tuple(profunda_robo), [1])),
+         cobertura, False),
+        ("última abertura por robô",
+         lambda: consulta_capturada(lambda db: crud.get_ultima_abertura_por_robo(db, range(1, args.robos + 1), schema)),
+         cobertura | {"ux_operacoes_chave_natural"}, False),
+    ]
+
+    antes = {nome: explicar(*consulta()) for nome, consulta, _, _ in casos}
+    aplicadas = migrations.aplicar_migracoes(engine, schema)
+    vacuum_analyze(schema)
+    print(f"Migrações aplicadas: {aplicadas}\n")
+
+    falhas = 0
+    print(f"{'consulta':<30} {'antes ms':>10} {'depois ms':>10} {'blocos antes':>13} {'blocos depois':>14}  checagem")
+    for nome, consulta, esperados, index_only in casos:
+        depois = explicar(*consulta())
+        usados = {indice for _, indice in depois["nos"] if indice}
+        ok = bool(usados & esperados)
+        if index_only:
+            ok = ok and any(tipo == "Index Only Scan" for tipo, _ in depois["nos"])
+        falhas += not ok
+        print(
+            f"{nome:<30} {antes[nome]['tempo_ms']:>10.2f} {depois['tempo_ms']:>10.2f} "
+            f"{antes[nome]['blocos']:>13} {depois['blocos']:>14}  "
+            f"{'OK' if ok else 'FALHOU'} ({', '.join(sorted(usados)) or 'seq scan'})"
+        )
+
+    if not args.manter:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+
+    if falhas:
+        print(f"\n{falhas} consulta(s) sem o índice esperado no plano")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,11 @@ CREATE TABLE IF NOT EXISTS oficial.operacoes (
     atualizado_em TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+CREATE TABLE IF NOT EXISTS oficial.versoes_dados (
+    chave INTEGER PRIMARY KEY,
+    versao BIGINT NOT NULL DEFAULT 0
+);
+
 -- Criando tabelas no schema uploads_usuarios
 CREATE TABLE IF NOT EXISTS uploads_usuarios.robos (
     id SERIAL PRIMARY KEY,
@@ -45,13 +50,19 @@ CREATE TABLE IF NOT EXISTS uploads_usuarios.operacoes (
     atualizado_em TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+CREATE TABLE IF NOT EXISTS uploads_usuarios.versoes_dados (
+    chave INTEGER PRIMARY KEY,
+    versao BIGINT NOT NULL DEFAULT 0
+);
+
 -- Criando índices para performance
-CREATE INDEX IF NOT EXISTS idx_operacoes_robo_id ON oficial.operacoes(robo_id);
-CREATE INDEX IF NOT EXISTS idx_operacoes_abertura ON oficial.operacoes("Abertura");
+-- Os mesmos de app/migrations.py (robo_id e "Abertura" isolados são prefixos destes)
+CREATE INDEX IF NOT EXISTS ix_operacoes_robo_abertura_cobertura ON oficial.operacoes (robo_id, "Abertura", id) INCLUDE ("Resultado_Valor", "Fechamento", ativo, lotes, tipo);
+CREATE INDEX IF NOT EXISTS ix_operacoes_abertura_id ON oficial.operacoes("Abertura", id);
 CREATE INDEX IF NOT EXISTS idx_operacoes_ativo ON oficial.operacoes(ativo);
 
-CREATE INDEX IF NOT EXISTS idx_operacoes_robo_id_uploads ON uploads_usuarios.operacoes(robo_id);
-CREATE INDEX IF NOT EXISTS idx_operacoes_abertura_uploads ON uploads_usuarios.operacoes("Abertura");
+CREATE INDEX IF NOT EXISTS ix_operacoes_robo_abertura_cobertura ON uploads_usuarios.operacoes (robo_id, "Abertura", id) INCLUDE ("Resultado_Valor", "Fechamento", ativo, lotes, tipo);
+CREATE INDEX IF NOT EXISTS ix_operacoes_abertura_id ON uploads_usuarios.operacoes("Abertura", id);
 CREATE INDEX IF NOT EXISTS idx_operacoes_ativo_uploads ON uploads_usuarios.operacoes(ativo);
 
 -- Confirmação
@@ -55,9 +55,18 @@ def create_tables():
             )
         ''')
         
+        # Versões dos dados (cache das análises e ETags; ver app/cache_analytics.py)
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS uploads_usuarios.versoes_dados (
+                chave INTEGER PRIMARY KEY,
+                versao BIGINT NOT NULL DEFAULT 0
+            )
+        ''')
+        
         # Criar índices
-        cur.execute('CREATE INDEX IF NOT EXISTS idx_operacoes_robo_id_uploads ON uploads_usuarios.operacoes(robo_id)')
-        cur.execute('CREATE INDEX IF NOT EXISTS idx_operacoes_abertura_uploads ON uploads_usuarios.operacoes("Abertura")')
+        cur.execute('CREATE INDEX IF NOT EXISTS ix_operacoes_robo_abertura_cobertura ON uploads_usuarios.operacoes '
+                    '(robo_id, "Abertura", id) INCLUDE ("Resultado_Valor", "Fechamento", ativo, lotes, tipo)')
+        cur.execute('CREATE INDEX IF NOT EXISTS ix_operacoes_abertura_id ON uploads_usuarios.operacoes("Abertura", id)')
         cur.execute('CREATE INDEX IF NOT EXISTS idx_operacoes_ativo_uploads ON uploads_usuarios.operacoes(ativo)')
         
         print("✅ Tabelas criadas no schema uploads_usuarios")
@@ -88,9 +97,18 @@ def create_tables():
             )
         ''')
         
+        # Versões dos dados (cache das análises e ETags; ver app/cache_analytics.py)
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS oficial.versoes_dados (
+                chave INTEGER PRIMARY KEY,
+                versao BIGINT NOT NULL DEFAULT 0
+            )
+        ''')
+        
         # Criar índices
-        cur.execute('CREATE INDEX IF NOT EXISTS idx_operacoes_robo_id ON oficial.operacoes(robo_id)')
-        cur.execute('CREATE INDEX IF NOT EXISTS idx_operacoes_abertura ON oficial.operacoes("Abertura")')
+        cur.execute('CREATE INDEX IF NOT EXISTS ix_operacoes_robo_abertura_cobertura ON oficial.operacoes '
+                    '(robo_id, "Abertura", id) INCLUDE ("Resultado_Valor", "Fechamento", ativo, lotes, tipo)')
+        cur.execute('CREATE INDEX IF NOT EXISTS ix_operacoes_abertura_id ON oficial.operacoes("Abertura", id)')
         cur.execute('CREATE INDEX IF NOT EXISTS idx_operacoes_ativo ON oficial.operacoes(ativo)')
         
         print("✅ Tabelas criadas no schema oficial")